@@ -5,8 +5,27 @@ from .security import (
     create_refresh_token,
 )
 
+from .jwt_backend import (
+    encode_token,
+    decode_token,
+    token_backend,
+)
+
 from .dependencies import (
     get_current_user,
     require_admin,
     oauth2_scheme,
-)
\ No newline at end of file
+)
+
+from .tokens import (
+    issue_token,
+    find_token,
+    purge_expired_tokens,
+)
+
+from .sessions import (
+    session_state,
+    token_claims,
+    revoke_sessions,
+    purge_revoked_tokens,
+)
@@ -1,21 +1,23 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy.orm import Session
-from config import SECRET_KEY, ALGORITHM
 from database import get_db
 from models import User, UserRole, AccountStatus
+from .jwt_backend import decode_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+# Plain def: the user lookup is blocking, so FastAPI runs it in the threadpool
+# instead of stalling the event loop while waiting for a pooled connection
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -25,6 +27,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
+
+    # Tokens issued before a password change or suspension carry an older version
+    if payload.get("ver", 0) != (user.token_version or 0):
+        raise credentials_exception
     
     # Check email verification
     if user.is_verified != "true":
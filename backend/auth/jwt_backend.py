@@ -0,0 +1,232 @@
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature, encode_dss_signature
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import base64
+import calendar
+import hashlib
+import json
+import threading
+import time
+
+from config import SECRET_KEY, ALGORITHM, JWT_KEY_FILES, JWT_VERIFY_CACHE_SIZE
+
+HMAC_ALGORITHMS = ("HS256", "HS384", "HS512")
+ASYMMETRIC_ALGORITHMS = ("ES256", "EdDSA")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _timestamps(claims: dict) -> dict:
+    """Datetime exp/iat/nbf as NumericDate, as python-jose does."""
+    return {
+        key: calendar.timegm(value.utctimetuple()) if isinstance(value, datetime) else value
+        for key, value in claims.items()
+    }
+
+
+class HMACBackend:
+    """The original scheme: HS256 with the shared SECRET_KEY, via python-jose. Publishes no JWKS."""
+
+    def __init__(self, secret: str = SECRET_KEY, algorithm: str = ALGORITHM):
+        self.secret = secret
+        self.algorithm = algorithm
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+
+    def jwks(self) -> dict:
+        return {"keys": []}
+
+
+class SigningKey:
+    """One ES256 (P-256) or EdDSA (Ed25519) key. Keys loaded from a public PEM can only verify."""
+
+    def __init__(self, key):
+        self.private = key if isinstance(key, (ec.EllipticCurvePrivateKey, ed25519.Ed25519PrivateKey)) else None
+        self.public = key.public_key() if self.private else key
+        if isinstance(self.public, ec.EllipticCurvePublicKey) and isinstance(self.public.curve, ec.SECP256R1):
+            self.algorithm = "ES256"
+            numbers = self.public.public_numbers()
+            self.jwk = {"kty": "EC", "crv": "P-256",
+                        "x": _b64encode(numbers.x.to_bytes(32, "big")),
+                        "y": _b64encode(numbers.y.to_bytes(32, "big"))}
+        elif isinstance(self.public, ed25519.Ed25519PublicKey):
+            self.algorithm = "EdDSA"
+            raw = self.public.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            self.jwk = {"kty": "OKP", "crv": "Ed25519", "x": _b64encode(raw)}
+        else:
+            raise ValueError("JWT keys must be P-256 (ES256) or Ed25519 (EdDSA)")
+        # RFC 7638 thumbprint: stable, and identical wherever the key is loaded
+        canonical = json.dumps(self.jwk, sort_keys=True, separators=(",", ":")).encode()
+        self.kid = _b64encode(hashlib.sha256(canonical).digest())
+        self.jwk = {**self.jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+    @classmethod
+    def from_pem(cls, pem: bytes) -> "SigningKey":
+        if b"PRIVATE KEY" in pem:
+            return cls(serialization.load_pem_private_key(pem, password=None))
+        return cls(serialization.load_pem_public_key(pem))
+
+    def sign(self, message: bytes) -> bytes:
+        if self.algorithm == "EdDSA":
+            return self.private.sign(message)
+        r, s = decode_dss_signature(self.private.sign(message, ec.ECDSA(hashes.SHA256())))
+        return r.to_bytes(32, "big") + s.to_bytes(32, "big")
+
+    def verify(self, signature: bytes, message: bytes) -> bool:
+        try:
+            if self.algorithm == "EdDSA":
+                self.public.verify(signature, message)
+            else:
+                if len(signature) != 64:
+                    return False
+                der = encode_dss_signature(int.from_bytes(signature[:32], "big"), int.from_bytes(signature[32:], "big"))
+                self.public.verify(der, message, ec.ECDSA(hashes.SHA256()))
+            return True
+        except InvalidSignature:
+            return False
+
+
+class AsymmetricBackend:
+    """
+    ES256 or EdDSA tokens signed with the first key and verified with any of them.
+
+    Rotation: put the new key first and keep the old ones listed (the public half
+    is enough) until every token they signed has expired. Each token names its
+    key in the `kid` header, and GET /.well-known/jwks.json publishes all the
+    public keys so other services can verify tokens without the signing key.
+    """
+
+    def __init__(self, keys: List[SigningKey]):
+        if not keys or keys[0].private is None:
+            raise ValueError("The first JWT key must be a private key; it signs new tokens")
+        self.algorithm = keys[0].algorithm
+        if any(key.algorithm != self.algorithm for key in keys):
+            raise ValueError("All JWT keys must use the same algorithm")
+        self.signer = keys[0]
+        self.keys: Dict[str, SigningKey] = {key.kid: key for key in keys}
+        self._header = _b64encode(json.dumps(
+            {"alg": self.algorithm, "typ": "JWT", "kid": self.signer.kid}, separators=(",", ":")
+        ).encode())
+
+    def encode(self, claims: dict) -> str:
+        payload = _b64encode(json.dumps(_timestamps(claims), separators=(",", ":")).encode())
+        signing_input = f"{self._header}.{payload}"
+        return f"{signing_input}.{_b64encode(self.signer.sign(signing_input.encode()))}"
+
+    def decode(self, token: str) -> dict:
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64decode(header_b64))
+            signature = _b64decode(signature_b64)
+        except (ValueError, TypeError):
+            raise JWTError("Malformed token")
+        # Only our algorithm, so a token can't pick a weaker one (or "none")
+        key = self.keys.get(header.get("kid")) if isinstance(header, dict) else None
+        if key is None or header.get("alg") != self.algorithm:
+            raise JWTError("Unknown signing key")
+        if not key.verify(signature, f"{header_b64}.{payload_b64}".encode()):
+            raise JWTError("Signature verification failed")
+        try:
+            claims = json.loads(_b64decode(payload_b64))
+        except ValueError:
+            raise JWTError("Malformed token")
+        if not isinstance(claims, dict):
+            raise JWTError("Malformed token")
+        if "exp" in claims:
+            if not isinstance(claims["exp"], (int, float)):
+                raise JWTError("Invalid exp claim")
+            if claims["exp"] <= time.time():
+                raise ExpiredSignatureError("Signature has expired")
+        return claims
+
+    def jwks(self) -> dict:
+        return {"keys": [key.jwk for key in self.keys.values()]}
+
+
+class VerifiedTokenCache:
+    """
+    Claims of tokens that already passed verification, keyed by the token's SHA-256
+    and kept until their `exp`. Hashing a token is much cheaper than checking its
+    signature, and a client sends the same access token on every request until it
+    expires. Bounded LRU; tokens without `exp` are never cached.
+    """
+
+    def __init__(self, backend, max_entries: int = JWT_VERIFY_CACHE_SIZE):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    def decode(self, token: str) -> dict:
+        if not self.max_entries:
+            return self.backend.decode(token)
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                if cached[1] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(cached[0])
+                del self._entries[key]
+
+        self.misses += 1
+        claims = self.backend.decode(token)
+        if isinstance(claims.get("exp"), (int, float)):
+            with self._lock:
+                self._entries[key] = (claims, claims["exp"])
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return dict(claims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def load_backend(algorithm: str = ALGORITHM, key_files: Optional[List[str]] = None):
+    if algorithm in HMAC_ALGORITHMS:
+        return HMACBackend(SECRET_KEY, algorithm)
+    if algorithm not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError(f"Unsupported ALGORITHM {algorithm!r}. Must be one of {HMAC_ALGORITHMS + ASYMMETRIC_ALGORITHMS}")
+    key_files = JWT_KEY_FILES if key_files is None else key_files
+    if not key_files:
+        raise ValueError(f"ALGORITHM={algorithm} needs JWT_KEY_FILES (PEM files, signing key first)")
+    keys = []
+    for path in key_files:
+        with open(path, "rb") as f:
+            keys.append(SigningKey.from_pem(f.read()))
+    backend = AsymmetricBackend(keys)
+    if backend.algorithm != algorithm:
+        raise ValueError(f"ALGORITHM={algorithm} but JWT_KEY_FILES holds {backend.algorithm} keys")
+    return backend
+
+
+token_backend = load_backend()
+verified_tokens = VerifiedTokenCache(token_backend)
+
+
+def encode_token(claims: dict) -> str:
+    return token_backend.encode(claims)
+
+
+def decode_token(token: str) -> dict:
+    """Verify a JWT and return its claims; raises JWTError (ExpiredSignatureError once expired)."""
+    return verified_tokens.decode(token)
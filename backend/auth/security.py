@@ -1,8 +1,8 @@
 from passlib.context import CryptContext
-from jose import jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from config import SECRET_KEY, ALGORITHM
+import uuid
+from .jwt_backend import encode_token
 
 pwd_context = CryptContext(
     schemes=["bcrypt"],
@@ -21,11 +21,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
     to_encode.update({"exp": expire, "type": "access"})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encode_token(to_encode)
 
 def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Long-lived token (7 days) — stored in HttpOnly cookie only, never in JS."""
+    """Long-lived token (7 days) — stored in HttpOnly cookie only, never in JS.
+    The `jti` names this one token. The `sid` names the login session: pass the old
+    token's `sid` in `data` when rotating, so logout can denylist the whole chain."""
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(days=7))
-    to_encode.update({"exp": expire, "type": "refresh"})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex,
+                      "sid": data.get("sid") or uuid.uuid4().hex})
+    return encode_token(to_encode)
\ No newline at end of file
@@ -0,0 +1,125 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import threading
+import time
+
+from models import RevokedToken, User
+from utils.sweeps import delete_in_chunks
+from config import SESSION_STATE_TTL_SECONDS
+
+MAX_VERSIONS = 50_000  # cached accounts before stale entries are dropped
+
+
+def token_claims(user: User) -> dict:
+    """Claims for a new access or refresh token of `user`."""
+    return {"sub": user.email, "ver": user.token_version or 0}
+
+
+class SessionState:
+    """
+    What /auth/refresh needs to accept a refresh token, kept in memory:
+    each account's current `token_version` and the revoked refresh token ids
+    (login session `sid`s, or single-token `jti`s).
+
+    Versions are looked up on first use and trusted for `ttl` seconds; bumps made
+    in this process apply as soon as they commit. The denylist is loaded from
+    `revoked_tokens` incrementally (by id), at most once per `ttl`, and entries
+    are evicted once the token they name has expired. So a refresh normally
+    costs no database round trip, and revocations from other workers take
+    effect within `ttl`.
+    """
+
+    def __init__(self, ttl: float = SESSION_STATE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple[int, float]] = {}  # email -> (token_version, loaded_at)
+        self._revoked: Dict[str, float] = {}  # jti -> expiry (epoch seconds)
+        self._revoked_cursor = 0  # highest revoked_tokens.id loaded
+        self._synced_at = float("-inf")
+
+    def version(self, db: Session, email: str) -> Optional[int]:
+        """Current token_version for `email`, or None if there is no such account."""
+        now = time.monotonic()
+        cached = self._versions.get(email)
+        if cached and now - cached[1] < self.ttl:
+            return cached[0]
+
+        row = db.query(User.token_version).filter(User.email == email).first()
+        if row is None:
+            self._versions.pop(email, None)
+            return None
+        self.set_version(email, row[0] or 0, now)
+        return row[0] or 0
+
+    def set_version(self, email: str, version: int, loaded_at: Optional[float] = None) -> None:
+        with self._lock:
+            if len(self._versions) >= MAX_VERSIONS:
+                cutoff = time.monotonic() - self.ttl
+                self._versions = {key: entry for key, entry in self._versions.items() if entry[1] > cutoff}
+            self._versions[email] = (version, time.monotonic() if loaded_at is None else loaded_at)
+
+    def is_revoked(self, db: Session, jti: Optional[str]) -> bool:
+        if not jti:
+            return False
+        if time.monotonic() - self._synced_at >= self.ttl:
+            self._sync(db)
+        return jti in self._revoked
+
+    def _sync(self, db: Session) -> None:
+        rows = db.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at).filter(
+            RevokedToken.id > self._revoked_cursor
+        ).order_by(RevokedToken.id).all()
+        now = time.time()
+        with self._lock:
+            for row_id, jti, expires_at in rows:
+                self._revoked[jti] = _epoch(expires_at)
+                self._revoked_cursor = max(self._revoked_cursor, row_id)
+            self._revoked = {jti: expiry for jti, expiry in self._revoked.items() if expiry > now}
+            self._synced_at = time.monotonic()
+
+    def revoke(self, db: Session, jti: str, expires_at: datetime) -> None:
+        """Denylist a refresh token `jti` or session `sid` until `expires_at`. The caller commits."""
+        db.add(RevokedToken(jti=jti, expires_at=expires_at))
+        self._revoked[jti] = _epoch(expires_at)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+            self._revoked.clear()
+            self._revoked_cursor = 0
+            self._synced_at = float("-inf")
+
+
+def _epoch(naive_utc: datetime) -> float:
+    return (naive_utc - datetime(1970, 1, 1)).total_seconds()
+
+
+session_state = SessionState()
+
+
+def revoke_sessions(db: Session, user: User) -> None:
+    """
+    Invalidate every access and refresh token issued to `user` so far (password
+    change, suspension, deletion). The caller commits; this process stops
+    accepting the old tokens at that moment.
+    """
+    user.token_version = (user.token_version or 0) + 1
+    db.info.setdefault("token_versions", {})[user.email] = user.token_version
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_token_versions(session):
+    for email, version in session.info.pop("token_versions", {}).items():
+        session_state.set_version(email, version)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_token_versions(session):
+    session.info.pop("token_versions", None)
+
+
+def purge_revoked_tokens(db: Session) -> int:
+    """Delete denylist rows whose tokens have expired on their own."""
+    return delete_in_chunks(db, RevokedToken, RevokedToken.expires_at < datetime.utcnow())
@@ -0,0 +1,53 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional
+import hashlib
+import secrets
+
+from models import AuthToken, TokenPurpose, User
+from utils.sweeps import delete_in_chunks
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_token(db: Session, user: User, purpose: TokenPurpose, expires_delta: timedelta) -> str:
+    """
+    Create a single-use token for `user` and return the raw value for the email link.
+    Any earlier token with the same purpose is replaced, and expired tokens are
+    swept while we're here. The caller commits.
+    """
+    db.query(AuthToken).filter(
+        AuthToken.user_id == user.id,
+        AuthToken.purpose == purpose
+    ).delete(synchronize_session=False)
+    _delete_expired(db)
+
+    token = secrets.token_urlsafe(32)
+    db.add(AuthToken(
+        token_hash=hash_token(token),
+        purpose=purpose,
+        user_id=user.id,
+        expires_at=datetime.utcnow() + expires_delta
+    ))
+    return token
+
+
+def find_token(db: Session, token: str, purpose: TokenPurpose) -> Optional[AuthToken]:
+    """Unique-index lookup by hash. Expiry is left to the caller so it can word the error."""
+    return db.query(AuthToken).filter(
+        AuthToken.token_hash == hash_token(token),
+        AuthToken.purpose == purpose
+    ).first()
+
+
+def _delete_expired(db: Session) -> int:
+    return db.query(AuthToken).filter(
+        AuthToken.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+
+
+def purge_expired_tokens(db: Session) -> int:
+    """Delete expired tokens in chunks (range scans on the expires_at index)."""
+    return delete_in_chunks(db, AuthToken, AuthToken.expires_at < datetime.utcnow())
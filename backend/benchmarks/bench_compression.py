@@ -0,0 +1,138 @@
+"""
+CPU cost and bandwidth saving of response compression.
+
+Builds a throwaway SQLite database with N pending offers (default 5,000) and then:
+
+1. compresses the full GET /admin/offers body with every available encoding at its
+   live and cached level, reporting size, ratio and compression time;
+2. times requests in-process: the uncompressed list, the list compressed per
+   request by the middleware (content cache off), the same with the content cache
+   on, and the driver board, which is compressed once per change and then served
+   from memory. "on the wire" is the transfer time of the body at --mbps.
+
+gzip is always available; br and zstd are measured when the brotli and zstandard
+packages are installed.
+
+    python benchmarks/bench_compression.py [--rows 5000] [--runs 20] [--mbps 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_compression.db"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ["SCHEDULER_ENABLED"] = "False"
+
+from datetime import date  # noqa: E402
+from database import engine, SessionLocal  # noqa: E402
+from database.migrate import upgrade_schema  # noqa: E402
+
+STREETS = ["Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Lake", "Hill", "Park", "River"]
+CITIES = ["Springfield", "Riverton", "Lakeside", "Fairview", "Georgetown", "Franklin", "Clinton"]
+GOODS = ["pallets", "boxes", "piano", "furniture", "documents", "medical supplies", "artwork", "tools"]
+
+
+def _address(rng):
+    return f"{rng.randint(1, 9999)} {rng.choice(STREETS)} Street, Suite {rng.randint(1, 900)}, {rng.choice(CITIES)}"
+
+
+def populate(rows: int):
+    from models import User, Driver, Offer, UserRole, AccountStatus
+
+    rng = random.Random(42)
+    with SessionLocal() as db:
+        admin = User(email="admin@bench.test", role=UserRole.ADMIN, is_verified="true",
+                     account_status=AccountStatus.APPROVED, hashed_password="x")
+        driver = User(email="driver@bench.test", role=UserRole.DRIVER, is_verified="true",
+                      account_status=AccountStatus.APPROVED, hashed_password="x")
+        db.add_all([admin, driver])
+        db.flush()
+        db.add(Driver(user_id=driver.id, first_name="Bench", last_name="Driver", phone_number="1",
+                      license_number="L1", license_expiry=date(2030, 1, 1), vehicle_make="Ford",
+                      vehicle_model="Transit", vehicle_year="2020", vehicle_color="white", vehicle_plate="P1",
+                      insurance_number="I1", insurance_expiry=date(2030, 1, 1),
+                      driver_status=AccountStatus.APPROVED, status="available"))
+        db.add_all(Offer(
+            client_id=admin.id, company_representative="Representative Name", emergency_phone="+1 555 0100",
+            description=f"{rng.choice(GOODS)} - " + " ".join(rng.choice(GOODS) for _ in range(20)),
+            pickup_date="2030-01-01", pickup_time="09:00", pickup_address=_address(rng),
+            dropoff_address=_address(rng), total_mileage=round(rng.uniform(1, 300), 1)
+        ) for _ in range(rows))
+        db.commit()
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--mbps", type=float, default=20, help="link speed for the transfer-time column")
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    populate(args.rows)
+
+    from fastapi.testclient import TestClient
+    from auth import create_access_token
+    from main import app
+    from utils.compression import ENCODERS, compressed_cache
+
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': 'admin@bench.test'})}"}
+    driver = {"Authorization": f"Bearer {create_access_token({'sub': 'driver@bench.test'})}"}
+
+    def wire_ms(size):
+        return size * 8 / (args.mbps * 1_000_000) * 1000
+
+    def raw_get(api, path, headers):
+        with api.stream("GET", path, headers=headers) as resp:
+            assert resp.status_code == 200, resp.read()
+            return b"".join(resp.iter_raw())
+
+    with TestClient(app) as api:
+        body = raw_get(api, "/admin/offers", {**admin, "Accept-Encoding": "identity"})
+
+        print(f"GET /admin/offers body over {args.rows:,} offers: {len(body):,} bytes, median of {args.runs} runs\n")
+        print(f"{'encoding':<10} {'level':>5} {'bytes':>11} {'ratio':>7} {'compress ms':>12} {'MB/s':>8}")
+        for name, encoder in ENCODERS.items():
+            for label, level in (("live", encoder.level), ("cached", encoder.cached_level)):
+                ms, compressed = timed(lambda: encoder.compress(body, level), args.runs)
+                print(f"{name:<10} {level:>5} {len(compressed):>11,} {len(body) / len(compressed):>6.1f}x "
+                      f"{ms:>12.1f} {len(body) / ms / 1000:>8.0f}  ({label})")
+
+        print(f"\nIn-process requests; 'on the wire' is the body at {args.mbps:g} Mbit/s\n")
+        print(f"{'request':<44} {'bytes':>11} {'server ms':>10} {'on the wire':>12}")
+
+        def row(label, path, headers, cache_bytes=None):
+            saved = compressed_cache.max_bytes
+            if cache_bytes is not None:
+                compressed_cache.max_bytes = cache_bytes
+            try:
+                raw_get(api, path, headers)  # warm the board snapshot and the content cache
+                ms, raw = timed(lambda: raw_get(api, path, headers), args.runs)
+            finally:
+                compressed_cache.max_bytes = saved
+            print(f"{label:<44} {len(raw):>11,} {ms:>10.1f} {wire_ms(len(raw)):>10.1f}ms")
+
+        row("/admin/offers identity", "/admin/offers", {**admin, "Accept-Encoding": "identity"})
+        for name in ENCODERS:
+            accept = {"Accept-Encoding": name}
+            row(f"/admin/offers {name}, per request", "/admin/offers", {**admin, **accept}, cache_bytes=0)
+            row(f"/admin/offers {name}, content cache", "/admin/offers", {**admin, **accept})
+        row("/driver/offers/available identity", "/driver/offers/available",
+            {**driver, "Accept-Encoding": "identity"})
+        for name in ENCODERS:
+            row(f"/driver/offers/available {name}, precompressed", "/driver/offers/available",
+                {**driver, "Accept-Encoding": name})
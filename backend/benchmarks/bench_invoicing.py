@@ -0,0 +1,142 @@
+"""
+Monthly invoicing run for many clients (services/invoicing.py).
+
+Seeds a throwaway database with N clients that each completed a few offers last
+month, some with an additional service, plus a default and per-client rate
+table. Then it times:
+
+  aggregate   the single GROUP BY over last month's completions
+  full run    aggregation, invoice inserts and rendering in this process
+  render x1   re-rendering every invoice in this process
+  render xN   re-rendering every invoice in a pool of N worker processes
+
+and checks that the number of invoices and the billed total are what was seeded.
+
+    python benchmarks/bench_invoicing.py [--clients 10000] [--offers 5] [--workers 0]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_invoicing.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ["SCHEDULER_ENABLED"] = "False"
+
+from sqlalchemy import func, insert, update  # noqa: E402
+from database import engine, SessionLocal  # noqa: E402
+from database.migrate import upgrade_schema  # noqa: E402
+from models import (  # noqa: E402
+    User, Offer, OfferEvent, Invoice, InvoiceRate, InvoiceRun, InvoiceRunStatus, UserRole, AccountStatus, OfferStatus
+)
+from services.invoicing import aggregate_period, previous_period, run_invoicing  # noqa: E402
+
+SERVICES = (None, None, None, "Wait to return client", "Loading help")
+PER_MILE, WAIT, LOADING, DISCOUNTED = 250, 4000, 2500, 200
+
+
+def seed(clients: int, offers_per_client: int, period: str) -> int:
+    """Returns the total the run should bill, in cents."""
+    rng = random.Random(42)
+    start = datetime.strptime(period, "%Y-%m")
+    upgrade_schema(engine)
+    expected = 0
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": i, "email": f"client{i}@bench.test", "hashed_password": "x", "role": UserRole.CLIENT,
+             "company_name": f"Client {i} Ltd", "address": f"{i} Main St", "is_verified": "true",
+             "account_status": AccountStatus.APPROVED, "token_version": 0}
+            for i in range(1, clients + 1)
+        ])
+        conn.execute(insert(InvoiceRate.__table__), [
+            {"client_id": None, "item": "per_mile", "unit_price_cents": PER_MILE, "effective_from": date(2020, 1, 1)},
+            {"client_id": None, "item": "wait to return client", "unit_price_cents": WAIT, "effective_from": date(2020, 1, 1)},
+            {"client_id": None, "item": "loading help", "unit_price_cents": LOADING, "effective_from": date(2020, 1, 1)},
+        ] + [
+            {"client_id": i, "item": "per_mile", "unit_price_cents": DISCOUNTED, "effective_from": date(2020, 1, 1)}
+            for i in range(1, clients + 1, 10)
+        ])
+
+        offer_id, offers, events = 0, [], []
+        for client_id in range(1, clients + 1):
+            miles_total, services = 0, {}
+            for _ in range(offers_per_client):
+                offer_id += 1
+                miles = rng.randint(5, 200) / 2
+                service = rng.choice(SERVICES)
+                completed_at = start + timedelta(minutes=rng.randint(60, 27 * 24 * 60))
+                offers.append({
+                    "id": offer_id, "client_id": client_id, "company_representative": "r", "emergency_phone": "1",
+                    "description": "d", "pickup_date": completed_at.date().isoformat(), "pickup_time": "09:00",
+                    "pickup_address": "a", "dropoff_address": "b", "total_mileage": miles,
+                    "additional_service": service, "status": OfferStatus.COMPLETED,
+                    "created_at": completed_at - timedelta(hours=3), "updated_at": completed_at,
+                })
+                events.append({"offer_id": offer_id, "client_id": client_id, "from_status": None,
+                               "to_status": OfferStatus.PENDING, "occurred_at": completed_at - timedelta(hours=3)})
+                events.append({"offer_id": offer_id, "client_id": client_id, "from_status": OfferStatus.IN_PROGRESS,
+                               "to_status": OfferStatus.COMPLETED, "occurred_at": completed_at})
+                miles_total += miles
+                if service:
+                    services[service] = services.get(service, 0) + 1
+            per_mile = DISCOUNTED if client_id % 10 == 1 else PER_MILE
+            expected += round(round(miles_total, 1) * per_mile)
+            expected += services.get("Wait to return client", 0) * WAIT + services.get("Loading help", 0) * LOADING
+        conn.execute(insert(Offer.__table__), offers)
+        conn.execute(insert(OfferEvent.__table__), events)
+    return expected
+
+
+def rerender(period: str, workers: int) -> float:
+    """Drop the rendered documents, mark the run failed so it resumes, and time the re-render."""
+    with engine.begin() as conn:
+        conn.execute(update(Invoice.__table__).values(html=None, pdf=None, rendered_at=None))
+        conn.execute(update(InvoiceRun.__table__).values(status=InvoiceRunStatus.FAILED, invoices_rendered=0))
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        run = run_invoicing(db, period, workers)
+        elapsed = time.perf_counter() - started
+        assert run.invoices_rendered == run.invoices_created
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--offers", type=int, default=5, help="completed offers per client")
+    parser.add_argument("--workers", type=int, default=0, help="render processes (0 = one per CPU)")
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+    period = previous_period()
+
+    started = time.perf_counter()
+    expected = seed(args.clients, args.offers, period)
+    print(f"seeded {args.clients:,} clients, {args.clients * args.offers:,} completed offers "
+          f"in {time.perf_counter() - started:.1f}s\n")
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        totals = aggregate_period(db, period)
+        aggregate = time.perf_counter() - started
+
+        started = time.perf_counter()
+        run = run_invoicing(db, period, workers=1)
+        full = time.perf_counter() - started
+        billed = db.query(func.sum(Invoice.total_cents)).scalar()
+        count = db.query(Invoice).count()
+
+    serial = rerender(period, 1)
+    parallel = rerender(period, workers)
+
+    print(f"{'aggregate':<12} {aggregate:>8.2f}s  ({len(totals):,} clients)")
+    print(f"{'full run':<12} {full:>8.2f}s  ({run.invoices_created:,} invoices, {run.invoices_created / full:,.0f}/s)")
+    print(f"{'render x1':<12} {serial:>8.2f}s  ({count / serial:,.0f} invoices/s)")
+    print(f"{'render x' + str(workers):<12} {parallel:>8.2f}s  ({count / parallel:,.0f} invoices/s, {serial / parallel:.1f}x)")
+    assert count == args.clients, (count, args.clients)
+    assert billed == expected, (billed, expected)
+    print(f"\n{count:,} invoices, billed {billed / 100:,.2f} as expected")
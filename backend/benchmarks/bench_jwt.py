@@ -0,0 +1,60 @@
+"""
+Cost of signing and verifying access tokens with each token backend.
+
+For HS256 (python-jose, the original scheme), ES256 and EdDSA it reports the
+token size and the median time to sign a token, to verify it, and to verify it
+again through the verified-token cache, which is what `get_current_user` pays
+when a client repeats its access token until it expires.
+
+    python benchmarks/bench_jwt.py [--iterations 5000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_jwt.db"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519  # noqa: E402
+from auth.jwt_backend import AsymmetricBackend, HMACBackend, SigningKey, VerifiedTokenCache  # noqa: E402
+
+
+def per_call_us(fn, iterations: int, repeats: int = 5) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - started) / iterations * 1_000_000)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    args = parser.parse_args()
+
+    backends = [
+        ("HS256 (jose)", HMACBackend("bench-secret", "HS256")),
+        ("ES256", AsymmetricBackend([SigningKey(ec.generate_private_key(ec.SECP256R1()))])),
+        ("EdDSA", AsymmetricBackend([SigningKey(ed25519.Ed25519PrivateKey.generate())])),
+    ]
+    claims = {"sub": "driver@example.com", "ver": 3, "type": "access",
+              "exp": datetime.utcnow() + timedelta(minutes=15)}
+
+    print(f"median per call over {args.iterations:,} iterations\n")
+    print(f"{'backend':<14} {'bytes':>6} {'sign us':>9} {'verify us':>10} {'cached us':>10} {'speedup':>8}")
+    for name, backend in backends:
+        token = backend.encode(claims)
+        cache = VerifiedTokenCache(backend, max_entries=10_000)
+        cache.decode(token)
+        sign = per_call_us(lambda: backend.encode(claims), args.iterations)
+        verify = per_call_us(lambda: backend.decode(token), args.iterations)
+        cached = per_call_us(lambda: cache.decode(token), args.iterations)
+        print(f"{name:<14} {len(token):>6} {sign:>9.1f} {verify:>10.1f} {cached:>10.1f} {verify / cached:>7.0f}x")
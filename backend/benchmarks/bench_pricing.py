@@ -0,0 +1,124 @@
+"""
+Batch quotes (services/pricing.py).
+
+Seeds a throwaway database with a default and a per-client rate table and
+time-of-day and demand factors. Then it times `quote_many` over N random
+candidates, with and without per-client rates, and checks a sample of the
+quotes against a straightforward per-candidate calculation. With NumPy
+installed it also times the pure-Python fallback and checks that both paths
+return the same quotes for every candidate.
+
+    python benchmarks/bench_pricing.py [--sizes 1000,10000,100000] [--repeat 5]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_pricing.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ["SCHEDULER_ENABLED"] = "False"
+
+from sqlalchemy import insert  # noqa: E402
+from database import engine, SessionLocal  # noqa: E402
+from database.migrate import upgrade_schema  # noqa: E402
+from models import InvoiceRate, PricingFactor  # noqa: E402
+import services.pricing as pricing  # noqa: E402
+from services.pricing import QuoteEngine, np  # noqa: E402
+
+SERVICES = (None, None, None, "Wait to return client", "Loading help", "Unknown extra")
+PER_OFFER, PER_MILE, WAIT, LOADING, DISCOUNTED = 1000, 250, 4000, 2500, 200
+HOURS = {7: 1.0, 19: 1.25, 23: 1.5}
+
+
+def seed() -> None:
+    upgrade_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(InvoiceRate.__table__), [
+            {"client_id": None, "item": item, "unit_price_cents": cents, "effective_from": date(2020, 1, 1)}
+            for item, cents in (("per_offer", PER_OFFER), ("per_mile", PER_MILE),
+                                ("wait to return client", WAIT), ("loading help", LOADING))
+        ])
+        conn.execute(insert(PricingFactor.__table__), [
+            {"kind": "hour", "threshold": hour, "multiplier": multiplier} for hour, multiplier in HOURS.items()
+        ] + [{"kind": "demand", "threshold": 0.0, "multiplier": 1.1}])
+
+
+def candidates(n: int, clients: int) -> list:
+    rng = random.Random(n)
+    return [
+        SimpleNamespace(
+            client_id=rng.randint(1, clients),
+            total_mileage=rng.randint(0, 400) / 2,
+            pickup_time=rng.choice((f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}", "", "soon")),
+            additional_service=rng.choice(SERVICES),
+        )
+        for _ in range(n)
+    ]
+
+
+def expected(candidate, discounted: bool) -> int:
+    per_mile = DISCOUNTED if discounted and candidate.client_id % 10 == 1 else PER_MILE
+    service = {"Wait to return client": WAIT, "Loading help": LOADING}.get(candidate.additional_service, 0)
+    try:
+        hour = int(candidate.pickup_time.split(":")[0])
+        time_multiplier = max((m for h, m in HOURS.items() if h <= hour), default=HOURS[23])
+    except ValueError:
+        time_multiplier = 1.0
+    return math.floor((PER_OFFER + candidate.total_mileage * per_mile + service) * time_multiplier * 1.1 + 0.5)
+
+
+def timed(quote_engine: QuoteEngine, db, batch: list, repeat: int, vectorized: bool = True) -> tuple:
+    """Best of `repeat` runs; `vectorized=False` forces the pure-Python path."""
+    saved, pricing.np = pricing.np, (pricing.np if vectorized else None)
+    try:
+        best, result = float("inf"), None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = quote_engine.quote_many(db, batch)
+            best = min(best, time.perf_counter() - started)
+        return best, result
+    finally:
+        pricing.np = saved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated batch sizes")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per size; the best one is reported")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    seed()
+    quote_engine = QuoteEngine(reload_seconds=3600, demand_seconds=3600)
+    batches = {size: candidates(size, args.clients) for size in sizes}
+    print(f"{'numpy ' + np.__version__ if np is not None else 'pure Python (numpy not installed)'}\n")
+
+    with SessionLocal() as db:
+        for label in ("default rates", "client rates"):
+            if label == "client rates":
+                db.execute(insert(InvoiceRate.__table__), [
+                    {"client_id": i, "item": "per_mile", "unit_price_cents": DISCOUNTED, "effective_from": date(2020, 1, 1)}
+                    for i in range(1, args.clients + 1, 10)
+                ])
+                db.commit()
+            quote_engine.invalidate()
+            for size, batch in batches.items():
+                elapsed, result = timed(quote_engine, db, batch, args.repeat)
+                for candidate, quote in zip(batch[:1000], result["quotes"]):
+                    assert quote["quote_cents"] == expected(candidate, label == "client rates"), (candidate, quote)
+                line = f"{label:<14} {size:>8,}  {elapsed * 1000:>9.1f}ms  ({size / elapsed:,.0f} quotes/s)"
+                if np is not None:
+                    python_elapsed, python_result = timed(quote_engine, db, batch, args.repeat, vectorized=False)
+                    assert python_result == result, "NumPy and pure-Python quotes differ"
+                    line += f"  pure Python {python_elapsed * 1000:>8.1f}ms ({python_elapsed / elapsed:.1f}x)"
+                print(line)
+    print("\nsampled quotes match" + (", NumPy and pure-Python quotes identical" if np is not None else ""))
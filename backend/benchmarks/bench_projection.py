@@ -0,0 +1,102 @@
+"""
+Payload size and latency of offer lists with ?fields= and ?format=columns.
+
+Builds a throwaway SQLite database with N offers (default 10,000) carrying
+realistic description and address strings, then times GET /admin/offers
+in-process for the full list, the fields the driver board actually shows,
+and both again in the columnar format. Conditional GETs are not used, so
+every run queries and serializes.
+
+    python benchmarks/bench_projection.py [--rows 10000] [--runs 20]
+"""
+import argparse
+import gzip
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_projection.db"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ["SCHEDULER_ENABLED"] = "False"
+
+from sqlalchemy import text  # noqa: E402
+from database import engine  # noqa: E402
+from database.migrate import upgrade_schema  # noqa: E402
+
+STREETS = ["Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Lake", "Hill", "Park", "River"]
+CITIES = ["Springfield", "Riverton", "Lakeside", "Fairview", "Georgetown", "Franklin", "Clinton"]
+GOODS = ["pallets", "boxes", "piano", "furniture", "documents", "medical supplies", "artwork", "tools"]
+
+# What frontend/driver/available-offers.html renders in its list
+BOARD_FIELDS = "description,pickup_date,pickup_time,pickup_address,dropoff_address,total_mileage,status"
+
+
+def _address(rng):
+    return f"{rng.randint(1, 9999)} {rng.choice(STREETS)} Street, Suite {rng.randint(1, 900)}, {rng.choice(CITIES)}"
+
+
+def populate(rows: int):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, email, role, account_status, is_verified, hashed_password) "
+            "VALUES (1, 'admin@bench.test', 'ADMIN', 'APPROVED', 'true', 'x')"
+        ))
+        conn.execute(text(
+            "INSERT INTO offers (client_id, company_representative, emergency_phone, description, pickup_date, "
+            "pickup_time, pickup_address, dropoff_address, total_mileage, status, created_at, updated_at) "
+            "VALUES (1, 'Representative Name', '+1 555 0100', :description, '2030-01-01', '09:00', :pickup, "
+            ":dropoff, :miles, 'PENDING', '2026-01-01 00:00:00', '2026-01-01 00:00:00')"
+        ), [{
+            "description": f"{rng.choice(GOODS)} - " + " ".join(rng.choice(GOODS) for _ in range(20)),
+            "pickup": _address(rng),
+            "dropoff": _address(rng),
+            "miles": round(rng.uniform(1, 300), 1),
+        } for _ in range(rows)])
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    populate(args.rows)
+
+    from fastapi.testclient import TestClient
+    from auth import create_access_token
+    from main import app
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'admin@bench.test'})}"}
+    variants = [
+        ("full objects", ""),
+        ("board fields", f"?fields={BOARD_FIELDS}"),
+        ("full columnar", "?format=columns"),
+        ("board fields columnar", f"?fields={BOARD_FIELDS}&format=columns"),
+    ]
+
+    with TestClient(app) as api:
+        print(f"GET /admin/offers over {args.rows:,} offers, median of {args.runs} runs\n")
+        print(f"{'variant':<24} {'bytes':>12} {'gzip bytes':>11} {'ms':>8} {'size':>7} {'time':>7}")
+        baseline = None
+        for name, query in variants:
+            ms, resp = timed(lambda: api.get(f"/admin/offers{query}", headers=headers), args.runs)
+            assert resp.status_code == 200, resp.text
+            size = len(resp.content)
+            baseline = baseline or (size, ms)
+            print(f"{name:<24} {size:>12,} {len(gzip.compress(resp.content)):>11,} {ms:>8.1f} "
+                  f"{size / baseline[0]:>6.0%} {ms / baseline[1]:>6.0%}")
@@ -0,0 +1,103 @@
+"""
+Offer search benchmark: FTS index vs. the LIKE scan the admin page effectively does today.
+
+Builds a throwaway SQLite database with N synthetic offers (default 1,000,000),
+indexes it, then times ranked paginated searches against an equivalent
+`LIKE '%term%'` scan over the same columns.
+
+    python benchmarks/bench_search.py [--rows 1000000] [--queries 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_search.db"))
+
+from sqlalchemy import text  # noqa: E402
+from database import engine, SessionLocal  # noqa: E402
+from database.migrate import upgrade_schema  # noqa: E402
+from services.search import rebuild_search_index, search_offers  # noqa: E402
+
+STREETS = ["Main", "Oak", "Pine", "Maple", "Cedar", "Elm", "Lake", "Hill", "Park", "River"]
+CITIES = ["Springfield", "Riverton", "Lakeside", "Fairview", "Georgetown", "Franklin", "Clinton"]
+GOODS = ["pallets", "boxes", "piano", "furniture", "documents", "medical supplies", "artwork", "tools"]
+PEOPLE = ["Alice", "Bob", "Carla", "Dmitri", "Ebony", "Farid", "Grace", "Hiro", "Ines", "Jamal"]
+
+
+def _address(rng):
+    return f"{rng.randint(1, 9999)} {rng.choice(STREETS)} St, {rng.choice(CITIES)}"
+
+
+def populate(rows: int, clients: int = 5000, batch: int = 50_000):
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, email, role, company_name) VALUES " + ", ".join(
+            f"({i}, 'client{i}@bench.test', 'CLIENT', 'Company {i} {rng.choice(CITIES)}')" for i in range(1, clients + 1)
+        )))
+        insert = text(
+            "INSERT INTO offers (client_id, company_representative, emergency_phone, description, "
+            "pickup_date, pickup_time, pickup_address, dropoff_address, status) "
+            "VALUES (:client_id, :rep, '555', :description, '2025-01-01', '09:00', :pickup, :dropoff, 'PENDING')"
+        )
+        for start in range(0, rows, batch):
+            conn.execute(insert, [{
+                "client_id": rng.randint(1, clients),
+                "rep": rng.choice(PEOPLE),
+                "description": f"{rng.choice(GOODS)} for {rng.choice(PEOPLE)}",
+                "pickup": _address(rng),
+                "dropoff": _address(rng),
+            } for _ in range(min(batch, rows - start))])
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    upgrade_schema(engine)
+    started = time.perf_counter()
+    populate(args.rows)
+    print(f"Inserted {args.rows:,} offers in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_search_index(conn)
+    print(f"Built search index in {time.perf_counter() - started:.1f}s")
+
+    db = SessionLocal()
+    queries = ["piano", "maple riverton", "grace artwork", "company 42", "medic", "4821 maple"]
+    print(f"\n{'query':<18} {'fts median ms':>14} {'fts max ms':>11} {'LIKE median ms':>15} {'matches':>9}")
+    for q in queries:
+        total = search_offers(db, q, 1, 20)[0]
+        fts = timed(lambda: search_offers(db, q, 1, 20), args.queries)
+        like_params = {f"t{i}": f"%{term}%" for i, term in enumerate(q.split())}
+        like_sql = " AND ".join(
+            f"(o.description LIKE :t{i} OR o.pickup_address LIKE :t{i} OR o.dropoff_address LIKE :t{i} "
+            f"OR o.company_representative LIKE :t{i} OR u.company_name LIKE :t{i})" for i in range(len(like_params))
+        )
+        # Same work as the search endpoint: count every match, return the first page
+        like = timed(lambda: (
+            db.execute(text(
+                f"SELECT count(*) FROM offers o JOIN users u ON u.id = o.client_id WHERE {like_sql}"
+            ), like_params).scalar(),
+            db.execute(text(
+                f"SELECT o.id FROM offers o JOIN users u ON u.id = o.client_id WHERE {like_sql} LIMIT 20"
+            ), like_params).all(),
+        ), max(1, args.queries // 10))
+        print(f"{q:<18} {fts[0]:>14.2f} {fts[1]:>11.2f} {like[0]:>15.2f} {total:>9,}")
+    db.close()
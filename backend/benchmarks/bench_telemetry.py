@@ -0,0 +1,138 @@
+"""
+Load test for driver GPS telemetry ingestion (POST /driver/telemetry).
+
+Seeds a throwaway database with N approved drivers that each have an in-progress
+offer, starts `uvicorn main:app` against it, then has every driver upload batches
+of points concurrently for a fixed duration. Reports accepted points per second,
+request latency, and verifies after shutdown that every accepted point was flushed.
+
+    python benchmarks/bench_telemetry.py [--drivers 200] [--batch 20] [--seconds 15] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_telemetry.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+import httpx  # noqa: E402
+from database import engine, SessionLocal  # noqa: E402
+from database.migrate import upgrade_schema  # noqa: E402
+from models import User, Driver, Offer, UserRole, AccountStatus, OfferStatus, DriverPosition  # noqa: E402
+from auth import create_access_token  # noqa: E402
+
+
+def seed(drivers: int) -> list:
+    upgrade_schema(engine)
+    db = SessionLocal()
+    client = User(email="client@bench.test", role=UserRole.CLIENT, is_verified="true",
+                  account_status=AccountStatus.APPROVED, hashed_password="x")
+    db.add(client)
+    db.flush()
+    tokens = []
+    for i in range(drivers):
+        user = User(email=f"driver{i}@bench.test", role=UserRole.DRIVER, is_verified="true",
+                    account_status=AccountStatus.APPROVED, hashed_password="x")
+        db.add(user)
+        db.flush()
+        driver = Driver(user_id=user.id, first_name="D", last_name=str(i), phone_number=str(i),
+                        license_number=f"L{i}", license_expiry=date(2030, 1, 1), vehicle_make="M", vehicle_model="M",
+                        vehicle_year="2020", vehicle_color="c", vehicle_plate=f"P{i}", insurance_number="I",
+                        insurance_expiry=date(2030, 1, 1), driver_status=AccountStatus.APPROVED, status="busy")
+        db.add(driver)
+        db.flush()
+        db.add(Offer(client_id=client.id, driver_id=driver.id, company_representative="r", emergency_phone="1",
+                     description="d", pickup_date="2025-01-01", pickup_time="09:00", pickup_address="a",
+                     dropoff_address="b", status=OfferStatus.IN_PROGRESS))
+        tokens.append(create_access_token({"sub": user.email}, timedelta(hours=1)))
+    db.commit()
+    db.close()
+    return tokens
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def drive(base_url: str, tokens: list, batch: int, seconds: float, concurrency: int):
+    latencies, accepted, errors = [], 0, 0
+    semaphore = asyncio.Semaphore(concurrency)
+    deadline = time.perf_counter() + seconds
+
+    async def one_driver(client: httpx.AsyncClient, token: str):
+        nonlocal accepted, errors
+        rng = random.Random(token)
+        lat, lng = 40 + rng.random(), -74 + rng.random()
+        headers = {"Authorization": f"Bearer {token}"}
+        while time.perf_counter() < deadline:
+            now = datetime.utcnow()
+            points = [{
+                "lat": lat + k * 1e-5, "lng": lng + k * 1e-5, "speed_kmh": 40,
+                "recorded_at": (now - timedelta(seconds=batch - k)).isoformat(),
+            } for k in range(batch)]
+            async with semaphore:
+                started = time.perf_counter()
+                resp = await client.post(f"{base_url}/driver/telemetry", json={"points": points}, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if resp.status_code == 202:
+                accepted += resp.json()["accepted"]
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one_driver(client, t) for t in tokens))
+        elapsed = time.perf_counter() - started
+    return accepted, errors, latencies, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drivers", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20, help="points per upload")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    tokens = seed(args.drivers)
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy()
+    )
+    try:
+        for _ in range(300):
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/healthz").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.05)
+        accepted, errors, latencies, elapsed = asyncio.run(
+            drive(f"http://127.0.0.1:{port}", tokens, args.batch, args.seconds, args.concurrency)
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    print(f"{args.drivers} drivers, {args.batch} points/upload, {elapsed:.1f}s")
+    print(f"Uploads: {len(latencies):,} ({len(latencies) / elapsed:,.0f}/s), errors: {errors}")
+    print(f"Points accepted: {accepted:,} ({accepted / elapsed:,.0f}/s)")
+    print(f"Upload latency ms: p50 {statistics.median(latencies):.1f}, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f}")
+    with SessionLocal() as db:
+        stored = db.query(DriverPosition).count()
+    print(f"Rows in driver_positions after shutdown: {stored:,} ({'all flushed' if stored == accepted else 'MISMATCH'})")
@@ -0,0 +1,76 @@
+"""
+Typeahead benchmark for the admin directory index (services/directory.py).
+
+Fills an in-memory index with synthetic users and drivers (default 100,000 users,
+20,000 of them drivers) and reports build time plus per-query latency for typical
+keystroke sequences. Target: top-10 in under 5 ms.
+
+    python benchmarks/bench_typeahead.py [--users 100000] [--runs 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from services.directory import DirectoryIndex  # noqa: E402
+
+FIRST = ["James", "Maria", "Chen", "Aisha", "Lucas", "Sofia", "Omar", "Elena", "Kwame", "Yuki", "Diego", "Priya"]
+LAST = ["Smith", "Garcia", "Wang", "Okafor", "Muller", "Rossi", "Haddad", "Ivanova", "Mensah", "Tanaka", "Lopez", "Patel"]
+WORDS = ["Logistics", "Freight", "Medical", "Supply", "Express", "Holdings", "Foods", "Pharma", "Labs", "Motors"]
+
+
+def populate(index: DirectoryIndex, users: int, drivers: int, rng: random.Random) -> None:
+    for i in range(1, users + 1):
+        company = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+        index.upsert({
+            "kind": "user", "id": i, "user_id": i, "label": company, "detail": f"user{i}@example.com",
+            "role": "client", "status": "approved",
+            "fields": [f"user{i}@example.com", company, f"+1 555 {rng.randint(1000000, 9999999)}"],
+        })
+    for i in range(1, drivers + 1):
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+        plate = "".join(rng.choices(string.ascii_uppercase, k=3)) + f"-{rng.randint(100, 9999)}"
+        index.upsert({
+            "kind": "driver", "id": i, "user_id": i, "label": name, "detail": plate,
+            "role": "driver", "status": "approved",
+            "fields": [name, plate, f"+1 555 {rng.randint(1000000, 9999999)}"],
+        })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--drivers", type=int, default=20_000)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    index = DirectoryIndex()
+    started = time.perf_counter()
+    populate(index, args.users, args.drivers, rng)
+    print(f"Indexed {args.users:,} users + {args.drivers:,} drivers in {time.perf_counter() - started:.1f}s")
+
+    typed = ["m", "ma", "mar", "mari", "maria", "user4", "user4242", "logis", "freight ex", "555 12", "okaf", "-42"]
+    print(f"\n{'query':<12} {'median ms':>10} {'p99 ms':>8} {'hits':>5}")
+    for q in typed:
+        samples = []
+        for _ in range(args.runs):
+            t = time.perf_counter()
+            hits = index.search(q, limit=10)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        print(f"{q:<12} {statistics.median(samples):>10.3f} {samples[int(len(samples) * 0.99) - 1]:>8.3f} {len(hits):>5}")
+
+    started = time.perf_counter()
+    for i in range(1, 1001):
+        index.upsert({
+            "kind": "user", "id": i, "user_id": i, "label": f"Renamed {i}", "detail": None,
+            "role": "client", "status": "approved", "fields": [f"user{i}@example.com", f"Renamed {i}", None],
+        })
+    print(f"\nIncremental update: {(time.perf_counter() - started):.3f} ms per upsert (x1000)")
@@ -0,0 +1,187 @@
+"""
+End-to-end webhook delivery against a local stand-in receiver.
+
+Starts an HTTP receiver on localhost that checks every signature, then runs the
+app in-process (so the delivery workers run too) against a throwaway database.
+It registers one healthy and one always-failing endpoint and drives offers
+through their lifecycle. It reports delivery latency, the largest number of
+concurrent requests any endpoint saw (should not exceed
+WEBHOOK_ENDPOINT_CONCURRENCY), and whether the failing endpoint was disabled.
+
+    python benchmarks/bench_webhooks.py [--offers 100] [--delay-ms 50]
+
+The receiver also runs on its own for manual testing. Register
+http://127.0.0.1:9000/ with WEBHOOK_ALLOW_INSECURE_URLS=True and run:
+
+    python benchmarks/bench_webhooks.py --receiver-only --port 9000 --secret <webhook secret>
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_webhooks.db"))
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ.setdefault("WEBHOOK_ALLOW_INSECURE_URLS", "True")
+os.environ.setdefault("WEBHOOK_BACKOFF_BASE_SECONDS", "0.05")
+os.environ.setdefault("WEBHOOK_DISABLE_AFTER_FAILURES", "5")
+
+from services.webhooks import verify_signature, SIGNATURE_HEADER  # noqa: E402
+
+
+class StandInReceiver:
+    """Records every delivery; `/fail` paths always answer 500, others 200 after `delay`."""
+
+    def __init__(self, port: int = 0, delay: float = 0.0, secrets: dict = None):
+        self.delay = delay
+        self.secrets = secrets if secrets is not None else {}  # path -> secret, or "*" for all
+        self.received = []
+        self.bad_signatures = 0
+        self.concurrent = {}
+        self.max_concurrent = {}
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with receiver._lock:
+                    now = receiver.concurrent[self.path] = receiver.concurrent.get(self.path, 0) + 1
+                    receiver.max_concurrent[self.path] = max(receiver.max_concurrent.get(self.path, 0), now)
+                try:
+                    time.sleep(receiver.delay)
+                    secret = receiver.secrets.get(self.path, receiver.secrets.get("*"))
+                    valid = secret is None or verify_signature(secret, self.headers.get(SIGNATURE_HEADER), body)
+                    with receiver._lock:
+                        if not valid:
+                            receiver.bad_signatures += 1
+                        receiver.received.append((self.path, time.time(), json.loads(body), valid))
+                    status = 500 if self.path.startswith("/fail") else (200 if valid else 401)
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                finally:
+                    with receiver._lock:
+                        receiver.concurrent[self.path] -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.port = self.server.server_address[1]
+
+    def start(self) -> "StandInReceiver":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+
+def run_scenario(offers: int, delay: float) -> None:
+    from fastapi.testclient import TestClient
+    from database import engine, SessionLocal
+    from database.migrate import upgrade_schema
+    from models import User, Driver, UserRole, AccountStatus, WebhookDelivery, WebhookEndpoint, DeliveryStatus
+    from auth import create_access_token
+    from config import WEBHOOK_ENDPOINT_CONCURRENCY
+    from main import app
+
+    upgrade_schema(engine)
+    with SessionLocal() as db:
+        client = User(email="client@bench.test", role=UserRole.CLIENT, is_verified="true",
+                      account_status=AccountStatus.APPROVED, hashed_password="x")
+        driver_user = User(email="driver@bench.test", role=UserRole.DRIVER, is_verified="true",
+                           account_status=AccountStatus.APPROVED, hashed_password="x")
+        db.add_all([client, driver_user])
+        db.flush()
+        db.add(Driver(user_id=driver_user.id, first_name="D", last_name="R", phone_number="1", license_number="L",
+                      license_expiry=date(2030, 1, 1), vehicle_make="M", vehicle_model="M", vehicle_year="2020",
+                      vehicle_color="c", vehicle_plate="P", insurance_number="I", insurance_expiry=date(2030, 1, 1),
+                      driver_status=AccountStatus.APPROVED, status="available"))
+        db.commit()
+    client_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'client@bench.test'})}"}
+    driver_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'driver@bench.test'})}"}
+
+    receiver = StandInReceiver(delay=delay).start()
+    base = f"http://127.0.0.1:{receiver.port}"
+    sent_at = {}
+
+    with TestClient(app) as api:
+        healthy = api.post("/webhooks", json={"url": f"{base}/hook"}, headers=client_headers).json()
+        api.post("/webhooks", json={"url": f"{base}/fail", "events": ["offer.matched"]}, headers=client_headers)
+        receiver.secrets.update({"/hook": healthy["secret"]})
+
+        started = time.perf_counter()
+        for _ in range(offers):
+            offer = api.post("/offers", headers=client_headers, json={
+                "company_representative": "r", "emergency_phone": "1", "description": "d",
+                "pickup_date": "2026-01-01", "pickup_time": "09:00", "pickup_address": "a", "dropoff_address": "b",
+            }).json()
+            for action in ("accept", "in_progress", "completed"):
+                if action == "accept":
+                    api.post(f"/driver/offers/{offer['id']}/accept", headers=driver_headers)
+                else:
+                    api.put(f"/driver/offers/{offer['id']}/status", json={"status": action}, headers=driver_headers)
+                sent_at[(offer["id"], f"offer.{'matched' if action == 'accept' else action}")] = time.time()
+        enqueue_seconds = time.perf_counter() - started
+
+        expected = offers * 3
+        deadline = time.time() + 60
+        while time.time() < deadline and sum(1 for r in receiver.received if r[0] == "/hook") < expected:
+            time.sleep(0.05)
+        delivered_seconds = time.perf_counter() - started
+
+    receiver.stop()
+    latencies = sorted(
+        (at - sent_at[(event["data"]["offer"]["id"], event["type"])]) * 1000
+        for path, at, event, _ in receiver.received if path == "/hook"
+    )
+    with SessionLocal() as db:
+        pending = db.query(WebhookDelivery).filter(WebhookDelivery.status == DeliveryStatus.PENDING).count()
+        failing = db.query(WebhookEndpoint).filter(WebhookEndpoint.url.endswith("/fail")).one()
+
+    print(f"{expected} events over {offers} offers, receiver delay {delay * 1000:.0f} ms")
+    print(f"Writes took {enqueue_seconds:.2f}s; all delivered after {delivered_seconds:.2f}s")
+    print(f"Delivered to healthy endpoint: {len(latencies)} / {expected}, bad signatures: {receiver.bad_signatures}")
+    if latencies:
+        print(f"Commit-to-receipt latency ms: p50 {statistics.median(latencies):.0f}, "
+              f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)]:.0f}")
+    print(f"Max concurrent requests per endpoint: {receiver.max_concurrent} (limit {WEBHOOK_ENDPOINT_CONCURRENCY})")
+    print(f"Failing endpoint: {sum(1 for r in receiver.received if r[0] == '/fail')} attempts, "
+          f"disabled_at={failing.disabled_at}, still pending: {pending}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, default=100)
+    parser.add_argument("--delay-ms", type=float, default=50, help="receiver processing time per request")
+    parser.add_argument("--receiver-only", action="store_true")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--secret", help="verify signatures with this webhook secret")
+    args = parser.parse_args()
+
+    if args.receiver_only:
+        receiver = StandInReceiver(args.port, args.delay_ms / 1000, {"*": args.secret} if args.secret else {})
+        print(f"Listening on http://127.0.0.1:{receiver.port}/ (paths starting with /fail answer 500)")
+        receiver.start()
+        seen = 0
+        try:
+            while True:
+                time.sleep(0.2)
+                for path, at, event, valid in receiver.received[seen:]:
+                    print(f"{datetime.fromtimestamp(at):%H:%M:%S} {path} {event['type']} "
+                          f"signature={'ok' if valid else 'BAD'}")
+                seen = len(receiver.received)
+        except KeyboardInterrupt:
+            receiver.stop()
+    else:
+        run_scenario(args.offers, args.delay_ms / 1000)
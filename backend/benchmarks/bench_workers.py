@@ -0,0 +1,147 @@
+"""
+Throughput of `serve.py` as the number of worker processes grows.
+
+Seeds a throwaway database with one client and their offers, then for each worker
+count starts `python serve.py --workers N` against it and drives a fixed-duration
+load from several client processes. Two request types are measured: GET /healthz
+(framework overhead only) and GET /offers/my (JWT check, a database read and
+serialization). Reports requests per second, latency and the speedup over one worker.
+
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--seconds 10] [--clients 4] [--concurrency 32]
+
+Scaling tops out at the number of CPUs; run it on a machine with at least as many
+cores as the largest worker count, leaving some for the load generator.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_workers.db")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+os.environ["SCHEDULER_ENABLED"] = "False"
+
+import httpx  # noqa: E402
+
+
+def seed(offers: int) -> str:
+    from database import engine, SessionLocal
+    from database.migrate import upgrade_schema
+    from models import User, Offer, UserRole, AccountStatus
+    from auth import create_access_token
+
+    upgrade_schema(engine)
+    with SessionLocal() as db:
+        client = User(email="client@bench.test", role=UserRole.CLIENT, is_verified="true",
+                      account_status=AccountStatus.APPROVED, hashed_password="x")
+        db.add(client)
+        db.flush()
+        db.add_all(Offer(client_id=client.id, company_representative="r", emergency_phone="1",
+                         description=f"offer {i}", pickup_date="2030-01-01", pickup_time="09:00",
+                         pickup_address="a", dropoff_address="b") for i in range(offers))
+        db.commit()
+    engine.dispose()
+    return create_access_token({"sub": "client@bench.test"}, timedelta(hours=1))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _load(url: str, headers: dict, seconds: float, concurrency: int) -> tuple:
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def loop(client: httpx.AsyncClient):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                resp = await client.get(url, headers=headers)
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency), timeout=30) as client:
+        await asyncio.gather(*(loop(client) for _ in range(concurrency)))
+    return latencies, errors
+
+
+def _client_process(args: tuple) -> tuple:
+    return asyncio.run(_load(*args))
+
+
+def measure(url: str, headers: dict, seconds: float, clients: int, concurrency: int) -> dict:
+    per_client = max(concurrency // clients, 1)
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        results = pool.map(_client_process, [(url, headers, seconds, per_client)] * clients)
+    latencies = sorted(lat for lats, _ in results for lat in lats)
+    return {
+        "rps": len(latencies) / seconds,
+        "errors": sum(errors for _, errors in results),
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": latencies[max(int(len(latencies) * 0.99) - 1, 0)] if latencies else 0.0,
+    }
+
+
+def run_server(workers: int, port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1",
+         "--max-requests", "0", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=os.environ.copy()
+    )
+    for _ in range(600):
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz").status_code == 200:
+                break
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    time.sleep(1)  # let every worker finish booting, not just the first
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections across all clients")
+    parser.add_argument("--offers", type=int, default=50, help="offers returned by GET /offers/my")
+    args = parser.parse_args()
+
+    token = seed(args.offers)
+    targets = [("GET /healthz", "/healthz", {}),
+               ("GET /offers/my", "/offers/my", {"Authorization": f"Bearer {token}"})]
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes, {args.concurrency} connections, "
+          f"{args.seconds:.0f}s per run")
+
+    baseline = {}
+    for workers in (int(n) for n in args.workers.split(",")):
+        port = _free_port()
+        server = run_server(workers, port)
+        try:
+            for name, path, headers in targets:
+                result = measure(f"http://127.0.0.1:{port}{path}", headers, args.seconds,
+                                 args.clients, args.concurrency)
+                baseline.setdefault(name, result["rps"])
+                print(f"{workers:>2} workers  {name:<15} {result['rps']:>8,.0f} req/s  "
+                      f"x{result['rps'] / baseline[name]:.2f}  p50 {result['p50']:.1f} ms  "
+                      f"p99 {result['p99']:.1f} ms  errors {result['errors']}")
+        finally:
+            server.terminate()
+            server.wait()
@@ -9,7 +9,11 @@ ENV = os.getenv("ENV", "dev")
 
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")  # HS256/384/512 with SECRET_KEY, or ES256 / EdDSA with JWT_KEY_FILES
+# PEM files for ES256 / EdDSA: the current signing key first, then older keys (public halves are
+# enough) that are still accepted until their tokens expire. Published at /.well-known/jwks.json
+JWT_KEY_FILES = [path.strip() for path in os.getenv("JWT_KEY_FILES", "").split(",") if path.strip()]
+JWT_VERIFY_CACHE_SIZE = int(os.getenv("JWT_VERIFY_CACHE_SIZE", 10000))  # verified tokens remembered until exp; 0 disables
 
 # Short-lived access token (15 min) — lives in JS memory only
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
@@ -17,8 +21,130 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
 # Long-lived refresh token (7 days) — stored in HttpOnly cookie only
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
 
+# /auth/refresh checks token versions and revoked refresh tokens from memory; other workers'
+# password changes, suspensions and logouts are picked up within this many seconds
+SESSION_STATE_TTL_SECONDS = int(os.getenv("SESSION_STATE_TTL_SECONDS", 30))
+
+# Email link tokens (verification / password reset)
+VERIFICATION_TOKEN_EXPIRE_HOURS = int(os.getenv("VERIFICATION_TOKEN_EXPIRE_HOURS", 24))
+PASSWORD_RESET_EXPIRE_MINUTES = int(os.getenv("PASSWORD_RESET_EXPIRE_MINUTES", 60))
+
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Connections per worker. Sync endpoints run on a 40-thread pool and hold their session
+# until the response is sent, so size + overflow must stay above 40 or requests deadlock.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 20))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 30))
+
+# Production server (serve.py) — one worker process per CPU unless WEB_CONCURRENCY is set
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", 10000))  # a worker is replaced after this many; 0 disables
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 1000))  # so workers don't all recycle at once
+SERVER_GRACEFUL_TIMEOUT_SECONDS = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30))  # for in-flight requests and background tasks
+
+# How long a worker may serve the pending-offer board before re-checking the offers version
+BOARD_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("BOARD_SNAPSHOT_MAX_AGE_SECONDS", 1.0))
+
+# How often the admin typeahead index checks whether another worker changed users/drivers
+DIRECTORY_VERSION_CHECK_SECONDS = float(os.getenv("DIRECTORY_VERSION_CHECK_SECONDS", 2.0))
+
+# Archival — completed/cancelled offers untouched for this long move to offers_archive
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 90))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 1000))
+
+# Driver GPS telemetry
+TELEMETRY_FLUSH_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_SECONDS", 2.0))
+TELEMETRY_FLUSH_THRESHOLD = int(os.getenv("TELEMETRY_FLUSH_THRESHOLD", 5000))  # buffered points that trigger an early flush
+TELEMETRY_RING_SIZE = int(os.getenv("TELEMETRY_RING_SIZE", 2000))  # per driver; oldest points drop if flushing falls behind
+TELEMETRY_MAX_CLOCK_SKEW_SECONDS = float(os.getenv("TELEMETRY_MAX_CLOCK_SKEW_SECONDS", 120.0))  # points further ahead of server time are refused
+
+# ETA for in-progress offers
+ETA_REFRESH_SECONDS = float(os.getenv("ETA_REFRESH_SECONDS", 15.0))  # batch recompute of all active ETAs
+ETA_HISTORY_DAYS = int(os.getenv("ETA_HISTORY_DAYS", 90))  # completed offers used for typical durations
+ETA_HISTORY_REFRESH_SECONDS = float(os.getenv("ETA_HISTORY_REFRESH_SECONDS", 600.0))
+
+# Idempotency-Key support for retried writes
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", 24))  # how long a key's response is replayed
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10.0))  # a retry waits this long for the original
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))  # unfinished claims older than this are abandoned
+
+# Client webhooks
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+WEBHOOK_ENDPOINT_CONCURRENCY = int(os.getenv("WEBHOOK_ENDPOINT_CONCURRENCY", 2))  # in-flight deliveries per endpoint
+WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", 10.0))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", 2.0))  # outbox scan when nothing wakes the dispatcher
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 10))
+WEBHOOK_BACKOFF_BASE_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_BASE_SECONDS", 5.0))  # doubles per attempt
+WEBHOOK_BACKOFF_MAX_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_MAX_SECONDS", 3600.0))
+WEBHOOK_DISABLE_AFTER_FAILURES = int(os.getenv("WEBHOOK_DISABLE_AFTER_FAILURES", 20))  # consecutive, across deliveries
+# Plain http:// and loopback/private hosts are refused unless this is on (local development and testing)
+WEBHOOK_ALLOW_INSECURE_URLS = os.getenv("WEBHOOK_ALLOW_INSECURE_URLS", "False") == "True"
+
+# In-process scheduler for maintenance sweeps (one leader across worker processes)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "True") == "True"
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", 15.0))
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", 60))  # leadership lapses if not renewed
+SWEEP_CHUNK_SIZE = int(os.getenv("SWEEP_CHUNK_SIZE", 500))  # rows per transaction in sweeps
+SWEEP_MAX_CHUNKS = int(os.getenv("SWEEP_MAX_CHUNKS", 100))  # per run; the rest waits for the next run
+# PENDING offers nobody accepted are cancelled this long after their pickup time
+STALE_OFFER_GRACE_HOURS = int(os.getenv("STALE_OFFER_GRACE_HOURS", 2))
+
+# Driver document compliance — approved drivers are suspended once a license or insurance has expired
+COMPLIANCE_REMINDER_DAYS = int(os.getenv("COMPLIANCE_REMINDER_DAYS", 30))  # remind this long before expiry
+COMPLIANCE_REMINDER_INTERVAL_DAYS = int(os.getenv("COMPLIANCE_REMINDER_INTERVAL_DAYS", 7))  # between reminders to one driver
+COMPLIANCE_EMAIL_CONCURRENCY = int(os.getenv("COMPLIANCE_EMAIL_CONCURRENCY", 5))  # reminder emails sent at once
+
+# Response compression — gzip always; br and zstd when the brotli / zstandard packages are installed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))  # bytes; smaller bodies are sent as-is
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+# Cached payloads (the offer board, bodies repeated across requests) are compressed once, so harder
+COMPRESSION_CACHED_GZIP_LEVEL = int(os.getenv("COMPRESSION_CACHED_GZIP_LEVEL", 9))
+COMPRESSION_CACHED_BROTLI_QUALITY = int(os.getenv("COMPRESSION_CACHED_BROTLI_QUALITY", 9))
+COMPRESSION_CACHED_ZSTD_LEVEL = int(os.getenv("COMPRESSION_CACHED_ZSTD_LEVEL", 12))
+COMPRESSION_CACHE_MB = int(os.getenv("COMPRESSION_CACHE_MB", 64))  # compressed repeats of large bodies; 0 disables
+
+# Rate limits on the auth routes — token buckets per client address and per account email.
+# "memory" keeps buckets per process; "database" shares them across workers and hosts.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True") == "True"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_LOGIN_PER_IP = int(os.getenv("RATE_LIMIT_LOGIN_PER_IP", 20))  # per minute
+RATE_LIMIT_LOGIN_PER_ACCOUNT = int(os.getenv("RATE_LIMIT_LOGIN_PER_ACCOUNT", 10))  # per minute
+RATE_LIMIT_SIGNUP_PER_IP = int(os.getenv("RATE_LIMIT_SIGNUP_PER_IP", 10))  # per hour
+RATE_LIMIT_PASSWORD_RESET_PER_IP = int(os.getenv("RATE_LIMIT_PASSWORD_RESET_PER_IP", 10))  # per minute
+RATE_LIMIT_PASSWORD_RESET_PER_ACCOUNT = int(os.getenv("RATE_LIMIT_PASSWORD_RESET_PER_ACCOUNT", 3))  # emails per hour
+
+# Load shedding — requests beyond LOAD_SHED_MAX_CONCURRENCY queue; one that has queued longer
+# than LOAD_SHED_TARGET_MS (or finds the queue full) gets 503 with Retry-After. Per worker process.
+LOAD_SHED_ENABLED = os.getenv("LOAD_SHED_ENABLED", "True") == "True"
+LOAD_SHED_MAX_CONCURRENCY = int(os.getenv("LOAD_SHED_MAX_CONCURRENCY", 40))  # matches the default threadpool
+LOAD_SHED_TARGET_MS = int(os.getenv("LOAD_SHED_TARGET_MS", 250))
+LOAD_SHED_MAX_QUEUE = int(os.getenv("LOAD_SHED_MAX_QUEUE", 200))
+
+# Analytics export (export.py, GET /admin/exports/...) — Parquet needs the optional pyarrow package
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 50000))  # rows per cursor fetch / Arrow record batch
+EXPORT_PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+# Invoicing (invoice.py, services/invoicing.py) — monthly runs, rates in the invoice_rates table
+INVOICING_SCHEDULED = os.getenv("INVOICING_SCHEDULED", "False") == "True"  # invoice last month on the 1st
+INVOICE_CURRENCY = os.getenv("INVOICE_CURRENCY", "USD")
+INVOICE_CHUNK_CLIENTS = int(os.getenv("INVOICE_CHUNK_CLIENTS", 500))  # clients aggregated per commit
+INVOICE_RENDER_WORKERS = int(os.getenv("INVOICE_RENDER_WORKERS", 0))  # 0 = one per CPU
+INVOICE_RUN_LEASE_SECONDS = int(os.getenv("INVOICE_RUN_LEASE_SECONDS", 600))  # a silent run is taken over after this
+
+# Offer quotes (services/pricing.py) — base prices from invoice_rates, multipliers from pricing_factors
+PRICING_RELOAD_SECONDS = float(os.getenv("PRICING_RELOAD_SECONDS", 5.0))  # how often other workers' rate changes are checked for
+PRICING_DEMAND_REFRESH_SECONDS = float(os.getenv("PRICING_DEMAND_REFRESH_SECONDS", 30.0))  # pending offers / available drivers
+PRICING_BATCH_MAX = int(os.getenv("PRICING_BATCH_MAX", 10000))  # candidates per POST .../quotes
+
+# Admin batch endpoints — operations per POST /admin/batch and ids per batch GET
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", 1000))
+
+# Delta sync — cursors older than the tombstone retention get a full resync
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+# Each cursor is moved back this far so rows committed slightly out of order are not missed
+SYNC_CURSOR_OVERLAP_SECONDS = int(os.getenv("SYNC_CURSOR_OVERLAP_SECONDS", 5))
 
 # Base URL
 BASE_URL = os.getenv("BASE_URL")
@@ -1 +1 @@
-from .database import Base, engine, get_db
+from .database import Base, engine, get_db, SessionLocal
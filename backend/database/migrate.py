@@ -0,0 +1,162 @@
+from sqlalchemy import Date, inspect, text
+from sqlalchemy.engine import Engine
+from datetime import datetime, timedelta
+import hashlib
+import logging
+
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Bring an existing database up to the current models.
+    create_all only creates missing tables, so columns and indexes added to
+    existing tables are applied here. Every step is idempotent.
+    """
+    import models  # noqa: F401 — registers every table on Base.metadata
+
+    had_offer_events = inspect(engine).has_table("offer_events")
+    Base.metadata.create_all(bind=engine)
+    if not had_offer_events:
+        _backfill_offer_events(engine)
+    _autoincrement_offer_ids(engine)
+
+    inspector = inspect(engine)
+    _move_user_tokens(engine, {col["name"] for col in inspector.get_columns("users")})
+    _convert_expiry_dates(engine, {col["name"]: col["type"] for col in inspector.get_columns("drivers")})
+
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {col["name"] for col in inspector.get_columns(table.name)}
+        with engine.begin() as conn:
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+
+        existing_indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=engine, checkfirst=True)
+
+    from services.search import ensure_search_index
+    ensure_search_index(engine)
+
+
+def _move_user_tokens(engine: Engine, user_columns: set) -> None:
+    """One-off: copy tokens still held on `users` into auth_tokens (hashed) and clear them."""
+    from models import AuthToken, TokenPurpose
+
+    legacy = [
+        ("verification_token", None, TokenPurpose.EMAIL_VERIFICATION),
+        ("password_reset_token", "password_reset_expires", TokenPurpose.PASSWORD_RESET),
+    ]
+    with engine.begin() as conn:
+        for token_col, expires_col, purpose in legacy:
+            if token_col not in user_columns:
+                continue
+            expires_sql = expires_col if expires_col in user_columns else "NULL"
+            rows = conn.execute(text(
+                f"SELECT id, {token_col}, {expires_sql} FROM users WHERE {token_col} IS NOT NULL"
+            )).all()
+            for user_id, token, expires_at in rows:
+                if isinstance(expires_at, str):
+                    expires_at = datetime.fromisoformat(expires_at)
+                conn.execute(AuthToken.__table__.insert().values(
+                    token_hash=hashlib.sha256(token.encode()).hexdigest(),
+                    purpose=purpose,
+                    user_id=user_id,
+                    expires_at=expires_at or datetime.utcnow() + timedelta(days=1),
+                    created_at=datetime.utcnow()
+                ))
+            conn.execute(text(f"UPDATE users SET {token_col} = NULL WHERE {token_col} IS NOT NULL"))
+
+
+def _backfill_offer_events(engine: Engine) -> None:
+    """
+    One-off, when offer_events is first created: a creation event for every existing
+    offer at its created_at. Later transitions weren't recorded, so none are invented.
+    """
+    from sqlalchemy import insert, literal, null, select
+    from models import Offer, OfferArchive, OfferEvent, OfferStatus
+
+    with engine.begin() as conn:
+        for table in (Offer.__table__, OfferArchive.__table__):
+            conn.execute(insert(OfferEvent).from_select(
+                ["offer_id", "client_id", "driver_id", "from_status", "to_status", "occurred_at"],
+                select(
+                    table.c.id, table.c.client_id, null(), null(),
+                    literal(OfferStatus.PENDING, OfferEvent.__table__.c.to_status.type),
+                    table.c.created_at
+                ).where(table.c.created_at.isnot(None))
+            ))
+
+
+def _autoincrement_offer_ids(engine: Engine) -> None:
+    """
+    One-off on SQLite: offers was created without AUTOINCREMENT, so archiving or deleting
+    the newest offer let its id be handed out again. Rebuild the table with it (SQLite
+    can't alter that in place) and start the sequence after every id already used,
+    including ones only left in offers_archive, offer_events and offer_tombstones.
+    Indexes are recreated by the index step of upgrade_schema.
+    """
+    from sqlalchemy.schema import CreateTable
+    from models import Offer
+
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'offers'")).scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            return
+
+        existing = {row[1] for row in conn.execute(text("PRAGMA table_info(offers)"))}
+        columns = ", ".join(f'"{col.name}"' for col in Offer.__table__.columns if col.name in existing)
+        create = str(CreateTable(Offer.__table__).compile(dialect=engine.dialect))
+        conn.execute(text(create.replace("CREATE TABLE offers ", "CREATE TABLE offers_rebuilt ", 1)))
+        conn.execute(text(f"INSERT INTO offers_rebuilt ({columns}) SELECT {columns} FROM offers"))
+        conn.execute(text("DROP TABLE offers"))
+        conn.execute(text("ALTER TABLE offers_rebuilt RENAME TO offers"))
+
+        highest = conn.execute(text(
+            "SELECT max(id) FROM (SELECT max(id) AS id FROM offers UNION ALL SELECT max(id) FROM offers_archive "
+            "UNION ALL SELECT max(offer_id) FROM offer_events UNION ALL SELECT max(offer_id) FROM offer_tombstones)"
+        )).scalar() or 0
+        conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'offers'"))
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES ('offers', :seq)"), {"seq": highest})
+
+
+def _convert_expiry_dates(engine: Engine, driver_columns: dict) -> None:
+    """
+    One-off: license/insurance expiry used to be free-form text. Rewrite every value that
+    isn't already a valid YYYY-MM-DD date as one, or NULL when it can't be read (a stored
+    '2025-13-45' would make every Driver load fail), then switch the column to DATE on
+    PostgreSQL (SQLite keeps the ISO text, which Date reads back).
+    """
+    from datetime import date
+    from utils.dates import parse_loose_date
+
+    def is_iso_date(raw) -> bool:
+        try:
+            return date.fromisoformat(raw).isoformat() == raw
+        except (TypeError, ValueError):
+            return False
+
+    for column in ("license_expiry", "insurance_expiry"):
+        if column not in driver_columns or isinstance(driver_columns[column], Date):
+            continue
+        with engine.begin() as conn:
+            rows = conn.execute(text(f"SELECT id, {column} FROM drivers WHERE {column} IS NOT NULL")).all()
+            for driver_id, raw in rows:
+                if is_iso_date(raw):
+                    continue
+                parsed = parse_loose_date(raw)
+                if parsed is None:
+                    logger.warning("drivers.%s: could not read %r for driver %s; cleared", column, raw, driver_id)
+                conn.execute(
+                    text(f"UPDATE drivers SET {column} = :value WHERE id = :id"),
+                    {"value": parsed.isoformat() if parsed else None, "id": driver_id}
+                )
+            if engine.dialect.name == "postgresql":
+                conn.execute(text(f"ALTER TABLE drivers ALTER COLUMN {column} TYPE DATE USING {column}::date"))
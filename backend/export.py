@@ -0,0 +1,38 @@
+"""
+Export offers, drivers and offer status history for analytics, one file per table and day:
+
+    python export.py --out /data/exports [--tables offers,drivers,offer_events]
+                     [--since 2024-01-01] [--until 2024-01-31] [--format parquet|csv]
+
+Files land in <out>/<table>/date=YYYY-MM-DD/part-0.parquet (Hive-style partitions).
+Runs are incremental: each table continues the day after the last one exported,
+recorded in <out>/_export_state.json, through yesterday (UTC). --since re-exports
+from that day. Offers and drivers are filed under the day they last changed, so
+keep the newest row per id when reading several days. Parquet needs pyarrow.
+"""
+import argparse
+import sys
+from datetime import date
+
+from database import engine
+from services.export import EXPORTS, FORMATS, export_partitions, parquet_available
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--tables", default=",".join(EXPORTS), help="Comma-separated: " + ", ".join(EXPORTS))
+    parser.add_argument("--since", type=date.fromisoformat, help="First day to export (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day to export (default: yesterday)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    args = parser.parse_args()
+
+    tables = [name.strip() for name in args.tables.split(",") if name.strip()]
+    unknown = [name for name in tables if name not in EXPORTS]
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(unknown)}")
+    if args.format == "parquet" and not parquet_available():
+        sys.exit("Parquet export needs pyarrow (pip install pyarrow), or use --format csv")
+
+    totals = export_partitions(engine, args.out, tables, args.since, args.until, args.format)
+    for name, (days, rows) in totals.items():
+        print(f"{name}: {rows:,} rows over {days} day(s)")
@@ -0,0 +1,30 @@
+"""
+Invoice clients for a month of completed offers:
+
+    python invoice.py [--period 2024-05] [--workers N]
+
+Aggregates each client's completed offers for the period (default: last month),
+prices them with the invoice_rates table and renders the PDF and HTML documents
+in --workers processes (default INVOICE_RENDER_WORKERS, 0 = one per CPU).
+Running it again is safe: an interrupted run resumes after the last committed
+chunk of clients, and a completed period is left as it is.
+"""
+import argparse
+import sys
+
+from database import SessionLocal
+from services.invoicing import InvoiceRunBusy, previous_period, run_invoicing
+from config import INVOICE_RENDER_WORKERS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--period", default=previous_period(), help="YYYY-MM (default: last month)")
+    parser.add_argument("--workers", type=int, default=INVOICE_RENDER_WORKERS)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        try:
+            run = run_invoicing(db, args.period, args.workers, log=print)
+        except (InvoiceRunBusy, ValueError) as exc:
+            sys.exit(str(exc))
+        print(f"{run.period} {run.status.value}: {run.invoices_created:,} invoices, {run.invoices_rendered:,} rendered")
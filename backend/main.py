@@ -1,14 +1,86 @@
 from fastapi import FastAPI
-from database import Base, engine
-from routes import auth, client, admin, driver
+from contextlib import asynccontextmanager
+from sqlalchemy import text
+from database import engine, SessionLocal
+from database.migrate import upgrade_schema
+from routes import auth, client, admin, driver, webhooks, invoices
 from fastapi.middleware.cors import CORSMiddleware
+from utils.warmup import register_warmup, start_warmup, warmup_status
+from services.idempotency import IdempotencyMiddleware
+from utils.compression import CompressionMiddleware
+from services.load_shedding import LoadSheddingMiddleware
+from config import SCHEDULER_ENABLED
 import os
-import uvicorn
+import time
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+STARTED_AT = time.monotonic()
 
-app = FastAPI(title="Flow Relay API", version="1.0.2")
+# Schema changes are applied by `python migrate.py` (or `python main.py`), not on import,
+# so a cold worker starts serving without touching the database.
+
+
+def _warm_database():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def _warm_password_hashing():
+    from auth import get_password_hash
+    get_password_hash("warm-up")  # loads the bcrypt backend
+
+
+def _warm_mailer():
+    from utils.email import get_mailer
+    get_mailer()
+
+
+def _warm_offer_board():
+    from services import offer_board
+    with SessionLocal() as db:
+        offer_board.get(db)
+
+
+def _warm_directory():
+    from services import directory
+    with SessionLocal() as db:
+        directory.rebuild(db)
+
+
+register_warmup("database", _warm_database)
+register_warmup("password_hashing", _warm_password_hashing)
+register_warmup("mailer", _warm_mailer)
+register_warmup("offer_board", _warm_offer_board)
+register_warmup("directory", _warm_directory)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from services import telemetry, webhooks, scheduler
+
+    start_warmup()
+    telemetry.start(engine)
+    await webhooks.start()
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+    yield
+    await scheduler.stop()
+    await webhooks.stop()
+    telemetry.stop(engine)
+
+
+app = FastAPI(title="Flow Relay API", version="1.0.2", lifespan=lifespan)
+
+# Retried writes carrying an Idempotency-Key get the original response back.
+# Added before CORS so replayed responses still get CORS headers.
+app.add_middleware(IdempotencyMiddleware)
+
+# gzip/br/zstd by Accept-Encoding. Outside the idempotency layer, which stores and replays
+# uncompressed bodies; already-encoded responses (the offer board) pass through.
+app.add_middleware(CompressionMiddleware)
+
+# Sheds requests with 503 + Retry-After once they queue past LOAD_SHED_TARGET_MS, before
+# any other work is done for them. Inside CORS so browsers can read the 503.
+app.add_middleware(LoadSheddingMiddleware)
 
 # CORS — allow_credentials=True is required for HttpOnly cookies to be sent cross-origin.
 # allow_origins CANNOT be ["*"] when allow_credentials=True — must list explicitly
@@ -25,7 +97,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"]
+    # "*" is not honoured for credentialed requests, so name the headers the frontend reads
+    expose_headers=["*", "ETag", "X-Sync-Cursor", "Idempotent-Replayed"]
 )
 
 # Include routers AFTER CORS middleware
@@ -33,12 +106,28 @@ app.include_router(auth.router)
 app.include_router(client.router)
 app.include_router(driver.router)
 app.include_router(admin.router)
+app.include_router(webhooks.router)
+app.include_router(invoices.router)
 
 @app.get("/")
 def root():
     return {"message": "Welcome to Flow Relay API"}
 
 
+@app.get("/healthz")
+def healthz():
+    """Readiness probe — answers as soon as the process serves requests, without touching the database.
+    Optional subsystems report their warm-up state separately."""
+    return {
+        "status": "ok",
+        "uptime_seconds": round(time.monotonic() - STARTED_AT, 3),
+        "subsystems": warmup_status(),
+    }
+
+
 if __name__ == "__main__":
+    import uvicorn
+
+    upgrade_schema(engine)
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,15 @@
+"""
+Apply schema changes to the configured database.
+Run once per deploy, before starting the API:
+
+    python migrate.py
+"""
+import logging
+
+from database import engine
+from database.migrate import upgrade_schema
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    upgrade_schema(engine)
+    print("Database schema is up to date.")
@@ -1 +1 @@
-from .models import User, Offer, UserRole, OfferStatus, Driver, AccountStatus
\ No newline at end of file
+from .models import User, Offer, UserRole, OfferStatus, Driver, AccountStatus, TableVersion, OfferTombstone, OfferEvent, AuthToken, TokenPurpose, RevokedToken, OfferArchive, DriverPosition, IdempotencyKey, WebhookEndpoint, WebhookDelivery, DeliveryStatus, SchedulerLease, RateLimitBucket, InvoiceRate, InvoiceRun, InvoiceRunStatus, Invoice, PricingFactor
\ No newline at end of file
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Float, Integer, String, DateTime, ForeignKey, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Date, Float, Integer, LargeBinary, SmallInteger, String, Text, DateTime, ForeignKey, Index, Table, UniqueConstraint, Enum as SQLEnum
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 import enum
 from database import Base
@@ -22,6 +22,20 @@ class AccountStatus(str, enum.Enum):
     REJECTED = "rejected"
     SUSPENDED = "suspended"
 
+class TokenPurpose(str, enum.Enum):
+    EMAIL_VERIFICATION = "email_verification"
+    PASSWORD_RESET = "password_reset"
+
+class DeliveryStatus(str, enum.Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+class InvoiceRunStatus(str, enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -35,17 +49,15 @@ class User(Base):
     company_representative = Column(String, nullable=True)
     emergency_phone = Column(String, nullable=True)
     is_verified = Column(String, default="false")
-    verification_token = Column(String, nullable=True)
-    
-    # Password reset fields
-    password_reset_token = Column(String, nullable=True)
-    password_reset_expires = Column(DateTime, nullable=True)
 
     # Account approval fields
     account_status = Column(SQLEnum(AccountStatus), default=AccountStatus.PENDING)
     approval_notes = Column(String, nullable=True)
     approved_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     approved_at = Column(DateTime, nullable=True)
+
+    # Carried in every JWT; bumping it (password change, suspension) revokes all of them
+    token_version = Column(Integer, default=0)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -58,6 +70,8 @@ class User(Base):
         uselist=False,
         foreign_keys="Driver.user_id"  # THIS IS THE FIX
     )
+    auth_tokens = relationship("AuthToken", back_populates="user", cascade="all, delete-orphan")
+    webhook_endpoints = relationship("WebhookEndpoint", back_populates="client", cascade="all, delete-orphan")
 
 class Driver(Base):
     __tablename__ = "drivers"
@@ -68,14 +82,15 @@ class Driver(Base):
     last_name = Column(String)
     phone_number = Column(String)
     license_number = Column(String, unique=True)
-    license_expiry = Column(String)
+    license_expiry = Column(Date, index=True)
     vehicle_make = Column(String)
     vehicle_model = Column(String)
     vehicle_year = Column(String)
     vehicle_color = Column(String)
     vehicle_plate = Column(String, unique=True)
     insurance_number = Column(String)
-    insurance_expiry = Column(String)
+    insurance_expiry = Column(Date, index=True)
+    expiry_reminder_sent_at = Column(DateTime, nullable=True)  # last license/insurance reminder email
     
     # Driver-specific approval
     driver_status = Column(SQLEnum(AccountStatus), default=AccountStatus.PENDING)
@@ -83,7 +98,7 @@ class Driver(Base):
     driver_approved_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     driver_approved_at = Column(DateTime, nullable=True)
     
-    status = Column(String, default="available")  # available, busy, offline
+    status = Column(String, default="available", index=True)  # available, busy, offline
     rating = Column(String, default="5.0")
     total_deliveries = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -112,6 +127,7 @@ class Offer(Base):
     dropoff_address = Column(String)
     total_mileage = Column(Float, nullable=True)
     additional_service = Column(String, nullable=True)
+    quote_cents = Column(Integer, nullable=True)  # price quoted at creation (services/pricing.py)
     status = Column(SQLEnum(OfferStatus), default=OfferStatus.PENDING)
     driver_first_name = Column(String, nullable=True)
     driver_phone = Column(String, nullable=True)
@@ -123,4 +139,303 @@ class Offer(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     client = relationship("User", back_populates="offers", foreign_keys=[client_id])
-    assigned_driver = relationship("Driver", back_populates="assigned_offers")
\ No newline at end of file
+    assigned_driver = relationship("Driver", back_populates="assigned_offers")
+
+    __table_args__ = (
+        # Delta sync scans "this owner's offers changed since <cursor>"
+        Index("ix_offers_client_updated", "client_id", "updated_at"),
+        Index("ix_offers_driver_updated", "driver_id", "updated_at"),
+        # Board lookups and the archival sweep filter by status
+        Index("ix_offers_status_updated", "status", "updated_at"),
+        # Stale PENDING expiry sweep (ISO date strings sort chronologically)
+        Index("ix_offers_status_pickup", "status", "pickup_date"),
+        # Daily analytics export partitions by last change
+        Index("ix_offers_updated", "updated_at"),
+        # Never hand out an id again once its offer is archived or deleted: it lives on in
+        # offers_archive, offer_search and offer_events (SQLite reuses the highest rowid otherwise)
+        {"sqlite_autoincrement": True},
+    )
+
+
+class OfferEvent(Base):
+    """Append-only history of offer status changes, written in the same transaction as
+    the change (services/history.py). `from_status` is NULL for the creation event.
+    Rows outlive the offer, so there is deliberately no foreign key to `offers`."""
+    __tablename__ = "offer_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    offer_id = Column(Integer, nullable=False)
+    client_id = Column(Integer, nullable=True)
+    driver_id = Column(Integer, nullable=True)  # assigned driver at the time of the change
+    from_status = Column(SQLEnum(OfferStatus), nullable=True)
+    to_status = Column(SQLEnum(OfferStatus), nullable=False)
+    occurred_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Window functions partition by offer in time order
+        Index("ix_offer_events_offer_occurred", "offer_id", "occurred_at"),
+        Index("ix_offer_events_client_occurred", "client_id", "occurred_at"),
+        Index("ix_offer_events_driver_occurred", "driver_id", "occurred_at"),
+    )
+
+
+class OfferArchive(Base):
+    """Completed/cancelled offers moved out of the hot `offers` table by services/archive.py.
+    Same columns as Offer (without foreign keys) plus archived_at."""
+    __table__ = Table(
+        "offers_archive",
+        Base.metadata,
+        *[
+            Column(col.name, col.type, primary_key=col.primary_key, nullable=col.nullable)
+            for col in Offer.__table__.columns
+        ],
+        Column("archived_at", DateTime, default=datetime.utcnow),
+        Index("ix_offers_archive_client_updated", "client_id", "updated_at"),
+        Index("ix_offers_archive_driver_updated", "driver_id", "updated_at"),
+        Index("ix_offers_archive_created", "created_at"),
+        Index("ix_offers_archive_updated", "updated_at"),
+    )
+
+class TableVersion(Base):
+    """Write counter per table, bumped in the same transaction as the change.
+    List endpoints derive their ETag from it instead of re-reading the rows."""
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+
+class SchedulerLease(Base):
+    """Row "leader" is the scheduler's leader lease; every other row is a job's last run,
+    so a newly elected leader continues the schedule where the previous one left off."""
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(100), nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    last_run_at = Column(DateTime, nullable=True)
+    last_duration_ms = Column(Float, nullable=True)
+    last_result = Column(String(255), nullable=True)
+
+
+class OfferTombstone(Base):
+    """Marks an offer that left a client's or driver's list (deleted or reassigned),
+    so delta sync can tell devices to drop it."""
+    __tablename__ = "offer_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    offer_id = Column(Integer, nullable=False)
+    client_id = Column(Integer, nullable=True)
+    driver_id = Column(Integer, nullable=True)
+    removed_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        Index("ix_offer_tombstones_client_removed", "client_id", "removed_at"),
+        Index("ix_offer_tombstones_driver_removed", "driver_id", "removed_at"),
+    )
+
+
+class AuthToken(Base):
+    """Single-use email verification / password reset token.
+    Only the SHA-256 of the token is stored, so a leaked table can't be replayed."""
+    __tablename__ = "auth_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    purpose = Column(SQLEnum(TokenPurpose), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    user = relationship("User", back_populates="auth_tokens")
+
+
+class RevokedToken(Base):
+    """Denylisted refresh tokens (logout), by their `sid` (login session) or, for tokens
+    without one, `jti` claim. Rows are swept once the tokens would have expired anyway."""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(32), unique=True, index=True, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class IdempotencyKey(Base):
+    """Outcome of a request sent with an Idempotency-Key header, replayed to retries.
+    `key` is the SHA-256 of the caller and their header value; status_code stays
+    NULL while the first request is still running. Rows are swept after expires_at."""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), unique=True, index=True, nullable=False)
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = Column(Integer, nullable=True)
+    content_type = Column(String(100), nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class RateLimitBucket(Base):
+    """Token bucket shared by every worker when RATE_LIMIT_BACKEND is "database".
+    `updated_at` is epoch seconds so refill arithmetic works the same in SQLite and
+    PostgreSQL; idle buckets are swept once they would have refilled anyway."""
+    __tablename__ = "rate_limit_buckets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(128), unique=True, index=True, nullable=False)  # limit name, scope and hashed client
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)
+
+
+class WebhookEndpoint(Base):
+    """A client's URL for offer lifecycle events. Disabled automatically after
+    WEBHOOK_DISABLE_AFTER_FAILURES failed attempts in a row (disabled_at is set)."""
+    __tablename__ = "webhook_endpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    url = Column(String(500), nullable=False)
+    secret = Column(String(64), nullable=False)  # HMAC key for the signature header
+    events = Column(String(255), nullable=True)  # comma-separated event types; NULL = all
+    consecutive_failures = Column(Integer, default=0)
+    disabled_at = Column(DateTime, nullable=True)
+    disabled_reason = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    client = relationship("User", back_populates="webhook_endpoints")
+    deliveries = relationship("WebhookDelivery", back_populates="endpoint", cascade="all, delete-orphan")
+
+
+class WebhookDelivery(Base):
+    """Outbox row: one event for one endpoint, written in the same transaction as the change.
+    While a worker is sending it, next_attempt_at is pushed forward as a lease."""
+    __tablename__ = "webhook_deliveries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    endpoint_id = Column(Integer, ForeignKey("webhook_endpoints.id"), nullable=False, index=True)
+    event_id = Column(String(32), nullable=False)  # shared by every endpoint receiving the same event
+    event = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)
+    status = Column(SQLEnum(DeliveryStatus), default=DeliveryStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_status_code = Column(Integer, nullable=True)
+    last_error = Column(String(500), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+
+    endpoint = relationship("WebhookEndpoint", back_populates="deliveries")
+
+    __table_args__ = (
+        Index("ix_webhook_deliveries_due", "status", "next_attempt_at"),
+    )
+
+
+class DriverPosition(Base):
+    """Append-only GPS log, written in bulk by services/telemetry.py.
+    Coordinates are stored as integer microdegrees to keep rows small."""
+    __tablename__ = "driver_positions"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    driver_id = Column(Integer, nullable=False)
+    offer_id = Column(Integer, nullable=True)
+    recorded_at = Column(DateTime, nullable=False)
+    lat_e6 = Column(Integer, nullable=False)
+    lng_e6 = Column(Integer, nullable=False)
+    speed_kmh = Column(SmallInteger, nullable=True)
+    heading = Column(SmallInteger, nullable=True)
+
+    __table_args__ = (
+        Index("ix_driver_positions_driver_recorded", "driver_id", "recorded_at"),
+        Index("ix_driver_positions_offer_recorded", "offer_id", "recorded_at"),
+    )
+
+
+class InvoiceRate(Base):
+    """One price in the rate table. `item` is "per_mile", "per_offer" or an additional
+    service name (lower case, e.g. "wait to return client", charged per offer).
+    Client rows override the default (client_id NULL) rows for the same item; the
+    row with the latest effective_from on or before the period start applies."""
+    __tablename__ = "invoice_rates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    item = Column(String(100), nullable=False)
+    unit_price_cents = Column(Integer, nullable=False)
+    effective_from = Column(Date, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_invoice_rates_item_client", "item", "client_id", "effective_from"),
+    )
+
+
+class PricingFactor(Base):
+    """A step in one of the quote multipliers. kind "hour": from `threshold` o'clock
+    (0-23, pickup time) until the next step, wrapping past midnight. kind "demand":
+    from a pending-offers-per-available-driver ratio of `threshold` upwards."""
+    __tablename__ = "pricing_factors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)
+    threshold = Column(Float, nullable=False)
+    multiplier = Column(Float, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("kind", "threshold", name="uq_pricing_factors_kind_threshold"),
+    )
+
+
+class InvoiceRun(Base):
+    """Progress of the invoicing run for one period ("YYYY-MM"). Clients are invoiced in
+    id order and `last_client_id` is committed with each chunk, so an interrupted run
+    resumes after the last committed client. `updated_at` doubles as the run's lease."""
+    __tablename__ = "invoice_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String(7), unique=True, nullable=False)
+    status = Column(SQLEnum(InvoiceRunStatus), default=InvoiceRunStatus.RUNNING, nullable=False)
+    holder = Column(String(100), nullable=True)  # process running it
+    last_client_id = Column(Integer, default=0, nullable=False)
+    invoices_created = Column(Integer, default=0, nullable=False)
+    invoices_rendered = Column(Integer, default=0, nullable=False)
+    last_error = Column(String(500), nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class Invoice(Base):
+    """A client's invoice for one period, with the billing details copied in so it stays
+    unchanged when the account or the rates change later. Amounts are integer cents;
+    `lines` is JSON. html/pdf are filled in by the render step (rendered_at) and are
+    deferred so listing invoices doesn't load them. No foreign key to `users`:
+    invoices are kept when the client is deleted."""
+    __tablename__ = "invoices"
+
+    id = Column(Integer, primary_key=True, index=True)
+    number = Column(String(32), unique=True, nullable=False)
+    client_id = Column(Integer, nullable=False)
+    period = Column(String(7), nullable=False)
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)  # last day of the period
+    bill_to = Column(String, nullable=True)  # company name
+    bill_to_email = Column(String, nullable=True)
+    bill_to_address = Column(String, nullable=True)
+    currency = Column(String(3), nullable=False)
+    offer_count = Column(Integer, nullable=False)
+    total_miles = Column(Float, nullable=False)
+    total_cents = Column(Integer, nullable=False)
+    lines = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    rendered_at = Column(DateTime, nullable=True)
+    html = deferred(Column(LargeBinary, nullable=True))
+    pdf = deferred(Column(LargeBinary, nullable=True))
+
+    __table_args__ = (
+        # One invoice per client and period: re-running a period never bills twice
+        UniqueConstraint("client_id", "period", name="uq_invoices_client_period"),
+        Index("ix_invoices_period_rendered", "period", "rendered_at"),
+    )
@@ -1 +1 @@
-from . import auth, client, admin, driver
\ No newline at end of file
+from . import auth, client, admin, driver, webhooks, invoices
\ No newline at end of file
@@ -1,43 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+import logging
 
-from database import get_db
-from models import User, Offer, Driver, AccountStatus, OfferStatus
+from database import engine, get_db, SessionLocal
+from models import User, Offer, Driver, AccountStatus, OfferStatus, OfferArchive, Invoice, InvoiceRate, InvoiceRun, InvoiceRunStatus, PricingFactor
 from schemas import (
-    UserResponse, UserUpdate, OfferResponse, OfferUpdate, 
-    DriverAssignment, DriverResponse, UserRole, AccountApproval, DriverApproval
+    UserResponse, UserUpdate, OfferResponse, OfferUpdate, OfferSearchResults,
+    DriverAssignment, DriverResponse, UserRole, AccountApproval, DriverApproval, DirectoryMatch,
+    DriverPositionResponse, OfferEta, OfferWithEta, DriverExpiry,
+    BatchRequest, BatchResult, BatchItemResult, UserBatch, DriverBatch, OfferBatch,
+    TimeInStatusReport, LeadTimeReport, InvoiceRateCreate, InvoiceRateResponse, InvoiceRunResponse, InvoiceResponse,
+    QuoteBatch, QuoteBatchResult, PricingFactorSet, PricingFactorResponse
 )
-from auth import require_admin
+from auth import require_admin, revoke_sessions
+from utils import check_not_modified, ListShape, project
+from services import offer_board, directory, telemetry, eta, enqueue_offer_event, scheduler
+from services.search import search_offers
+from services.archive import newest_archived_created_at, TERMINAL_STATUSES
+from services.compliance import expiring_documents, DOCUMENTS
+from services.history import time_in_status, lead_times
+from services.export import EXPORTS, WRITERS, iter_export, parquet_available
+from services.invoicing import InvoiceRunBusy, parse_period, rate_item, run_invoicing
+from services.pricing import FACTOR_KINDS, quote_engine
+from config import BATCH_MAX_OPERATIONS, INVOICE_RUN_LEASE_SECONDS, INVOICE_CURRENCY
+from routes.client import offer_list_shape
+from routes.invoices import DOCUMENT_FORMAT, document_response
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
+logger = logging.getLogger(__name__)
 
 # ===== USER ACCOUNT MANAGEMENT =====
 
 @router.get("/users", response_model=List[UserResponse])
-def get_all_users(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_all_users(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """Get all users with their approval status"""
+    not_modified = check_not_modified(request, response, db, ("users",))
+    if not_modified:
+        return not_modified
+
     users = db.query(User).all()
     return users
 
 @router.get("/users/pending", response_model=List[UserResponse])
-def get_pending_users(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_pending_users(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """Get users pending approval (email verified but not admin approved)"""
+    not_modified = check_not_modified(request, response, db, ("users",))
+    if not_modified:
+        return not_modified
+
     users = db.query(User).filter(
         User.is_verified == "true",
         User.account_status == AccountStatus.PENDING
     ).all()
     return users
 
-@router.put("/users/{user_id}/approve", response_model=UserResponse)
-def approve_user_account(
-    user_id: int, 
-    approval: AccountApproval,
-    current_user: User = Depends(require_admin), 
-    db: Session = Depends(get_db)
-):
-    """Approve, reject, or suspend a user account"""
+def apply_user_approval(db: Session, current_user: User, user_id: int, status: AccountStatus, notes: Optional[str]) -> User:
+    """Checks and changes for one approval; the caller commits. Raises before changing anything."""
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -52,18 +84,31 @@ def approve_user_account(
     
     # Validate status
     valid_statuses = [AccountStatus.APPROVED, AccountStatus.REJECTED, AccountStatus.SUSPENDED]
-    if approval.status not in valid_statuses:
+    if status not in valid_statuses:
         raise HTTPException(
             status_code=400, 
             detail=f"Invalid status. Must be one of: approved, rejected, suspended"
         )
     
+    if status != AccountStatus.APPROVED:
+        revoke_sessions(db, user)
+
     # Update account status
-    user.account_status = approval.status
-    user.approval_notes = approval.notes
+    user.account_status = status
+    user.approval_notes = notes
     user.approved_by = current_user.id
     user.approved_at = datetime.utcnow()
-    
+    return user
+
+@router.put("/users/{user_id}/approve", response_model=UserResponse)
+def approve_user_account(
+    user_id: int, 
+    approval: AccountApproval,
+    current_user: User = Depends(require_admin), 
+    db: Session = Depends(get_db)
+):
+    """Approve, reject, or suspend a user account"""
+    user = apply_user_approval(db, current_user, user_id, approval.status, approval.notes)
     db.commit()
     db.refresh(user)
     
@@ -112,6 +157,9 @@ def update_user(
                 detail="Cannot change account status for drivers through this endpoint. Use driver approval endpoints."
             )
     
+    if user_update.account_status == AccountStatus.SUSPENDED and user.account_status != AccountStatus.SUSPENDED:
+        revoke_sessions(db, user)
+
     # Update all fields
     for key, value in user_update.dict(exclude_unset=True).items():
         setattr(user, key, value)
@@ -121,13 +169,7 @@ def update_user(
     
     return user
 
-@router.delete("/users/{user_id}")
-def delete_user(
-    user_id: int, 
-    current_user: User = Depends(require_admin), 
-    db: Session = Depends(get_db)
-):
-    """Delete a user"""
+def apply_user_deletion(db: Session, current_user: User, user_id: int) -> User:
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -135,40 +177,130 @@ def delete_user(
     if user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
+    revoke_sessions(db, user)
     db.delete(user)
+    return user
+
+@router.delete("/users/{user_id}")
+def delete_user(
+    user_id: int, 
+    current_user: User = Depends(require_admin), 
+    db: Session = Depends(get_db)
+):
+    """Delete a user"""
+    apply_user_deletion(db, current_user, user_id)
     db.commit()
     
     return {"message": "User deleted successfully"}
 
+@router.get("/directory/search", response_model=List[DirectoryMatch])
+def search_directory(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    kind: Optional[str] = Query(None, pattern="^(user|driver)$"),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Typeahead over user email/company/phone and driver name/plate/phone"""
+    directory.ensure_fresh(db)
+    return directory.search(q, limit, kind)
+
 # ===== DRIVER MANAGEMENT =====
 
 @router.get("/drivers", response_model=List[DriverResponse])
-def get_all_drivers(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_all_drivers(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """Get all driver profiles with approval status"""
+    not_modified = check_not_modified(request, response, db, ("drivers",))
+    if not_modified:
+        return not_modified
+
     drivers = db.query(Driver).all()
     return drivers
 
 @router.get("/drivers/pending", response_model=List[DriverResponse])
-def get_pending_drivers(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_pending_drivers(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """Get driver profiles pending approval"""
+    not_modified = check_not_modified(request, response, db, ("drivers",))
+    if not_modified:
+        return not_modified
+
     drivers = db.query(Driver).filter(Driver.driver_status == AccountStatus.PENDING).all()
     return drivers
 
 @router.get("/drivers/approved", response_model=List[DriverResponse])
-def get_approved_drivers(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_approved_drivers(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """Get approved driver profiles"""
+    not_modified = check_not_modified(request, response, db, ("drivers",))
+    if not_modified:
+        return not_modified
+
     drivers = db.query(Driver).filter(Driver.driver_status == AccountStatus.APPROVED).all()
     return drivers
 
 @router.get("/drivers/available", response_model=List[DriverResponse])
-def get_available_drivers(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+def get_available_drivers(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
     """Get approved drivers who are currently available"""
+    not_modified = check_not_modified(request, response, db, ("drivers",))
+    if not_modified:
+        return not_modified
+
     drivers = db.query(Driver).filter(
         Driver.driver_status == AccountStatus.APPROVED,
         Driver.status == "available"
     ).all()
     return drivers
 
+@router.get("/drivers/expiring", response_model=List[DriverExpiry])
+def get_expiring_documents(
+    within_days: int = Query(30, ge=0, le=365),
+    document: Optional[str] = Query(None, description="license or insurance; both when omitted"),
+    include_expired: bool = True,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Driver licenses and insurance expiring within the window, soonest first"""
+    if document is not None and document not in DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"Invalid document. Must be one of: {list(DOCUMENTS)}")
+
+    return expiring_documents(db, within_days, include_expired, document)
+
+@router.get("/drivers/positions", response_model=List[DriverPositionResponse])
+def get_driver_positions(current_user: User = Depends(require_admin)):
+    """Latest known position of every driver that has reported one to this server process"""
+    return telemetry.latest_all()
+
+@router.get("/drivers/{driver_id}/position", response_model=DriverPositionResponse)
+def get_driver_position(
+    driver_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Latest position of one driver"""
+    position = telemetry.latest_or_stored(db, driver_id)
+    if not position:
+        raise HTTPException(status_code=404, detail="No position reported for this driver")
+    return position
+
 @router.get("/drivers/by-email/{email}")
 def get_driver_by_email(
     email: str, 
@@ -186,56 +318,50 @@ def get_driver_by_email(
     
     return driver
 
-@router.put("/drivers/{driver_id}/approve", response_model=DriverResponse)
-def approve_driver(
-    driver_id: int,
-    approval: DriverApproval,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
-):
-    """Approve, reject, or suspend a driver profile"""
+def apply_driver_approval(db: Session, current_user: User, driver_id: int, status: AccountStatus, notes: Optional[str]) -> Driver:
     driver = db.query(Driver).filter(Driver.id == driver_id).first()
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
     # Validate status
     valid_statuses = [AccountStatus.APPROVED, AccountStatus.REJECTED, AccountStatus.SUSPENDED]
-    if approval.status not in valid_statuses:
+    if status not in valid_statuses:
         raise HTTPException(
             status_code=400, 
             detail=f"Invalid status. Must be one of: approved, rejected, suspended"
         )
     
     # Update driver approval status
-    driver.driver_status = approval.status
-    driver.driver_approval_notes = approval.notes
+    driver.driver_status = status
+    driver.driver_approval_notes = notes
     driver.driver_approved_by = current_user.id
     driver.driver_approved_at = datetime.utcnow()
     
     # If approved, set operational status to available
-    if approval.status == AccountStatus.APPROVED:
+    if status == AccountStatus.APPROVED:
         driver.status = "available"
     # If rejected/suspended, set to offline
     else:
         driver.status = "offline"
     
     driver.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(driver)
-    
     return driver
 
-@router.put("/drivers/{driver_id}/status", response_model=DriverResponse)
-def update_driver_approval_status(
+@router.put("/drivers/{driver_id}/approve", response_model=DriverResponse)
+def approve_driver(
     driver_id: int,
-    status: str,
+    approval: DriverApproval,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """
-    Update driver approval status (pending/approved/rejected/suspended).
-    This replaces the old operational status endpoint.
-    """
+    """Approve, reject, or suspend a driver profile"""
+    driver = apply_driver_approval(db, current_user, driver_id, approval.status, approval.notes)
+    db.commit()
+    db.refresh(driver)
+    
+    return driver
+
+def apply_driver_approval_status(db: Session, current_user: User, driver_id: int, status: str) -> Driver:
     driver = db.query(Driver).filter(Driver.id == driver_id).first()
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
@@ -268,19 +394,185 @@ def update_driver_approval_status(
         driver.status = "offline"
     
     driver.updated_at = datetime.utcnow()
+    return driver
+
+@router.put("/drivers/{driver_id}/status", response_model=DriverResponse)
+def update_driver_approval_status(
+    driver_id: int,
+    status: str,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Update driver approval status (pending/approved/rejected/suspended).
+    This replaces the old operational status endpoint.
+    """
+    driver = apply_driver_approval_status(db, current_user, driver_id, status)
     db.commit()
     db.refresh(driver)
     
     return driver
 
+# ===== BATCH OPERATIONS =====
+
+def parse_ids(ids: str) -> List[int]:
+    unique = list(dict.fromkeys(int(i) for i in ids.split(",")))
+    if len(unique) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_OPERATIONS} ids per request")
+    return unique
+
+def fetch_batch(db: Session, model, ids: str) -> dict:
+    wanted = parse_ids(ids)
+    found = {row.id: row for row in db.query(model).filter(model.id.in_(wanted))}
+    return {
+        "items": [found[i] for i in wanted if i in found],
+        "missing": [i for i in wanted if i not in found],
+    }
+
+IDS_QUERY = Query(..., pattern=r"^\d+(,\d+)*$", description="Comma-separated ids")
+
+@router.get("/users/batch", response_model=UserBatch)
+def get_users_batch(ids: str = IDS_QUERY, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+    """Several users by id in one request, in the order asked"""
+    return fetch_batch(db, User, ids)
+
+@router.get("/drivers/batch", response_model=DriverBatch)
+def get_drivers_batch(ids: str = IDS_QUERY, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+    """Several driver profiles by id in one request, in the order asked"""
+    return fetch_batch(db, Driver, ids)
+
+@router.get("/offers/batch", response_model=OfferBatch)
+def get_offers_batch(ids: str = IDS_QUERY, current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+    """Several offers by id in one request, in the order asked"""
+    return fetch_batch(db, Offer, ids)
+
+def apply_batch_operation(db: Session, current_user: User, op) -> int:
+    """Apply one operation with the same checks as its single endpoint; returns the id it targeted."""
+    if op.op == "approve_user":
+        apply_user_approval(db, current_user, op.user_id, op.status, op.notes)
+        return op.user_id
+    if op.op == "approve_driver":
+        apply_driver_approval(db, current_user, op.driver_id, op.status, op.notes)
+        return op.driver_id
+    if op.op == "set_driver_status":
+        apply_driver_approval_status(db, current_user, op.driver_id, op.status)
+        return op.driver_id
+    if op.op == "assign_driver":
+        apply_driver_assignment(db, op.offer_id, op.driver_id, op.status.value)
+        return op.offer_id
+    apply_user_deletion(db, current_user, op.user_id)
+    return op.user_id
+
+def flush_batch(db: Session, index: Optional[int], op: Optional[str], target: Optional[int]) -> None:
+    try:
+        db.flush()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        where = f"Operation {index} ({op} {target})" if index is not None else "The batch"
+        raise HTTPException(
+            status_code=409,
+            detail=f"{where} could not be applied, nothing was committed: {getattr(exc, 'orig', exc)}"
+        )
+
+@router.post("/batch", response_model=BatchResult)
+def run_batch(
+    batch: BatchRequest,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Apply approvals, driver status changes, driver assignments and user deletions in
+    one transaction, in order. Each operation gets its own result; one that fails its
+    checks is skipped. With atomic=true nothing is committed if any operation fails.
+    """
+    results = []
+    for index, op in enumerate(batch.operations):
+        target = getattr(op, "offer_id", None) or getattr(op, "user_id", None) or getattr(op, "driver_id")
+        try:
+            apply_batch_operation(db, current_user, op)
+        except HTTPException as exc:
+            results.append(BatchItemResult(
+                index=index, op=op.op, id=target, ok=False, status_code=exc.status_code, detail=exc.detail
+            ))
+            continue
+        results.append(BatchItemResult(index=index, op=op.op, id=target, ok=True, status_code=200))
+        if op.op == "delete_user":
+            # Updates are seen by later lookups through the identity map; deletions need a
+            # flush since the session doesn't autoflush
+            flush_batch(db, index, op.op, target)
+
+    failed = sum(not result.ok for result in results)
+    committed = not (batch.atomic and failed)
+    if committed:
+        flush_batch(db, None, None, None)
+        db.commit()
+        if any(result.ok and result.op == "assign_driver" for result in results):
+            offer_board.invalidate()
+    else:
+        db.rollback()
+
+    return {
+        "committed": committed,
+        "applied": len(results) - failed if committed else 0,
+        "failed": failed,
+        "results": results,
+    }
+
 # ===== OFFER MANAGEMENT =====
 
 @router.get("/offers", response_model=List[OfferResponse])
-def get_all_offers(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
-    """Get all offers"""
+def get_all_offers(
+    request: Request,
+    response: Response,
+    shape: ListShape = Depends(offer_list_shape),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Get all offers (?fields= and ?format=columns supported)"""
+    not_modified = check_not_modified(request, response, db, ("offers",), *shape)
+    if not_modified:
+        return not_modified
+
+    if shape.projected:
+        return shape.respond(project(db.query(Offer), Offer, shape.columns), response)
+
     offers = db.query(Offer).all()
     return offers
 
+@router.get("/offers/search", response_model=OfferSearchResults)
+def search_all_offers(
+    q: str = Query(..., min_length=1),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over description, addresses, representative and client company, best match first"""
+    total, offers = search_offers(db, q, page, page_size)
+    return {"query": q, "page": page, "page_size": page_size, "total": total, "results": offers}
+
+@router.get("/offers/etas", response_model=List[OfferEta])
+def get_offer_etas(current_user: User = Depends(require_admin), db: Session = Depends(get_db)):
+    """ETAs of every in-progress offer, soonest arrival first"""
+    return sorted(eta.get_all(db), key=lambda e: e["eta"])
+
+@router.get("/offers/{offer_id}", response_model=OfferWithEta)
+def get_offer(
+    offer_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Get any offer's details. In-progress offers include an ETA"""
+    offer = db.query(Offer).filter(Offer.id == offer_id).first()
+    if not offer:
+        raise HTTPException(status_code=404, detail="Offer not found")
+
+    result = OfferWithEta.model_validate(offer)
+    estimate = eta.get(db, offer)
+    if estimate:
+        result.eta = OfferEta(**estimate)
+    return result
+
 @router.put("/offers/{offer_id}/assign-driver", response_model=OfferResponse)
 def assign_driver(
     offer_id: int, 
@@ -304,18 +596,11 @@ def assign_driver(
     
     db.commit()
     db.refresh(offer)
+    offer_board.invalidate()
     
     return offer
 
-@router.put("/offers/{offer_id}/assign-driver-by-id")
-def assign_driver_by_id(
-    offer_id: int,
-    driver_id: int,
-    status: str,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
-):
-    """Assign an approved driver to an offer using driver ID"""
+def apply_driver_assignment(db: Session, offer_id: int, driver_id: int, status: str) -> Offer:
     offer = db.query(Offer).filter(Offer.id == offer_id).first()
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
@@ -347,8 +632,22 @@ def assign_driver_by_id(
         driver.status = "busy"
         driver.updated_at = datetime.utcnow()
     
+    enqueue_offer_event(db, offer)
+    return offer
+
+@router.put("/offers/{offer_id}/assign-driver-by-id")
+def assign_driver_by_id(
+    offer_id: int,
+    driver_id: int,
+    status: str,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Assign an approved driver to an offer using driver ID"""
+    offer = apply_driver_assignment(db, offer_id, driver_id, status)
     db.commit()
     db.refresh(offer)
+    offer_board.invalidate()
     
     return offer
 
@@ -364,15 +663,27 @@ def admin_update_offer(
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
     
-    for key, value in offer_update.dict(exclude_unset=True).items():
+    changes = offer_update.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(offer, key, value)
+    if changes.keys() & {"total_mileage", "pickup_time", "additional_service"}:
+        offer.quote_cents = quote_engine.quote(db, offer, offer.client_id)
     
     offer.updated_at = datetime.utcnow()
+    enqueue_offer_event(db, offer, "offer.updated")
     db.commit()
     db.refresh(offer)
+    offer_board.invalidate()
     
     return offer
 
+# ===== MAINTENANCE =====
+
+@router.get("/scheduler")
+def get_scheduler_status(current_user: User = Depends(require_admin)):
+    """Scheduled maintenance jobs: current leader, schedules, last runs and timings"""
+    return scheduler.status()
+
 # ===== REPORTS =====
 
 @router.get("/reports/trips")
@@ -388,27 +699,10 @@ def get_trips_report(
     Returns trips data and summary statistics.
     """
     try:
-        # Build query
-        query = db.query(Offer)
-        
-        # Filter by status if provided
-        if status and status != "all":
-            if status == "completed":
-                query = query.filter(Offer.status == OfferStatus.COMPLETED)
-            elif status == "in_progress":
-                query = query.filter(Offer.status == OfferStatus.IN_PROGRESS)
-            elif status == "cancelled":
-                query = query.filter(Offer.status == OfferStatus.CANCELLED)
-            elif status == "matched":
-                query = query.filter(Offer.status == OfferStatus.MATCHED)
-            elif status == "pending":
-                query = query.filter(Offer.status == OfferStatus.PENDING)
-        
-        # Filter by date range if provided
+        start_datetime = end_datetime = None
         if start_date:
             try:
                 start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-                query = query.filter(Offer.created_at >= start_datetime)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid start_date format. Use YYYY-MM-DD")
         
@@ -418,15 +712,40 @@ def get_trips_report(
                 end_datetime = datetime.strptime(end_date, "%Y-%m-%d")
                 from datetime import timedelta
                 end_datetime = end_datetime + timedelta(days=1)
-                query = query.filter(Offer.created_at < end_datetime)
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid end_date format. Use YYYY-MM-DD")
-        
+
+        status_map = {
+            "completed": OfferStatus.COMPLETED,
+            "in_progress": OfferStatus.IN_PROGRESS,
+            "cancelled": OfferStatus.CANCELLED,
+            "matched": OfferStatus.MATCHED,
+            "pending": OfferStatus.PENDING,
+        }
+        status_filter = status_map.get(status) if status and status != "all" else None
+
+        def trips_query(model):
+            query = db.query(model)
+            # Filter by status if provided
+            if status_filter is not None:
+                query = query.filter(model.status == status_filter)
+            # Filter by date range if provided
+            if start_datetime:
+                query = query.filter(model.created_at >= start_datetime)
+            if end_datetime:
+                query = query.filter(model.created_at < end_datetime)
+            return query
+
+        offers = trips_query(Offer).all()
+
+        # Include archived offers only when the filters can reach them
+        if status_filter in (None, *TERMINAL_STATUSES):
+            newest_archived = newest_archived_created_at(db)
+            if newest_archived and (start_datetime is None or start_datetime <= newest_archived):
+                offers += trips_query(OfferArchive).all()
+
         # Order by creation date descending
-        query = query.order_by(Offer.created_at.desc())
-        
-        # Get all matching offers
-        offers = query.all()
+        offers.sort(key=lambda o: o.created_at or datetime.min, reverse=True)
         
         # Calculate statistics
         total_trips = len(offers)
@@ -500,4 +819,281 @@ def get_trips_report(
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+# ===== ANALYTICS =====
+
+ANALYTICS_DEFAULT_DAYS = 30
+
+def analytics_window(start_date: Optional[str], end_date: Optional[str]) -> tuple:
+    """[start, end) from YYYY-MM-DD dates, end inclusive; the last 30 days by default."""
+    try:
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1) if end_date else datetime.utcnow()
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else end - timedelta(days=ANALYTICS_DEFAULT_DAYS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    return start, end
+
+def parse_percentiles(percentiles: str) -> List[float]:
+    try:
+        values = [float(p) for p in percentiles.split(",") if p.strip()]
+    except ValueError:
+        values = []
+    if not values or len(values) > 10 or any(not 0 < p <= 100 for p in values):
+        raise HTTPException(status_code=400, detail="percentiles must be 1-10 comma-separated numbers in (0, 100]")
+    return values
+
+ANALYTICS_GROUP_BY = Query("none", pattern="^(none|client|driver|period)$")
+ANALYTICS_PERIOD = Query("week", pattern="^(day|week|month)$", description="Bucket size when group_by=period")
+
+@router.get("/analytics/time-in-status", response_model=TimeInStatusReport)
+def get_time_in_status(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    group_by: str = ANALYTICS_GROUP_BY,
+    period: str = ANALYTICS_PERIOD,
+    client_id: Optional[int] = None,
+    driver_id: Optional[int] = None,
+    status: Optional[OfferStatus] = None,
+    percentiles: str = "50,90,99",
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Percentile time offers spent in each status, from the offer_events history"""
+    start, end = analytics_window(start_date, end_date)
+    results = time_in_status(db, start, end, group_by, period, client_id, driver_id, status,
+                             parse_percentiles(percentiles))
+    return {
+        "start": start, "end": end, "group_by": group_by,
+        "results": [{"status": row.pop("name"), **row} for row in results]
+    }
+
+@router.get("/analytics/lead-times", response_model=LeadTimeReport)
+def get_lead_times(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    group_by: str = ANALYTICS_GROUP_BY,
+    period: str = ANALYTICS_PERIOD,
+    client_id: Optional[int] = None,
+    driver_id: Optional[int] = None,
+    percentiles: str = "50,90,99",
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Percentile time-to-match and time-to-complete for offers created in the window"""
+    start, end = analytics_window(start_date, end_date)
+    results = lead_times(db, start, end, group_by, period, client_id, driver_id, parse_percentiles(percentiles))
+    return {
+        "start": start, "end": end, "group_by": group_by,
+        "results": [{"metric": row.pop("name"), **row} for row in results]
+    }
+
+# ===== EXPORTS =====
+
+@router.get("/exports/{table}")
+def export_table(
+    table: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    format: str = Query("parquet", pattern="^(parquet|csv)$"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Download offers, drivers or offer_events changed between two dates (last 30 days by default)
+    as one Parquet or CSV file, streamed in batches. For scheduled daily partitions use export.py.
+    """
+    if table not in EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export. Must be one of {list(EXPORTS)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs pyarrow on the server; use format=csv")
+    start, end = analytics_window(start_date, end_date)
+    writer = WRITERS[format]
+    filename = f"{table}_{start:%Y-%m-%d}_{(end - timedelta(microseconds=1)):%Y-%m-%d}{writer.suffix}"
+    return StreamingResponse(
+        iter_export(engine, table, start, end, format),
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ===== INVOICING =====
+
+@router.get("/invoices/rates", response_model=List[InvoiceRateResponse])
+def get_invoice_rates(
+    client_id: Optional[int] = None,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """The rate table: default rates, or one client's overrides"""
+    return db.query(InvoiceRate).filter(InvoiceRate.client_id == client_id).order_by(
+        InvoiceRate.item, InvoiceRate.effective_from
+    ).all()
+
+@router.post("/invoices/rates", response_model=InvoiceRateResponse)
+def create_invoice_rate(
+    rate: InvoiceRateCreate,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Add a rate from `effective_from` on. `item` is per_mile, per_offer or an additional
+    service name (charged per offer, matched case-insensitively). Periods already
+    invoiced keep the rates they were invoiced with; new quotes use it right away.
+    """
+    if rate.client_id is not None:
+        client = db.query(User).filter(User.id == rate.client_id, User.role == UserRole.CLIENT).first()
+        if not client:
+            raise HTTPException(status_code=404, detail="Client not found")
+    new_rate = InvoiceRate(
+        client_id=rate.client_id,
+        item=rate_item(rate.item),
+        unit_price_cents=rate.unit_price_cents,
+        effective_from=rate.effective_from
+    )
+    db.add(new_rate)
+    db.commit()
+    db.refresh(new_rate)
+    quote_engine.invalidate()
+    return new_rate
+
+@router.delete("/invoices/rates/{rate_id}")
+def delete_invoice_rate(
+    rate_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Remove a rate entered by mistake"""
+    rate = db.query(InvoiceRate).filter(InvoiceRate.id == rate_id).first()
+    if not rate:
+        raise HTTPException(status_code=404, detail="Rate not found")
+    db.delete(rate)
+    db.commit()
+    quote_engine.invalidate()
+    return {"message": "Rate deleted successfully"}
+
+def run_invoicing_in_background(period: str) -> None:
+    with SessionLocal() as db:
+        try:
+            run_invoicing(db, period)
+        except InvoiceRunBusy:
+            pass  # another start carries on with it
+        except Exception:
+            # Failures after the claim are also recorded on the run (POST again to resume);
+            # earlier ones would otherwise leave no trace at all
+            logger.exception("Invoicing run for %s failed", period)
+
+@router.post("/invoices/runs/{period}", response_model=InvoiceRunResponse, status_code=202)
+def start_invoice_run(
+    period: str,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Invoice every client with offers completed in `period` (YYYY-MM) and render the PDFs,
+    in the background. Repeating it is safe: a failed or interrupted run resumes where it
+    stopped, and a completed one is returned unchanged. Poll GET /admin/invoices/runs.
+    """
+    try:
+        start, end = parse_period(period)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if end > datetime.utcnow().date():
+        raise HTTPException(status_code=400, detail="The period hasn't ended yet")
+
+    run = db.query(InvoiceRun).filter(InvoiceRun.period == period).first()
+    if run and run.status == InvoiceRunStatus.COMPLETED:
+        response.status_code = 200
+        return run
+    if run and run.status == InvoiceRunStatus.RUNNING and \
+            run.updated_at > datetime.utcnow() - timedelta(seconds=INVOICE_RUN_LEASE_SECONDS):
+        raise HTTPException(status_code=409, detail=f"Invoicing for {period} is already running")
+
+    background_tasks.add_task(run_invoicing_in_background, period)
+    now = datetime.utcnow()
+    return run or InvoiceRun(period=period, status=InvoiceRunStatus.RUNNING, last_client_id=0,
+                             invoices_created=0, invoices_rendered=0, started_at=now, updated_at=now)
+
+@router.get("/invoices/runs", response_model=List[InvoiceRunResponse])
+def get_invoice_runs(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Invoicing runs, newest period first"""
+    return db.query(InvoiceRun).order_by(InvoiceRun.period.desc()).all()
+
+@router.get("/invoices", response_model=List[InvoiceResponse])
+def get_invoices(
+    period: Optional[str] = None,
+    client_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Invoices by period and/or client"""
+    query = db.query(Invoice)
+    if period:
+        query = query.filter(Invoice.period == period)
+    if client_id is not None:
+        query = query.filter(Invoice.client_id == client_id)
+    return query.order_by(Invoice.period.desc(), Invoice.client_id).offset(offset).limit(limit).all()
+
+@router.get("/invoices/{invoice_id}/document")
+def get_invoice_document(
+    invoice_id: int,
+    format: str = DOCUMENT_FORMAT,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Download any invoice as PDF (default) or HTML"""
+    return document_response(db, invoice_id, format)
+
+# ===== PRICING =====
+
+@router.get("/pricing/factors", response_model=List[PricingFactorResponse])
+def get_pricing_factors(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Time-of-day and demand multipliers applied to quotes"""
+    return db.query(PricingFactor).order_by(PricingFactor.kind, PricingFactor.threshold).all()
+
+@router.put("/pricing/factors/{kind}", response_model=List[PricingFactorResponse])
+def set_pricing_factors(
+    kind: str,
+    factor_set: PricingFactorSet,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Replace the steps of one multiplier. kind=hour: thresholds are pickup hours (0-23),
+    each step lasting until the next one. kind=demand: thresholds are pending offers
+    per available driver, each step applying from its ratio up. An empty list means 1.0.
+    """
+    if kind not in FACTOR_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown pricing factor. Must be one of {list(FACTOR_KINDS)}")
+    thresholds = [step.threshold for step in factor_set.steps]
+    if len(set(thresholds)) != len(thresholds):
+        raise HTTPException(status_code=400, detail="Thresholds must be unique")
+    if kind == "hour" and any(t > 23 or t != int(t) for t in thresholds):
+        raise HTTPException(status_code=400, detail="Hour thresholds must be whole hours from 0 to 23")
+
+    for factor in db.query(PricingFactor).filter(PricingFactor.kind == kind):
+        db.delete(factor)
+    db.flush()
+    for step in factor_set.steps:
+        db.add(PricingFactor(kind=kind, threshold=step.threshold, multiplier=step.multiplier))
+    db.commit()
+    quote_engine.invalidate()
+    return db.query(PricingFactor).filter(PricingFactor.kind == kind).order_by(PricingFactor.threshold).all()
+
+@router.post("/pricing/quotes", response_model=QuoteBatchResult)
+def quote_candidates(
+    batch: QuoteBatch,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Price candidate offers, each at its client's rates when client_id is set"""
+    return {"currency": INVOICE_CURRENCY, **quote_engine.quote_many(db, batch.candidates)}
@@ -1,30 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Response, Cookie
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response, Cookie
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Optional
-import secrets
 
 from database import get_db
-from models import User
+from models import User, TokenPurpose
 from schemas import UserSignup, Token, UserResponse
 from auth import get_password_hash, verify_password, create_access_token, create_refresh_token, get_current_user
+from auth import issue_token, find_token, session_state, token_claims, revoke_sessions, decode_token, token_backend
 from utils import send_verification_email, send_password_reset_email, send_password_changed_email
+from services import rate_limiter
 from config import ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
-from jose import JWTError, jwt
-from config import SECRET_KEY, ALGORITHM
+from config import VERIFICATION_TOKEN_EXPIRE_HOURS, PASSWORD_RESET_EXPIRE_MINUTES
+from jose import JWTError
 
 router = APIRouter(prefix="", tags=["Authentication"])
 
 
 @router.post("/signup", response_model=dict)
-def signup(user: UserSignup, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def signup(user: UserSignup, request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    rate_limiter.hit(request, "signup")
     db_user = db.query(User).filter(User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    verification_token = secrets.token_urlsafe(32)
-
     new_user = User(
         email=user.email,
         hashed_password=get_password_hash(user.password),
@@ -33,13 +33,16 @@ def signup(user: UserSignup, background_tasks: BackgroundTasks, db: Session = De
         address=user.address,
         phone_number=user.phone_number,
         company_representative=user.company_representative,
-        emergency_phone=user.emergency_phone,
-        verification_token=verification_token
+        emergency_phone=user.emergency_phone
     )
 
     db.add(new_user)
+    db.flush()
+    verification_token = issue_token(
+        db, new_user, TokenPurpose.EMAIL_VERIFICATION,
+        timedelta(hours=VERIFICATION_TOKEN_EXPIRE_HOURS)
+    )
     db.commit()
-    db.refresh(new_user)
 
     background_tasks.add_task(send_verification_email, user.email, verification_token)
 
@@ -47,13 +50,27 @@ def signup(user: UserSignup, background_tasks: BackgroundTasks, db: Session = De
 
 
 @router.get("/verify-email")
-def verify_email(token: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.verification_token == token).first()
-    if not user:
+def verify_email(token: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    auth_token = find_token(db, token, TokenPurpose.EMAIL_VERIFICATION)
+    if not auth_token:
         raise HTTPException(status_code=400, detail="Invalid verification token")
 
+    user = auth_token.user
+    if auth_token.expires_at < datetime.utcnow():
+        # Send a fresh link rather than leaving the account unverifiable
+        new_token = issue_token(
+            db, user, TokenPurpose.EMAIL_VERIFICATION,
+            timedelta(hours=VERIFICATION_TOKEN_EXPIRE_HOURS)
+        )
+        db.commit()
+        background_tasks.add_task(send_verification_email, user.email, new_token)
+        raise HTTPException(
+            status_code=400,
+            detail="This verification link has expired. A new one has been sent to your email."
+        )
+
     user.is_verified = "true"
-    user.verification_token = None
+    db.delete(auth_token)
     db.commit()
 
     return {"message": "Email verified successfully. You can now login."}
@@ -61,10 +78,13 @@ def verify_email(token: str, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=Token)
 def login(
+    request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
+    # Limited per address and per account before the bcrypt check
+    rate_limiter.hit(request, "login", account=form_data.username)
     user = db.query(User).filter(User.email == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -78,13 +98,13 @@ def login(
 
     #  Issue short-lived access token — returned in JSON, stored in JS memory
     access_token = create_access_token(
-        data={"sub": user.email},
+        data=token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
     #  Issue long-lived refresh token — stored in HttpOnly cookie, JS never sees it
     refresh_token = create_refresh_token(
-        data={"sub": user.email},
+        data=token_claims(user),
         expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     )
 
@@ -111,6 +131,8 @@ def refresh_access_token(
      Called on every page load by the frontend to restore the session.
     Reads the HttpOnly refresh cookie — JS never touches it directly.
     Returns a fresh short-lived access token in the JSON body.
+    The token's version and jti are checked against in-memory session state,
+    so this usually needs no database round trip.
     """
     if not refresh_token:
         raise HTTPException(
@@ -119,7 +141,7 @@ def refresh_access_token(
         )
 
     try:
-        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(refresh_token)
         email: str = payload.get("sub")
         token_type: str = payload.get("type")
 
@@ -129,19 +151,26 @@ def refresh_access_token(
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
 
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+    if session_state.is_revoked(db, payload.get("jti")) or session_state.is_revoked(db, payload.get("sid")):
+        raise HTTPException(status_code=401, detail="Refresh token has been revoked")
+
+    version = session_state.version(db, email)
+    if version is None:
         raise HTTPException(status_code=401, detail="User not found")
+    if payload.get("ver", 0) != version:
+        raise HTTPException(status_code=401, detail="Session has been revoked. Please log in again.")
+
+    claims = {"sub": email, "ver": version}
 
     # Issue a new short-lived access token
     new_access_token = create_access_token(
-        data={"sub": user.email},
+        data=claims,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
     #  Rotate the refresh token on each use (more secure)
     new_refresh_token = create_refresh_token(
-        data={"sub": user.email},
+        data={**claims, "sid": payload.get("sid")},
         expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     )
 
@@ -159,11 +188,32 @@ def refresh_access_token(
 
 
 @router.post("/auth/logout")
-def logout(response: Response):
+def logout(
+    response: Response,
+    refresh_token: Optional[str] = Cookie(default=None),
+    db: Session = Depends(get_db)
+):
     """
-     Clears the HttpOnly refresh cookie on logout.
+     Clears the HttpOnly refresh cookie on logout and denylists the login session,
+    so no refresh token issued to it (this one or any rotated before it) can be used
+    to refresh again. Other devices stay signed in.
     Frontend also clears the in-memory access token.
     """
+    if refresh_token:
+        try:
+            payload = decode_token(refresh_token)
+        except JWTError:
+            payload = {}
+        if payload.get("type") == "refresh" and payload.get("sid"):
+            # Later rotations of this session would expire by then at the latest
+            expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+            session_state.revoke(db, payload["sid"], expires_at)
+            db.commit()
+        elif payload.get("type") == "refresh" and payload.get("jti"):
+            # Issued before tokens carried a session id
+            session_state.revoke(db, payload["jti"], datetime.utcfromtimestamp(payload["exp"]))
+            db.commit()
+
     response.delete_cookie(
         key="refresh_token",
         httponly=True,
@@ -174,6 +224,13 @@ def logout(response: Response):
     return {"message": "Logged out successfully"}
 
 
+@router.get("/.well-known/jwks.json")
+def jwks(response: Response):
+    """Public keys for verifying our tokens elsewhere (empty with the shared-secret HS256 backend)"""
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return token_backend.jwks()
+
+
 @router.get("/me", response_model=UserResponse)
 def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
@@ -184,6 +241,7 @@ def read_users_me(current_user: User = Depends(get_current_user)):
 @router.post("/forgot-password", response_model=dict)
 def forgot_password(
     body: dict,
+    request: Request,
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
@@ -192,18 +250,19 @@ def forgot_password(
     Always returns the same success message whether the email exists or not
     — this prevents user enumeration attacks.
     """
-    from datetime import datetime, timedelta
     email = body.get("email", "").strip().lower()
     if not email:
         raise HTTPException(status_code=422, detail="Email is required")
+    rate_limiter.hit(request, "password_reset", account=email)
 
     user = db.query(User).filter(User.email == email).first()
 
     #  Always respond the same way — don't reveal whether the email exists
     if user and user.is_verified == "true":
-        reset_token = secrets.token_urlsafe(32)
-        user.password_reset_token = reset_token
-        user.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
+        reset_token = issue_token(
+            db, user, TokenPurpose.PASSWORD_RESET,
+            timedelta(minutes=PASSWORD_RESET_EXPIRE_MINUTES)
+        )
         db.commit()
         background_tasks.add_task(send_password_reset_email, user.email, reset_token)
 
@@ -213,12 +272,12 @@ def forgot_password(
 # ─── Reset Password (via email link) ─────────────────────────────────────────
 
 @router.post("/reset-password", response_model=dict)
-def reset_password(body: dict, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+def reset_password(body: dict, request: Request, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Accepts { "token": "...", "new_password": "..." }.
     Used from the reset-password.html page linked in the email.
     """
-    from datetime import datetime
+    rate_limiter.hit(request, "password_reset")
     token = body.get("token", "").strip()
     new_password = body.get("new_password", "").strip()
 
@@ -228,22 +287,22 @@ def reset_password(body: dict, background_tasks: BackgroundTasks, db: Session =
     if len(new_password) < 6:
         raise HTTPException(status_code=422, detail="Password must be at least 6 characters")
 
-    user = db.query(User).filter(User.password_reset_token == token).first()
+    auth_token = find_token(db, token, TokenPurpose.PASSWORD_RESET)
 
-    if not user:
+    if not auth_token:
         raise HTTPException(status_code=400, detail="Invalid or expired reset link")
 
-    if user.password_reset_expires < datetime.utcnow():
+    if auth_token.expires_at < datetime.utcnow():
         # Clear expired token
-        user.password_reset_token = None
-        user.password_reset_expires = None
+        db.delete(auth_token)
         db.commit()
         raise HTTPException(status_code=400, detail="This reset link has expired. Please request a new one.")
 
-    # Update password and clear the token
+    # Update password and consume the token
+    user = auth_token.user
     user.hashed_password = get_password_hash(new_password)
-    user.password_reset_token = None
-    user.password_reset_expires = None
+    revoke_sessions(db, user)
+    db.delete(auth_token)
     db.commit()
 
     background_tasks.add_task(send_password_changed_email, user.email)
@@ -256,6 +315,7 @@ def reset_password(body: dict, background_tasks: BackgroundTasks, db: Session =
 @router.post("/change-password", response_model=dict)
 def change_password(
     body: dict,
+    response: Response,
     background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -279,9 +339,28 @@ def change_password(
     if current_password == new_password:
         raise HTTPException(status_code=400, detail="New password must be different from your current password")
 
+    # Signs out every other session; this one gets fresh tokens below
     current_user.hashed_password = get_password_hash(new_password)
+    revoke_sessions(db, current_user)
     db.commit()
 
     background_tasks.add_task(send_password_changed_email, current_user.email)
 
-    return {"message": "Password changed successfully."}
\ No newline at end of file
+    response.set_cookie(
+        key="refresh_token",
+        value=create_refresh_token(
+            data=token_claims(current_user),
+            expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+        ),
+        httponly=True,
+        secure=True,
+        samesite="none",
+        max_age=60 * 60 * 24 * REFRESH_TOKEN_EXPIRE_DAYS,
+        path="/"
+    )
+    access_token = create_access_token(
+        data=token_claims(current_user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+    return {"message": "Password changed successfully.", "access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
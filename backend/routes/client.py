@@ -1,15 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 from datetime import datetime
 
 from database import get_db
-from models import User, Offer, OfferStatus, AccountStatus
-from schemas import OfferCreate, OfferUpdate, OfferResponse
+from models import User, Offer, OfferStatus, AccountStatus, OfferTombstone, OfferArchive
+from schemas import OfferCreate, OfferUpdate, OfferResponse, OfferDelta, OfferSearchResults, OfferEta, OfferWithEta, QuoteBatch, QuoteBatchResult
 from auth import get_current_user
+from utils import check_not_modified, ListShape, list_shape, project
+from services import offer_board, eta
+from services.sync import offer_delta, next_cursor
+from services.search import search_offers
+from services.pricing import quote_engine
+from config import INVOICE_CURRENCY
 
 router = APIRouter(prefix="/offers", tags=["Client Offers"])
 
+# ?fields= and ?format= for offer lists
+offer_list_shape = list_shape(OfferResponse)
+
 # Helper to ensure client is approved
 def require_approved_client(current_user: User = Depends(get_current_user)) -> User:
     """Ensure user is an approved client"""
@@ -48,31 +57,91 @@ def create_offer(
         pickup_address=offer.pickup_address,
         dropoff_address=offer.dropoff_address,
         total_mileage=offer.total_mileage,
-        additional_service=offer.additional_service
+        additional_service=offer.additional_service,
+        quote_cents=quote_engine.quote(db, offer, current_user.id)
     )
     
     db.add(new_offer)
     db.commit()
     db.refresh(new_offer)
+    offer_board.invalidate()
     
     return new_offer
 
-@router.get("/my", response_model=List[OfferResponse])
+@router.post("/quotes", response_model=QuoteBatchResult)
+def quote_offers(
+    batch: QuoteBatch,
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Price up to PRICING_BATCH_MAX candidate offers at the current rates and demand, without creating them"""
+    return {"currency": INVOICE_CURRENCY, **quote_engine.quote_many(db, batch.candidates, client_id=current_user.id)}
+
+@router.get("/my", response_model=Union[List[OfferResponse], OfferDelta])
 def get_my_offers(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    include_archived: bool = False,
+    shape: ListShape = Depends(offer_list_shape),
     current_user: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
-    """Get all offers created by current user - Works for any verified user"""
+    """
+    Get all offers created by current user - Works for any verified user.
+    With ?since=<cursor> only the changes after the cursor are returned.
+    Old completed/cancelled offers are archived; add ?include_archived=true to list them too.
+    ?fields=id,status,... returns only those fields; ?format=columns sends column names once
+    and each offer as an array of values.
+    """
+    not_modified = check_not_modified(
+        request, response, db, ("offers",), current_user.id, since, include_archived, *shape
+    )
+    if not_modified:
+        return not_modified
+
+    if since and shape.projected:
+        raise HTTPException(status_code=400, detail="fields and format can't be combined with since")
+    if since:
+        return offer_delta(
+            db, since,
+            Offer.client_id == current_user.id,
+            OfferTombstone.client_id == current_user.id
+        )
+
+    response.headers["X-Sync-Cursor"] = next_cursor()
+    if shape.projected:
+        rows = project(db.query(Offer).filter(Offer.client_id == current_user.id), Offer, shape.columns)
+        if include_archived:
+            rows += project(
+                db.query(OfferArchive).filter(OfferArchive.client_id == current_user.id), OfferArchive, shape.columns
+            )
+        return shape.respond(rows, response)
+
     offers = db.query(Offer).filter(Offer.client_id == current_user.id).all()
+    if include_archived:
+        offers += db.query(OfferArchive).filter(OfferArchive.client_id == current_user.id).all()
     return offers
 
-@router.get("/{offer_id}", response_model=OfferResponse)
+@router.get("/my/search", response_model=OfferSearchResults)
+def search_my_offers(
+    q: str = Query(..., min_length=1),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over the current user's offers, best match first"""
+    total, offers = search_offers(db, q, page, page_size, client_id=current_user.id)
+    return {"query": q, "page": page, "page_size": page_size, "total": total, "results": offers}
+
+@router.get("/{offer_id}", response_model=OfferWithEta)
 def get_offer(
     offer_id: int, 
     current_user: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
-    """Get specific offer details - User must own the offer"""
+    """Get specific offer details - User must own the offer. In-progress offers include an ETA"""
     offer = db.query(Offer).filter(Offer.id == offer_id).first()
     if not offer:
         raise HTTPException(status_code=404, detail="Offer not found")
@@ -80,7 +149,11 @@ def get_offer(
     if offer.client_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to view this offer")
     
-    return offer
+    result = OfferWithEta.model_validate(offer)
+    estimate = eta.get(db, offer)
+    if estimate:
+        result.eta = OfferEta(**estimate)
+    return result
 
 @router.put("/{offer_id}", response_model=OfferResponse)
 def update_offer(
@@ -97,11 +170,15 @@ def update_offer(
     if offer.status != OfferStatus.PENDING:
         raise HTTPException(status_code=400, detail="Can only update pending offers")
     
-    for key, value in offer_update.dict(exclude_unset=True).items():
+    changes = offer_update.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(offer, key, value)
+    if changes.keys() & {"total_mileage", "pickup_time", "additional_service"}:
+        offer.quote_cents = quote_engine.quote(db, offer, current_user.id)
     
     offer.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(offer)
+    offer_board.invalidate()
     
     return offer
\ No newline at end of file
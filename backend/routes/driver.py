@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Union
 from datetime import datetime
 
 from database import get_db
-from models import User, Driver, Offer, OfferStatus, UserRole, AccountStatus
+from models import User, Driver, Offer, OfferStatus, UserRole, AccountStatus, OfferTombstone, OfferArchive
 from schemas import (
     DriverCreate, DriverUpdate, DriverResponse, 
-    OfferAcceptance, OfferStatusUpdate
+    OfferAcceptance, OfferStatusUpdate, TelemetryBatch
 )
-from schemas.offer import OfferResponse
+from schemas.offer import OfferResponse, OfferDelta
 from auth import get_current_user
+from utils import check_not_modified, etag_matches, cached_response, ListShape, project
+from services import offer_board, telemetry, enqueue_offer_event
+from services.telemetry import clock_skew_error
+from services.sync import offer_delta, next_cursor
+from services.archive import archived_history
+from routes.client import offer_list_shape
 
 router = APIRouter(prefix="/driver", tags=["Driver"])
 
@@ -132,8 +139,11 @@ def update_driver_profile(
             raise HTTPException(status_code=400, detail="Vehicle plate already registered")
     
     # Update fields
-    for key, value in driver_update.dict(exclude_unset=True).items():
+    changes = driver_update.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(driver, key, value)
+    if "license_expiry" in changes or "insurance_expiry" in changes:
+        driver.expiry_reminder_sent_at = None  # remind again about the new dates
     
     driver.updated_at = datetime.utcnow()
     db.commit()
@@ -162,38 +172,70 @@ def update_driver_status(
 
 @router.get("/offers/available", response_model=List[OfferResponse])
 def get_available_offers(
+    request: Request,
+    shape: ListShape = Depends(offer_list_shape),
     driver: Driver = Depends(require_approved_driver),
     db: Session = Depends(get_db)
 ):
-    """Get all available offers - Only approved drivers can see offers"""
-    offers = db.query(Offer).filter(
-        Offer.status == OfferStatus.PENDING,
-        Offer.driver_id == None
-    ).all()
-    
-    return offers
+    """Get all available offers - Only approved drivers can see offers (?fields= and ?format=columns supported)"""
+    # Served from the shared board snapshot — one query per change, not per poll
+    payload, etag = offer_board.get(db, shape)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    return cached_response(request, payload, headers)
 
-@router.get("/offers/my-assignments", response_model=List[OfferResponse])
+@router.get("/offers/my-assignments", response_model=Union[List[OfferResponse], OfferDelta])
 def get_my_assignments(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    shape: ListShape = Depends(offer_list_shape),
     driver: Driver = Depends(require_approved_driver),
     db: Session = Depends(get_db)
 ):
-    """Get all offers assigned to this driver"""
-    offers = db.query(Offer).filter(Offer.driver_id == driver.id).all()
-    return offers
+    """Get all offers assigned to this driver (only changes after the cursor with ?since=; ?fields= and ?format=columns otherwise)"""
+    not_modified = check_not_modified(request, response, db, ("offers",), driver.id, since, *shape)
+    if not_modified:
+        return not_modified
+
+    if since and shape.projected:
+        raise HTTPException(status_code=400, detail="fields and format can't be combined with since")
+    if since:
+        return offer_delta(
+            db, since,
+            Offer.driver_id == driver.id,
+            OfferTombstone.driver_id == driver.id
+        )
+
+    response.headers["X-Sync-Cursor"] = next_cursor()
+    query = db.query(Offer).filter(Offer.driver_id == driver.id)
+    if shape.projected:
+        return shape.respond(project(query, Offer, shape.columns), response)
+    return query.all()
 
 @router.get("/offers/active", response_model=List[OfferResponse])
 def get_active_offers(
+    request: Request,
+    response: Response,
+    shape: ListShape = Depends(offer_list_shape),
     driver: Driver = Depends(require_approved_driver),
     db: Session = Depends(get_db)
 ):
     """Get driver's active offers (matched or in_progress)"""
-    offers = db.query(Offer).filter(
+    not_modified = check_not_modified(request, response, db, ("offers",), driver.id, *shape)
+    if not_modified:
+        return not_modified
+
+    query = db.query(Offer).filter(
         Offer.driver_id == driver.id,
         Offer.status.in_([OfferStatus.MATCHED, OfferStatus.IN_PROGRESS])
-    ).all()
+    )
+    if shape.projected:
+        return shape.respond(project(query, Offer, shape.columns), response)
     
-    return offers
+    return query.all()
 
 @router.get("/offers/{offer_id}", response_model=OfferResponse)
 def get_offer_details(
@@ -246,7 +288,9 @@ def accept_offer(
     driver.status = "busy"
     driver.updated_at = datetime.utcnow()
     
+    enqueue_offer_event(db, offer)
     db.commit()
+    offer_board.invalidate()
     
     return {"message": "Offer accepted successfully", "offer_id": offer_id}
 
@@ -294,7 +338,11 @@ def update_offer_status(
     offer.updated_at = datetime.utcnow()
     driver.updated_at = datetime.utcnow()
     
+    enqueue_offer_event(db, offer)
     db.commit()
+    telemetry.forget_active_offer(driver.id)
+    if status_update.status == "cancelled":
+        offer_board.invalidate()
     
     return {
         "message": f"Offer status updated to {status_update.status}",
@@ -302,6 +350,26 @@ def update_offer_status(
         "new_status": status_update.status
     }
 
+# ===== GPS TELEMETRY =====
+
+@router.post("/telemetry", status_code=202)
+def upload_telemetry(
+    batch: TelemetryBatch,
+    driver: Driver = Depends(require_approved_driver),
+    db: Session = Depends(get_db)
+):
+    """Upload a batch of GPS points - accepted only while one of the driver's offers is in progress"""
+    error = clock_skew_error(batch.points)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+
+    offer_id = telemetry.active_offer_id(db, driver.id)
+    if offer_id is None:
+        raise HTTPException(status_code=409, detail="Positions are only accepted while an offer is in progress")
+
+    accepted = telemetry.add(driver.id, offer_id, batch.points)
+    return {"accepted": accepted, "offer_id": offer_id}
+
 # ===== STATISTICS & HISTORY =====
 
 @router.get("/statistics")
@@ -328,6 +396,14 @@ def get_driver_statistics(
         Offer.driver_id == driver.id,
         Offer.status == OfferStatus.CANCELLED
     ).count()
+
+    # Archived offers are all completed or cancelled
+    archived = dict(db.query(OfferArchive.status, func.count()).filter(
+        OfferArchive.driver_id == driver.id
+    ).group_by(OfferArchive.status).all())
+    completed += archived.get(OfferStatus.COMPLETED, 0)
+    cancelled += archived.get(OfferStatus.CANCELLED, 0)
+    total_assigned += sum(archived.values())
     
     return {
         "driver_info": {
@@ -346,16 +422,36 @@ def get_driver_statistics(
         }
     }
 
-@router.get("/history", response_model=List[OfferResponse])
+@router.get("/history", response_model=Union[List[OfferResponse], OfferDelta])
 def get_delivery_history(
+    request: Request,
+    response: Response,
     limit: int = 50,
+    since: Optional[str] = None,
     driver: Driver = Depends(require_approved_driver),
     db: Session = Depends(get_db)
 ):
-    """Get driver's delivery history - Only approved drivers"""
+    """Get driver's delivery history - Only approved drivers (only changes after the cursor with ?since=)"""
+    not_modified = check_not_modified(request, response, db, ("offers",), driver.id, limit, since)
+    if not_modified:
+        return not_modified
+
+    if since:
+        return offer_delta(
+            db, since,
+            Offer.driver_id == driver.id,
+            OfferTombstone.driver_id == driver.id,
+            Offer.status.in_([OfferStatus.COMPLETED, OfferStatus.CANCELLED])
+        )
+
+    response.headers["X-Sync-Cursor"] = next_cursor()
     offers = db.query(Offer).filter(
         Offer.driver_id == driver.id,
         Offer.status.in_([OfferStatus.COMPLETED, OfferStatus.CANCELLED])
     ).order_by(Offer.updated_at.desc()).limit(limit).all()
+
+    # Older history lives in offers_archive — only read it when the hot table runs short
+    if len(offers) < limit:
+        offers += archived_history(db, driver.id, limit - len(offers))
     
     return offers
\ No newline at end of file
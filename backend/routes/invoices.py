@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, undefer
+from typing import List, Optional
+
+from database import get_db
+from models import User, Invoice
+from schemas import InvoiceResponse
+from routes.client import require_approved_client
+
+router = APIRouter(prefix="/invoices", tags=["Invoices"])
+
+DOCUMENT_FORMAT = Query("pdf", pattern="^(pdf|html)$")
+
+def document_response(db: Session, invoice_id: int, format: str, client_id: Optional[int] = None) -> Response:
+    """The stored PDF or HTML of an invoice; only its own invoices when `client_id` is given."""
+    query = db.query(Invoice).options(undefer(getattr(Invoice, format))).filter(Invoice.id == invoice_id)
+    if client_id is not None:
+        query = query.filter(Invoice.client_id == client_id)
+    invoice = query.first()
+    if not invoice:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    if invoice.rendered_at is None:
+        raise HTTPException(status_code=409, detail="Invoice is still being prepared. Try again shortly.")
+
+    media_type = "application/pdf" if format == "pdf" else "text/html; charset=utf-8"
+    disposition = "attachment" if format == "pdf" else "inline"
+    return Response(
+        content=getattr(invoice, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'{disposition}; filename="{invoice.number}.{format}"'},
+    )
+
+@router.get("", response_model=List[InvoiceResponse])
+def list_my_invoices(
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """The current client's invoices, newest period first"""
+    return db.query(Invoice).filter(Invoice.client_id == current_user.id).order_by(Invoice.period.desc()).all()
+
+@router.get("/{invoice_id}/document")
+def get_my_invoice_document(
+    invoice_id: int,
+    format: str = DOCUMENT_FORMAT,
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Download one of the current client's invoices as PDF (default) or HTML"""
+    return document_response(db, invoice_id, format, client_id=current_user.id)
@@ -0,0 +1,115 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+import secrets
+
+from database import get_db
+from models import User, WebhookEndpoint, WebhookDelivery
+from schemas import WebhookCreate, WebhookResponse, WebhookCreated, WebhookDeliveryResponse
+from services.webhooks import EVENT_TYPES, enqueue_event, validate_url
+from routes.client import require_approved_client
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+def get_own_endpoint(db: Session, endpoint_id: int, current_user: User) -> WebhookEndpoint:
+    endpoint = db.query(WebhookEndpoint).filter(
+        WebhookEndpoint.id == endpoint_id,
+        WebhookEndpoint.client_id == current_user.id
+    ).first()
+    if not endpoint:
+        raise HTTPException(status_code=404, detail="Webhook not found")
+    return endpoint
+
+@router.post("", response_model=WebhookCreated)
+def create_webhook(
+    webhook: WebhookCreate,
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Register a URL for offer lifecycle events - the signing secret is only shown here"""
+    error = validate_url(webhook.url)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    if webhook.events is not None:
+        unknown = sorted(set(webhook.events) - set(EVENT_TYPES))
+        if unknown or not webhook.events:
+            raise HTTPException(status_code=400, detail=f"Unknown event types. Must be from: {list(EVENT_TYPES)}")
+
+    endpoint = WebhookEndpoint(
+        client_id=current_user.id,
+        url=webhook.url,
+        secret=secrets.token_hex(32),
+        events=",".join(sorted(set(webhook.events))) if webhook.events else None
+    )
+    db.add(endpoint)
+    db.commit()
+    db.refresh(endpoint)
+
+    return endpoint
+
+@router.get("", response_model=List[WebhookResponse])
+def list_webhooks(
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """List the current user's webhooks"""
+    return db.query(WebhookEndpoint).filter(WebhookEndpoint.client_id == current_user.id).all()
+
+@router.delete("/{endpoint_id}")
+def delete_webhook(
+    endpoint_id: int,
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Delete a webhook together with its pending deliveries"""
+    endpoint = get_own_endpoint(db, endpoint_id, current_user)
+    db.delete(endpoint)
+    db.commit()
+
+    return {"message": "Webhook deleted successfully"}
+
+@router.post("/{endpoint_id}/enable", response_model=WebhookResponse)
+def enable_webhook(
+    endpoint_id: int,
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Re-enable a webhook disabled after repeated failures - its pending deliveries resume"""
+    endpoint = get_own_endpoint(db, endpoint_id, current_user)
+    endpoint.disabled_at = None
+    endpoint.disabled_reason = None
+    endpoint.consecutive_failures = 0
+    db.commit()
+    db.refresh(endpoint)
+
+    return endpoint
+
+@router.post("/{endpoint_id}/ping")
+def ping_webhook(
+    endpoint_id: int,
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Queue a test `ping` event for this webhook"""
+    endpoint = get_own_endpoint(db, endpoint_id, current_user)
+    if endpoint.disabled_at is not None:
+        raise HTTPException(status_code=400, detail="Webhook is disabled. Enable it first.")
+
+    deliveries = enqueue_event(db, current_user.id, "ping", {"webhook_id": endpoint.id}, endpoint_id=endpoint.id)
+    db.commit()
+
+    return {"message": "Ping queued", "delivery_id": deliveries[0].id}
+
+@router.get("/{endpoint_id}/deliveries", response_model=List[WebhookDeliveryResponse])
+def list_deliveries(
+    endpoint_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(require_approved_client),
+    db: Session = Depends(get_db)
+):
+    """Most recent deliveries for this webhook, newest first"""
+    endpoint = get_own_endpoint(db, endpoint_id, current_user)
+    return db.query(WebhookDelivery).filter(
+        WebhookDelivery.endpoint_id == endpoint.id
+    ).order_by(WebhookDelivery.id.desc()).limit(limit).all()
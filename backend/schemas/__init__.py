@@ -1,4 +1,10 @@
-from .user import UserSignup, UserLogin, Token, UserResponse, UserUpdate, AccountApproval
-from .offer import OfferCreate, OfferUpdate, DriverAssignment, OfferResponse
-from .driver import DriverCreate, DriverUpdate, DriverResponse, OfferAcceptance, OfferStatusUpdate, DriverApproval
-from models import UserRole, OfferStatus, AccountStatus
+from .user import UserSignup, UserLogin, Token, UserResponse, UserUpdate, AccountApproval, DirectoryMatch
+from .offer import OfferCreate, OfferUpdate, DriverAssignment, OfferResponse, OfferDelta, OfferSearchResults, OfferEta, OfferWithEta
+from .driver import DriverCreate, DriverUpdate, DriverResponse, OfferAcceptance, OfferStatusUpdate, DriverApproval, DriverExpiry
+from .telemetry import PositionPoint, TelemetryBatch, DriverPositionResponse
+from .webhook import WebhookCreate, WebhookResponse, WebhookCreated, WebhookDeliveryResponse
+from .batch import BatchRequest, BatchResult, BatchItemResult, UserBatch, DriverBatch, OfferBatch
+from .analytics import TimeInStatus, LeadTime, TimeInStatusReport, LeadTimeReport
+from .invoice import InvoiceRateCreate, InvoiceRateResponse, InvoiceRunResponse, InvoiceLine, InvoiceResponse
+from .pricing import QuoteCandidate, QuoteBatch, Quote, QuoteBatchResult, PricingStep, PricingFactorSet, PricingFactorResponse
+from models import UserRole, OfferStatus, AccountStatus
\ No newline at end of file
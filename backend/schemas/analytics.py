@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from datetime import datetime
+
+class TimeInStatus(BaseModel):
+    group: Optional[str]  # client id, driver id or period start; "all" when not grouped
+    status: str
+    count: int
+    mean_seconds: float
+    percentiles: Dict[str, float]  # "p50": seconds, ...
+
+class LeadTime(BaseModel):
+    group: Optional[str]
+    metric: str  # time_to_match, time_to_complete
+    count: int
+    mean_seconds: float
+    percentiles: Dict[str, float]
+
+class TimeInStatusReport(BaseModel):
+    start: datetime
+    end: datetime
+    group_by: str
+    results: List[TimeInStatus]
+
+class LeadTimeReport(BaseModel):
+    start: datetime
+    end: datetime
+    group_by: str
+    results: List[LeadTime]
@@ -0,0 +1,70 @@
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional, Union
+from models import AccountStatus, OfferStatus
+from config import BATCH_MAX_OPERATIONS
+from .user import UserResponse
+from .driver import DriverResponse
+from .offer import OfferResponse
+
+class ApproveUserOp(BaseModel):
+    op: Literal["approve_user"]
+    user_id: int
+    status: AccountStatus  # approved, rejected, suspended
+    notes: Optional[str] = None
+
+class ApproveDriverOp(BaseModel):
+    op: Literal["approve_driver"]
+    driver_id: int
+    status: AccountStatus  # approved, rejected, suspended
+    notes: Optional[str] = None
+
+class SetDriverStatusOp(BaseModel):
+    op: Literal["set_driver_status"]
+    driver_id: int
+    status: str  # pending, approved, rejected, suspended
+
+class AssignDriverOp(BaseModel):
+    op: Literal["assign_driver"]
+    offer_id: int
+    driver_id: int
+    status: OfferStatus = OfferStatus.MATCHED
+
+class DeleteUserOp(BaseModel):
+    op: Literal["delete_user"]
+    user_id: int
+
+BatchOperation = Annotated[
+    Union[ApproveUserOp, ApproveDriverOp, SetDriverStatusOp, AssignDriverOp, DeleteUserOp],
+    Field(discriminator="op")
+]
+
+class BatchRequest(BaseModel):
+    """Operations applied in order in one transaction"""
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=BATCH_MAX_OPERATIONS)
+    atomic: bool = False  # True: commit nothing if any operation fails
+
+class BatchItemResult(BaseModel):
+    index: int
+    op: str
+    id: int  # the user, driver or offer the operation targeted
+    ok: bool
+    status_code: int
+    detail: Optional[str] = None  # why it failed
+
+class BatchResult(BaseModel):
+    committed: bool
+    applied: int
+    failed: int
+    results: List[BatchItemResult]
+
+class UserBatch(BaseModel):
+    items: List[UserResponse]
+    missing: List[int]  # requested ids that don't exist
+
+class DriverBatch(BaseModel):
+    items: List[DriverResponse]
+    missing: List[int]
+
+class OfferBatch(BaseModel):
+    items: List[OfferResponse]
+    missing: List[int]
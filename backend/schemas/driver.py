@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, date
 from models import AccountStatus
 
 class DriverCreate(BaseModel):
@@ -8,28 +8,28 @@ class DriverCreate(BaseModel):
     last_name: str
     phone_number: str
     license_number: str
-    license_expiry: str
+    license_expiry: date
     vehicle_make: str
     vehicle_model: str
     vehicle_year: str
     vehicle_color: str
     vehicle_plate: str
     insurance_number: str
-    insurance_expiry: str
+    insurance_expiry: date
 
 class DriverUpdate(BaseModel):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     phone_number: Optional[str] = None
     license_number: Optional[str] = None
-    license_expiry: Optional[str] = None
+    license_expiry: Optional[date] = None
     vehicle_make: Optional[str] = None
     vehicle_model: Optional[str] = None
     vehicle_year: Optional[str] = None
     vehicle_color: Optional[str] = None
     vehicle_plate: Optional[str] = None
     insurance_number: Optional[str] = None
-    insurance_expiry: Optional[str] = None
+    insurance_expiry: Optional[date] = None
     status: Optional[str] = None
 
 class DriverResponse(BaseModel):
@@ -39,14 +39,14 @@ class DriverResponse(BaseModel):
     last_name: str
     phone_number: str
     license_number: str
-    license_expiry: str
+    license_expiry: Optional[date]  # None when a legacy value couldn't be read
     vehicle_make: str
     vehicle_model: str
     vehicle_year: str
     vehicle_color: str
     vehicle_plate: str
     insurance_number: str
-    insurance_expiry: str
+    insurance_expiry: Optional[date]
     status: str
     driver_status: AccountStatus  # NEW - approval status
     driver_approval_notes: Optional[str]  # NEW
@@ -58,6 +58,18 @@ class DriverResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DriverExpiry(BaseModel):
+    """One expiring (or expired) driver document"""
+    driver_id: int
+    first_name: str
+    last_name: str
+    email: Optional[EmailStr] = None
+    document: str  # license, insurance
+    expires_on: date
+    days_left: int  # negative once expired
+    driver_status: AccountStatus
+    reminder_sent_at: Optional[datetime] = None
+
 class DriverApproval(BaseModel):
     """Schema for approving/rejecting driver profiles"""
     status: AccountStatus  # approved, rejected, suspended
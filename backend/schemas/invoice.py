@@ -0,0 +1,66 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from datetime import date, datetime
+import json
+from models import InvoiceRunStatus
+
+class InvoiceRateCreate(BaseModel):
+    item: str = Field(..., min_length=1, max_length=100)  # per_mile, per_offer or an additional service name
+    unit_price_cents: int = Field(..., ge=0)
+    effective_from: date
+    client_id: Optional[int] = None  # omit for the default rate
+
+class InvoiceRateResponse(BaseModel):
+    id: int
+    client_id: Optional[int]
+    item: str
+    unit_price_cents: int
+    effective_from: date
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class InvoiceRunResponse(BaseModel):
+    period: str
+    status: InvoiceRunStatus
+    last_client_id: int
+    invoices_created: int
+    invoices_rendered: int
+    last_error: Optional[str]
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class InvoiceLine(BaseModel):
+    description: str
+    quantity: float
+    unit_price_cents: int
+    amount_cents: int
+
+class InvoiceResponse(BaseModel):
+    id: int
+    number: str
+    client_id: int
+    period: str
+    period_start: date
+    period_end: date
+    bill_to: Optional[str]
+    currency: str
+    offer_count: int
+    total_miles: float
+    total_cents: int
+    lines: List[InvoiceLine]
+    created_at: datetime
+    rendered_at: Optional[datetime]  # documents are available once set
+
+    @field_validator("lines", mode="before")
+    @classmethod
+    def parse_lines(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from models import OfferStatus
 
@@ -46,6 +46,7 @@ class OfferResponse(BaseModel):
     dropoff_address: str
     total_mileage: Optional[float]
     additional_service: Optional[str]
+    quote_cents: Optional[int] = None  # price quoted when the offer was created or last edited
     status: OfferStatus
     driver_first_name: Optional[str]
     driver_phone: Optional[str]
@@ -54,6 +55,33 @@ class OfferResponse(BaseModel):
     vehicle_color: Optional[str]
     vehicle_plate: Optional[str]
     created_at: datetime
+    updated_at: Optional[datetime] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class OfferEta(BaseModel):
+    offer_id: int
+    eta: datetime
+    remaining_minutes: float
+    remaining_miles: Optional[float]  # only when the offer has a total_mileage
+    basis: str  # live_speed | historical_pace | typical_duration
+    computed_at: datetime
+
+class OfferWithEta(OfferResponse):
+    eta: Optional[OfferEta] = None  # set while the offer is in progress
+
+class OfferDelta(BaseModel):
+    """Changes since a sync cursor. Upsert `offers`, drop the ids in `removed`,
+    then pass `cursor` back as `?since=` next time."""
+    cursor: str
+    reset: bool  # True when the cursor was too old and `offers` is the full list
+    offers: List[OfferResponse]
+    removed: List[int]
+
+class OfferSearchResults(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    total: int
+    results: List[OfferResponse]  # best match first
\ No newline at end of file
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from config import PRICING_BATCH_MAX
+
+class QuoteCandidate(BaseModel):
+    total_mileage: Optional[float] = Field(None, ge=0)
+    pickup_time: Optional[str] = None  # HH:MM
+    additional_service: Optional[str] = None
+    client_id: Optional[int] = None  # admin quotes only; clients are always quoted their own rates
+
+class QuoteBatch(BaseModel):
+    candidates: List[QuoteCandidate] = Field(..., min_length=1, max_length=PRICING_BATCH_MAX)
+
+class Quote(BaseModel):
+    quote_cents: int
+    base_cents: int  # before the time-of-day and demand multipliers
+    time_multiplier: float
+
+class QuoteBatchResult(BaseModel):
+    currency: str
+    demand_ratio: float  # pending offers per available driver
+    demand_multiplier: float
+    quotes: List[Quote]  # same order as the candidates
+
+class PricingStep(BaseModel):
+    threshold: float = Field(..., ge=0)  # hour of day (0-23) or demand ratio
+    multiplier: float = Field(..., gt=0, le=10)
+
+class PricingFactorSet(BaseModel):
+    steps: List[PricingStep] = Field(..., max_length=100)
+
+class PricingFactorResponse(BaseModel):
+    kind: str
+    threshold: float
+    multiplier: float
+    updated_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class PositionPoint(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lng: float = Field(..., ge=-180, le=180)
+    recorded_at: datetime
+    speed_kmh: Optional[float] = Field(None, ge=0, le=400)
+    heading: Optional[float] = Field(None, ge=0, lt=360)
+
+class TelemetryBatch(BaseModel):
+    """Positions recorded on the device since the last upload"""
+    points: List[PositionPoint] = Field(..., min_length=1, max_length=500)
+
+class DriverPositionResponse(BaseModel):
+    driver_id: int
+    offer_id: Optional[int]
+    lat: float
+    lng: float
+    recorded_at: datetime
+    speed_kmh: Optional[float]
+    heading: Optional[float]
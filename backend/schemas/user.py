@@ -47,6 +47,16 @@ class UserUpdate(BaseModel):
     emergency_phone: Optional[str] = None
     account_status: Optional[AccountStatus] = None  # Allow updating account status
 
+class DirectoryMatch(BaseModel):
+    """One typeahead hit from the admin user/driver directory"""
+    kind: str  # "user" or "driver"
+    id: int  # user id or driver id, depending on kind
+    user_id: int
+    label: str
+    detail: Optional[str]
+    role: Optional[str]
+    status: Optional[str]
+
 class AccountApproval(BaseModel):
     """Schema for approving/rejecting user accounts"""
     status: AccountStatus  # approved, rejected, suspended
@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
+from datetime import datetime
+from models import DeliveryStatus
+
+class WebhookCreate(BaseModel):
+    url: str = Field(..., max_length=500)
+    events: Optional[List[str]] = None  # event types to receive; omit for all of them
+
+class WebhookResponse(BaseModel):
+    id: int
+    url: str
+    events: Optional[List[str]]
+    consecutive_failures: int
+    disabled_at: Optional[datetime]
+    disabled_reason: Optional[str]
+    created_at: datetime
+
+    @field_validator("events", mode="before")
+    @classmethod
+    def split_events(cls, value):
+        return value.split(",") if isinstance(value, str) else value
+
+    class Config:
+        from_attributes = True
+
+class WebhookCreated(WebhookResponse):
+    """Returned once on registration — the secret verifies the X-FlowRelay-Signature header"""
+    secret: str
+
+class WebhookDeliveryResponse(BaseModel):
+    id: int
+    event_id: str
+    event: str
+    status: DeliveryStatus
+    attempts: int
+    next_attempt_at: datetime
+    last_status_code: Optional[int]
+    last_error: Optional[str]
+    created_at: datetime
+    delivered_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,311 @@
+"""
+Production entry point: a master process running several uvicorn workers on one socket.
+
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000] [--max-requests 10000]
+                    [--graceful-timeout 30] [--no-preload]
+
+The master applies schema changes once, imports the app and then forks the workers,
+so they share the memory pages of the loaded code. It restarts workers that exit,
+including the ones recycled after --max-requests. Signals to the master:
+
+    SIGHUP          rolling reload: workers are replaced one at a time, and an old
+                    worker is only stopped once its replacement is serving
+    SIGTERM/SIGINT  graceful shutdown: workers stop accepting connections, finish
+                    in-flight requests and their background tasks (emails), run the
+                    app's shutdown hooks and exit; stragglers are killed after
+                    --graceful-timeout
+
+With preload a reload restarts workers from the code the master imported. To pick
+up new code on SIGHUP run with --no-preload, where every worker imports the app itself.
+"""
+import argparse
+import gc
+import os
+import random
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from config import (
+    WEB_CONCURRENCY, SERVER_MAX_REQUESTS, SERVER_MAX_REQUESTS_JITTER, SERVER_GRACEFUL_TIMEOUT_SECONDS
+)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKER_BOOT_TIMEOUT_SECONDS = 60
+MAX_BOOT_FAILURES = 5  # consecutive workers dying before they serve: give up instead of fork-looping
+
+
+def log(message: str) -> None:
+    print(f"[serve {os.getpid()}] {message}", flush=True)
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the master when it is serving and exits if the master dies."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int, master_pid: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+        self.master_pid = master_pid
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+    async def on_tick(self, counter: int) -> bool:
+        if os.getppid() != self.master_pid:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+
+class Worker:
+    def __init__(self, pid: int, ready_fd: int):
+        self.pid = pid
+        self.ready_fd: Optional[int] = ready_fd
+        self.ready = False
+        self.stopping = False
+        self.started_at = time.monotonic()
+
+
+class Master:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.pid = os.getpid()
+        self.app = None
+        self.sock: Optional[socket.socket] = None
+        self.workers: Dict[int, Worker] = {}
+        self.pending_signals: List[int] = []
+        self.to_replace: List[int] = []
+        self.boot_failures = 0
+        self.exit_code = 0
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_w, False)
+
+    # ─── Setup ─────────────────────────────────────────────────────────────
+
+    def _bind(self) -> None:
+        family = socket.AF_INET6 if ":" in self.args.host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.args.host, self.args.port))
+        self.sock.listen(2048)
+
+    def _preload(self) -> None:
+        from database import engine
+        from database.migrate import upgrade_schema
+        from main import app
+
+        upgrade_schema(engine)
+        engine.dispose()  # no pooled connections may be inherited by the workers
+        self.app = app
+        gc.collect()
+        gc.freeze()  # keep the loaded objects out of collections so their pages stay shared
+
+    def _on_signal(self, signum, frame) -> None:
+        self.pending_signals.append(signum)
+        try:
+            os.write(self._wakeup_w, b"!")
+        except BlockingIOError:
+            pass
+
+    # ─── Workers ───────────────────────────────────────────────────────────
+
+    def _active(self) -> List[Worker]:
+        return [w for w in self.workers.values() if not w.stopping]
+
+    def _spawn(self) -> None:
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(ready_r)
+                self._run_worker(ready_w)
+                code = 0
+            except SystemExit as exc:
+                code = exc.code if isinstance(exc.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        self.workers[pid] = Worker(pid, ready_r)
+
+    def _run_worker(self, ready_fd: int) -> None:
+        os.setpgid(0, 0)  # Ctrl-C reaches only the master, which stops workers gracefully
+        for signum in (signal.SIGHUP, signal.SIGCHLD, signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, signal.SIG_DFL)
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+        for worker in self.workers.values():
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+
+        app = self.app
+        if app is None:
+            from main import app
+        from database import engine
+        engine.dispose(close=False)
+
+        max_requests = None
+        if self.args.max_requests:
+            max_requests = self.args.max_requests + random.randint(0, self.args.max_requests_jitter)
+        config = uvicorn.Config(
+            app,
+            lifespan="on",
+            log_level=self.args.log_level,
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+        )
+        WorkerServer(config, ready_fd, self.pid).run(sockets=[self.sock])
+
+    def _stop_worker(self, pid: int, sig: int = signal.SIGTERM) -> None:
+        worker = self.workers.get(pid)
+        if worker:
+            worker.stopping = True
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+            if not worker.ready and not worker.stopping:
+                self.boot_failures += 1
+                log(f"worker {pid} exited before serving (status {os.waitstatus_to_exitcode(status)})")
+            elif not worker.stopping:
+                log(f"worker {pid} exited (status {os.waitstatus_to_exitcode(status)}); replacing it")
+
+    def _wait(self, timeout: float) -> None:
+        fds = [self._wakeup_r] + [w.ready_fd for w in self.workers.values() if w.ready_fd is not None]
+        try:
+            readable, _, _ = select.select(fds, [], [], timeout)
+        except InterruptedError:
+            return
+        for fd in readable:
+            if fd == self._wakeup_r:
+                os.read(self._wakeup_r, 4096)
+                continue
+            worker = next(w for w in self.workers.values() if w.ready_fd == fd)
+            if os.read(fd, 1) == b"1":
+                worker.ready = True
+                self.boot_failures = 0
+            os.close(fd)
+            worker.ready_fd = None
+
+    def _reload_step(self) -> None:
+        """Start one replacement, and once it serves, stop one old worker."""
+        self.to_replace = [pid for pid in self.to_replace if pid in self.workers and not self.workers[pid].stopping]
+        if not self.to_replace or any(not w.ready for w in self._active()):
+            return
+        if len(self._active()) <= self.args.workers:
+            self._spawn()
+        else:
+            self._stop_worker(self.to_replace.pop(0))
+
+    def _check_boot_timeouts(self) -> None:
+        now = time.monotonic()
+        for worker in self._active():
+            if not worker.ready and now - worker.started_at > WORKER_BOOT_TIMEOUT_SECONDS:
+                log(f"worker {worker.pid} did not start serving within {WORKER_BOOT_TIMEOUT_SECONDS}s; killing it")
+                self._stop_worker(worker.pid, signal.SIGKILL)
+                self.boot_failures += 1
+
+    # ─── Main loop ─────────────────────────────────────────────────────────
+
+    def run(self) -> int:
+        self._bind()
+        if self.args.preload:
+            self._preload()
+        else:
+            subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "migrate.py")], check=True)
+
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+
+        log(f"listening on {self.args.host}:{self.args.port} with {self.args.workers} workers "
+            f"({'preloaded' if self.app else 'no preload'})")
+        while True:
+            while self.pending_signals:
+                signum = self.pending_signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    self.shutdown()
+                    return self.exit_code
+                if signum == signal.SIGHUP:
+                    log("reloading workers")
+                    self.to_replace = [w.pid for w in self._active()]
+
+            self._reap()
+            if self.boot_failures >= MAX_BOOT_FAILURES:
+                log("workers keep failing to start; shutting down")
+                self.exit_code = 1
+                self.shutdown()
+                return self.exit_code
+
+            while len(self._active()) < self.args.workers:
+                self._spawn()
+            self._reload_step()
+            self._check_boot_timeouts()
+            self._wait(1.0)
+
+    def shutdown(self) -> None:
+        """Let every worker drain, then kill whatever is left after the graceful timeout."""
+        log("shutting down")
+        for pid in list(self.workers):
+            self._stop_worker(pid)
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            log(f"worker {pid} did not stop in time; killing it")
+            self._stop_worker(pid, signal.SIGKILL)
+        while self.workers:
+            self._reap()
+            time.sleep(0.05)
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--max-requests", type=int, default=SERVER_MAX_REQUESTS,
+                        help="replace a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=SERVER_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=SERVER_GRACEFUL_TIMEOUT_SECONDS)
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="import the app in each worker, so SIGHUP picks up new code")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        # Windows has no fork: serve from a single process
+        from database import engine
+        from database.migrate import upgrade_schema
+        from main import app
+
+        upgrade_schema(engine)
+        uvicorn.run(app, host=args.host, port=args.port, timeout_graceful_shutdown=args.graceful_timeout)
+    else:
+        sys.exit(Master(args).run())
@@ -0,0 +1,11 @@
+from .board import offer_board
+from .sync import offer_delta, next_cursor, purge_tombstones
+from .search import search_offers
+from .directory import directory
+from .telemetry import telemetry
+from .eta import eta
+from .webhooks import webhooks, enqueue_offer_event
+from .scheduler import scheduler
+from .ratelimit import rate_limiter
+from . import history  # records offer status changes in offer_events
+from . import maintenance  # registers the scheduled jobs
@@ -0,0 +1,94 @@
+"""
+Moves completed/cancelled offers older than ARCHIVE_AFTER_DAYS from `offers`
+into `offers_archive`, one batch per transaction. A batch is copied and deleted
+atomically, so an interrupted run simply resumes with the next batch. Delta sync
+covers live offers only, so each moved offer also gets a tombstone telling
+devices to drop it.
+
+    python -m services.archive [--older-than-days 90] [--batch-size 1000] [--max-batches N]
+"""
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from models import Offer, OfferArchive, OfferStatus, OfferTombstone
+from utils.versioning import bump_versions
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+TERMINAL_STATUSES = [OfferStatus.COMPLETED, OfferStatus.CANCELLED]
+
+_OFFER_COLUMNS = list(Offer.__table__.columns)
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int) -> int:
+    """Move one batch of archivable offers and commit. Returns how many moved."""
+    ids = [row[0] for row in db.execute(
+        select(Offer.id)
+        .where(Offer.status.in_(TERMINAL_STATUSES), Offer.updated_at < cutoff)
+        .order_by(Offer.id)
+        .limit(batch_size)
+    )]
+    if not ids:
+        return 0
+
+    db.execute(
+        insert(OfferArchive.__table__).from_select(
+            [col.name for col in _OFFER_COLUMNS] + ["archived_at"],
+            select(*_OFFER_COLUMNS, literal(datetime.utcnow())).where(Offer.id.in_(ids))
+        )
+    )
+    db.execute(
+        insert(OfferTombstone.__table__).from_select(
+            ["offer_id", "client_id", "driver_id", "removed_at"],
+            select(Offer.id, Offer.client_id, Offer.driver_id, literal(datetime.utcnow())).where(Offer.id.in_(ids))
+        )
+    )
+    db.execute(delete(Offer).where(Offer.id.in_(ids)))
+    bump_versions(db, "offers")
+    db.commit()
+    return len(ids)
+
+
+def archive_offers(
+    db: Session,
+    older_than_days: int = ARCHIVE_AFTER_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    max_batches: Optional[int] = None
+) -> int:
+    """Archive in batches until nothing is left (or max_batches is reached)."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(db, cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        batches += 1
+    return moved
+
+
+def newest_archived_created_at(db: Session) -> Optional[datetime]:
+    """Upper bound of the archive's created_at range (index lookup)."""
+    return db.query(func.max(OfferArchive.created_at)).scalar()
+
+
+def archived_history(db: Session, driver_id: int, limit: int) -> List[OfferArchive]:
+    return db.query(OfferArchive).filter(
+        OfferArchive.driver_id == driver_id
+    ).order_by(OfferArchive.updated_at.desc()).limit(limit).all()
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Archive old completed/cancelled offers")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--max-batches", type=int, default=None)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        total = archive_offers(session, args.older_than_days, args.batch_size, args.max_batches)
+    print(f"Archived {total} offers.")
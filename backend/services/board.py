@@ -0,0 +1,79 @@
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+from models import Offer, OfferStatus
+from schemas.offer import OfferResponse
+from utils.compression import Precompressed
+from utils.http_cache import make_etag
+from utils.projection import ListShape, project, render_rows
+from utils.versioning import get_versions
+from config import BOARD_SNAPSHOT_MAX_AGE_SECONDS
+
+_offer_list = TypeAdapter(List[OfferResponse])
+
+MAX_SHAPES = 32  # distinct ?fields=/format= variants kept per board version
+
+
+class OfferBoard:
+    """
+    Pre-serialized snapshot of the pending-offer board shared by every driver poll.
+
+    The snapshot is tied to the `offers` table version: it is rebuilt once per change
+    and otherwise served as-is. Routes that change the board call `invalidate()` so
+    this process picks the change up immediately; changes made by other worker
+    processes are noticed on the next version check, at most `max_age` seconds later.
+    Sparse-fieldset and columnar variants are rendered on first request and kept
+    alongside the full snapshot until the next change, as are compressed copies of
+    each, so a hot board is gzipped (or br/zstd) once per change rather than per poll.
+    """
+
+    def __init__(self, max_age: float = BOARD_SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._version = None
+        self._bodies: Dict[tuple, Tuple[Precompressed, str]] = {}  # list shape -> (payload, etag)
+        self._checked_at = 0.0
+        self._stale = True
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def _is_fresh(self) -> bool:
+        return not self._stale and time.monotonic() - self._checked_at < self.max_age
+
+    def _render(self, db: Session, shape: Optional[ListShape]) -> bytes:
+        query = db.query(Offer).filter(
+            Offer.status == OfferStatus.PENDING,
+            Offer.driver_id == None
+        )
+        if shape is None or not shape.projected:
+            return _offer_list.dump_json(_offer_list.validate_python(query.all(), from_attributes=True))
+        return render_rows(shape.columns, project(query, Offer, shape.columns), shape.list_format)
+
+    def get(self, db: Session, shape: Optional[ListShape] = None) -> Tuple[Precompressed, str]:
+        """Return (payload, etag) for the current board, optionally projected to `shape`."""
+        key = (shape.fields, shape.list_format) if shape is not None and shape.projected else ()
+        cached = self._bodies.get(key)
+        if cached and self._is_fresh():
+            return cached
+
+        with self._lock:
+            if not self._is_fresh():
+                self._stale = False
+                version = get_versions(db, "offers")["offers"]
+                if version != self._version:
+                    self._bodies = {}
+                    self._version = version
+                self._checked_at = time.monotonic()
+
+            if key not in self._bodies:
+                if len(self._bodies) >= MAX_SHAPES:
+                    self._bodies = {}
+                self._bodies[key] = (Precompressed(self._render(db, shape)), make_etag("offer-board", self._version, *key))
+            return self._bodies[key]
+
+
+offer_board = OfferBoard()
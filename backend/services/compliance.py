@@ -0,0 +1,160 @@
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+import asyncio
+
+import anyio.from_thread
+
+from models import Driver, User, AccountStatus
+from config import (
+    SWEEP_CHUNK_SIZE, SWEEP_MAX_CHUNKS,
+    COMPLIANCE_REMINDER_DAYS, COMPLIANCE_REMINDER_INTERVAL_DAYS, COMPLIANCE_EMAIL_CONCURRENCY
+)
+from utils import send_document_expiry_email
+
+DOCUMENTS = {
+    "license": Driver.license_expiry,
+    "insurance": Driver.insurance_expiry,
+}
+
+
+def expiring_documents(db: Session, within_days: int, include_expired: bool = True,
+                       document: Optional[str] = None) -> List[dict]:
+    """Documents expiring within `within_days` (and already expired ones), soonest first."""
+    today = datetime.utcnow().date()
+    results = []
+    for name, column in DOCUMENTS.items():
+        if document and name != document:
+            continue
+        query = db.query(Driver, User.email).outerjoin(User, User.id == Driver.user_id).filter(
+            column <= today + timedelta(days=within_days)
+        )
+        if not include_expired:
+            query = query.filter(column >= today)
+        for driver, email in query:
+            expires_on = getattr(driver, column.key)
+            results.append({
+                "driver_id": driver.id,
+                "first_name": driver.first_name,
+                "last_name": driver.last_name,
+                "email": email,
+                "document": name,
+                "expires_on": expires_on,
+                "days_left": (expires_on - today).days,
+                "driver_status": driver.driver_status,
+                "reminder_sent_at": driver.expiry_reminder_sent_at,
+            })
+    results.sort(key=lambda row: (row["expires_on"], row["driver_id"]))
+    return results
+
+
+def suspend_expired_drivers(db: Session) -> int:
+    """Suspend approved drivers whose license or insurance has expired; busy drivers keep their current trip."""
+    today = datetime.utcnow().date()
+    suspended = 0
+
+    for name, column in DOCUMENTS.items():
+        last_id = 0
+        for _ in range(SWEEP_MAX_CHUNKS):
+            drivers = db.query(Driver).filter(
+                column < today,
+                Driver.driver_status == AccountStatus.APPROVED,
+                Driver.id > last_id
+            ).order_by(Driver.id).limit(SWEEP_CHUNK_SIZE).all()
+            if not drivers:
+                break
+            last_id = drivers[-1].id
+
+            now = datetime.utcnow()
+            for driver in drivers:
+                driver.driver_status = AccountStatus.SUSPENDED
+                driver.driver_approval_notes = f"Suspended automatically: {name} expired on {getattr(driver, column.key)}"
+                driver.driver_approved_by = None
+                driver.driver_approved_at = now
+                if driver.status != "busy":
+                    driver.status = "offline"
+                driver.updated_at = now
+            suspended += len(drivers)
+            db.commit()
+
+    return suspended
+
+
+def _due_reminders(db: Session) -> Dict[int, dict]:
+    """Approved drivers with a document expiring soon who haven't been reminded lately."""
+    today = datetime.utcnow().date()
+    remind_before = datetime.utcnow() - timedelta(days=COMPLIANCE_REMINDER_INTERVAL_DAYS)
+    due: Dict[int, dict] = {}
+
+    for name, column in DOCUMENTS.items():
+        last_id = 0
+        for _ in range(SWEEP_MAX_CHUNKS):
+            rows = db.query(Driver, User.email).join(User, User.id == Driver.user_id).filter(
+                column >= today,
+                column <= today + timedelta(days=COMPLIANCE_REMINDER_DAYS),
+                Driver.driver_status == AccountStatus.APPROVED,
+                or_(Driver.expiry_reminder_sent_at.is_(None), Driver.expiry_reminder_sent_at < remind_before),
+                Driver.id > last_id
+            ).order_by(Driver.id).limit(SWEEP_CHUNK_SIZE).all()
+            if not rows:
+                break
+            last_id = rows[-1][0].id
+
+            for driver, email in rows:
+                entry = due.setdefault(driver.id, {"email": email, "first_name": driver.first_name, "documents": []})
+                entry["documents"].append((name, getattr(driver, column.key)))
+
+    return due
+
+
+async def _send_batch(batch: List[dict]) -> List[bool]:
+    limit = asyncio.Semaphore(COMPLIANCE_EMAIL_CONCURRENCY)
+
+    async def send(reminder: dict) -> bool:
+        async with limit:
+            try:
+                await send_document_expiry_email(reminder["email"], reminder["first_name"], reminder["documents"])
+                return True
+            except Exception:
+                return False
+
+    return await asyncio.gather(*(send(reminder) for reminder in batch))
+
+
+def _send_from_thread(batch: List[dict]) -> List[bool]:
+    try:
+        # Scheduler jobs run in the app's worker threads: send on its event loop
+        return anyio.from_thread.run(_send_batch, batch)
+    except RuntimeError:
+        return asyncio.run(_send_batch(batch))
+
+
+def send_expiry_reminders(db: Session) -> dict:
+    """
+    Email drivers whose documents expire within COMPLIANCE_REMINDER_DAYS, at most once
+    every COMPLIANCE_REMINDER_INTERVAL_DAYS. Emails go out in batches of SWEEP_CHUNK_SIZE;
+    a driver whose email failed is retried on the next run.
+    """
+    due = _due_reminders(db)
+    sent = failed = 0
+    driver_ids = list(due)
+
+    for start in range(0, len(driver_ids), SWEEP_CHUNK_SIZE):
+        chunk = driver_ids[start:start + SWEEP_CHUNK_SIZE]
+        outcomes = _send_from_thread([due[driver_id] for driver_id in chunk])
+        delivered = [driver_id for driver_id, ok in zip(chunk, outcomes) if ok]
+        if delivered:
+            db.query(Driver).filter(Driver.id.in_(delivered)).update(
+                {Driver.expiry_reminder_sent_at: datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        sent += len(delivered)
+        failed += len(chunk) - len(delivered)
+
+    return {"reminded": sent, "failed": failed}
+
+
+def check_document_compliance(db: Session) -> dict:
+    """Scheduled job: suspend drivers with expired documents, then send due reminders."""
+    return {"suspended": suspend_expired_drivers(db), **send_expiry_reminders(db)}
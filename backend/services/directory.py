@@ -0,0 +1,264 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import heapq
+import itertools
+import re
+import threading
+import time
+
+from models import User, Driver
+from utils.versioning import get_versions, pop_bumped_versions
+from config import DIRECTORY_VERSION_CHECK_SECONDS
+
+# Matches ranked per query; unselective queries ("m", "555") are ranked on the first this many
+MAX_MATCHES_RANKED = 300
+
+_SEPARATORS = re.compile(r"[\s@.\-_]+")
+_NON_DIGITS = re.compile(r"\D")
+
+Key = Tuple[str, int]  # ("user" | "driver", id)
+
+
+def _normalize(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def _trigrams(value: str) -> Set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _tokens(value: str) -> List[str]:
+    return [token for token in _SEPARATORS.split(value) if token]
+
+
+def _user_record(user: User) -> dict:
+    return {
+        "kind": "user",
+        "id": user.id,
+        "user_id": user.id,
+        "label": user.company_name or user.email,
+        "detail": user.email,
+        "role": getattr(user.role, "value", user.role),
+        "status": getattr(user.account_status, "value", user.account_status),
+        "fields": [user.email, user.company_name, user.phone_number],
+    }
+
+
+def _driver_record(driver: Driver) -> dict:
+    return {
+        "kind": "driver",
+        "id": driver.id,
+        "user_id": driver.user_id,
+        "label": f"{driver.first_name} {driver.last_name}",
+        "detail": f"{driver.vehicle_plate} · {driver.phone_number}",
+        "role": "driver",
+        "status": getattr(driver.driver_status, "value", driver.driver_status),
+        "fields": [f"{driver.first_name} {driver.last_name}", driver.vehicle_plate, driver.phone_number],
+    }
+
+
+class DirectoryIndex:
+    """
+    In-memory typeahead over users and drivers.
+
+    Each searchable field is lower-cased (phone numbers also as bare digits) and
+    indexed by trigram for substring matches, plus by 1–2 character token prefixes
+    for the first keystrokes. Writes made through this process are applied
+    incrementally after commit; writes from other worker processes are noticed
+    through the users/drivers table versions and trigger a background rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: Dict[Key, Tuple[List[str], List[str], dict]] = {}  # terms, tokens, record
+        self._grams: Dict[str, Set[Key]] = defaultdict(set)
+        self._prefixes: Dict[str, Set[Key]] = defaultdict(set)
+        self._loaded = False
+        self._versions = None
+        self._checked_at = 0.0
+        self._rebuilding = False
+
+    # ─── Indexing ──────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _terms(fields: Iterable[Optional[str]]) -> List[str]:
+        terms = []
+        for field in fields:
+            value = _normalize(field)
+            if not value:
+                continue
+            terms.append(value)
+            digits = _NON_DIGITS.sub("", value)
+            if len(digits) >= 3 and digits != value:
+                terms.append(digits)
+        return terms
+
+    @staticmethod
+    def _postings(terms: List[str], tokens: List[str]) -> Tuple[Set[str], Set[str]]:
+        """Trigrams and 1–2 character prefixes a document is filed under."""
+        grams = set().union(*map(_trigrams, terms))
+        prefixes = {token[:1] for token in tokens} | {token[:2] for token in tokens}
+        return grams, prefixes
+
+    def _add(self, key: Key, record: dict) -> None:
+        if key in self._docs:
+            self._remove(key)
+        terms = self._terms(record.pop("fields"))
+        tokens = [token for term in terms for token in _tokens(term)]
+        self._docs[key] = (terms, tokens, record)
+        grams, prefixes = self._postings(terms, tokens)
+        for gram in grams:
+            self._grams[gram].add(key)
+        for prefix in prefixes:
+            self._prefixes[prefix].add(key)
+
+    def _remove(self, key: Key) -> None:
+        doc = self._docs.pop(key, None)
+        if not doc:
+            return
+        grams, prefixes = self._postings(doc[0], doc[1])
+        for gram in grams:
+            self._grams[gram].discard(key)
+        for prefix in prefixes:
+            self._prefixes[prefix].discard(key)
+
+    def upsert(self, record: dict) -> None:
+        with self._lock:
+            self._add((record["kind"], record["id"]), record)
+
+    def remove(self, kind: str, id: int) -> None:
+        with self._lock:
+            self._remove((kind, id))
+
+    def rebuild(self, db: Session) -> None:
+        versions = get_versions(db, "users", "drivers")
+        records = [_user_record(u) for u in db.query(User).all()]
+        records += [_driver_record(d) for d in db.query(Driver).all()]
+
+        fresh = DirectoryIndex()
+        for record in records:
+            fresh._add((record["kind"], record["id"]), record)
+
+        with self._lock:
+            self._docs, self._grams, self._prefixes = fresh._docs, fresh._grams, fresh._prefixes
+            self._versions = versions
+            self._loaded = True
+            self._checked_at = time.monotonic()
+
+    def mark_seen(self, bumped: Dict[str, List[int]]) -> None:
+        """
+        Count the version bumps of a transaction this process just applied as seen.
+        If the stored version had fallen behind the bump's starting point, another
+        worker wrote in between: leave the gap and check at once, so it rebuilds.
+        """
+        with self._lock:
+            if self._versions is None:
+                return
+            for table in ("users", "drivers"):
+                if table not in bumped:
+                    continue
+                before, after = bumped[table]
+                if self._versions[table] == before:
+                    self._versions[table] = after
+                elif self._versions[table] < before:
+                    self._checked_at = float("-inf")
+
+    def ensure_fresh(self, db: Session) -> None:
+        """Load on first use; afterwards pick up other workers' writes (cheap version check)."""
+        if not self._loaded:
+            self.rebuild(db)
+            return
+        if time.monotonic() - self._checked_at < DIRECTORY_VERSION_CHECK_SECONDS:
+            return
+        self._checked_at = time.monotonic()
+        if get_versions(db, "users", "drivers") != self._versions and not self._rebuilding:
+            # Changed by another worker — rebuild off the request path, keep serving meanwhile
+            self._rebuilding = True
+            threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+    def _background_rebuild(self) -> None:
+        from database import SessionLocal
+        try:
+            with SessionLocal() as db:
+                self.rebuild(db)
+        finally:
+            self._rebuilding = False
+
+    # ─── Querying ──────────────────────────────────────────────────────────
+
+    def _candidates(self, q: str) -> Set[Key]:
+        """Smallest posting list that every match must be in; matches are verified after."""
+        if len(q) < 3:
+            return self._prefixes.get(q, set())
+        buckets = sorted((self._grams.get(gram, set()) for gram in _trigrams(q)), key=len)
+        if len(buckets) > 1 and len(buckets[0]) > MAX_MATCHES_RANKED:
+            # Longer queries: let the C set intersection discard most non-matches
+            return buckets[0].intersection(*buckets[1:])
+        return buckets[0]
+
+    def _matches(self, q: str, kind: Optional[str]):
+        """Yield (score, key) for verified matches: 0 field prefix, 1 word prefix, 2 substring."""
+        short = len(q) < 3
+        for key in self._candidates(q):
+            if kind and key[0] != kind:
+                continue
+            terms, tokens, _ = self._docs[key]
+            if any(term.startswith(q) for term in terms):
+                yield 0, key
+            elif any(token.startswith(q) for token in tokens):
+                yield 1, key
+            elif not short and any(q in term for term in terms):
+                yield 2, key
+
+    def search(self, q: str, limit: int = 10, kind: Optional[str] = None) -> List[dict]:
+        q = _normalize(q)
+        if not q:
+            return []
+
+        with self._lock:
+            ranked = []
+            for score, key in itertools.islice(self._matches(q, kind), MAX_MATCHES_RANKED):
+                label = self._docs[key][2]["label"] or ""
+                ranked.append((score, len(label), label, key))
+            return [dict(self._docs[key][2]) for *_, key in heapq.nsmallest(limit, ranked)]
+
+
+directory = DirectoryIndex()
+
+
+# ─── Incremental updates ───────────────────────────────────────────────────────
+
+@event.listens_for(Session, "after_flush")
+def _collect_directory_changes(session, flush_context):
+    pending = session.info.setdefault("directory_changes", [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User):
+            pending.append(("upsert", _user_record(obj)))
+        elif isinstance(obj, Driver):
+            pending.append(("upsert", _driver_record(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            pending.append(("remove", ("user", obj.id)))
+        elif isinstance(obj, Driver):
+            pending.append(("remove", ("driver", obj.id)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_directory_changes(session):
+    pending = session.info.pop("directory_changes", None)
+    bumped = pop_bumped_versions(session)
+    if not pending or not directory._loaded:
+        return
+    for action, payload in pending:
+        if action == "upsert":
+            directory.upsert(payload)
+        else:
+            directory.remove(*payload)
+    directory.mark_seen(bumped)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_directory_changes(session):
+    session.info.pop("directory_changes", None)
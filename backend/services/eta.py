@@ -0,0 +1,226 @@
+from sqlalchemy import and_, or_, select, union_all
+from sqlalchemy.orm import Session
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Deque, Dict, Iterable, List, Optional
+import math
+import statistics
+import threading
+import time
+
+from models import DriverPosition, Offer, OfferArchive, OfferStatus
+from config import ETA_REFRESH_SECONDS, ETA_HISTORY_DAYS, ETA_HISTORY_REFRESH_SECONDS
+from .telemetry import telemetry
+
+KM_PER_MILE = 1.609344
+EARTH_RADIUS_KM = 6371.0088
+# Below this the vehicle counts as stopped and the historical pace is used instead
+MIN_MOVING_SPEED_KMH = 5.0
+# Recent speed readings averaged for the live estimate
+SPEED_SAMPLES = 10
+# An overdue trip is shown as arriving shortly rather than in the past
+MIN_REMAINING_MINUTES = 1.0
+
+
+def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi, d_lambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class _Track:
+    """Running progress of one in-progress offer, advanced point by point."""
+
+    __slots__ = ("mileage", "started_at", "last_at", "last_lat", "last_lng", "traveled_km", "speeds")
+
+    def __init__(self, mileage: Optional[float], started_at: datetime):
+        self.mileage = mileage
+        self.started_at = started_at
+        self.last_at: Optional[datetime] = None
+        self.last_lat = self.last_lng = None
+        self.traveled_km = 0.0
+        self.speeds: Deque[float] = deque(maxlen=SPEED_SAMPLES)
+
+    def extend(self, rows: Iterable) -> None:
+        """Fold in position rows (time order); anything not newer than the last point is skipped."""
+        for row in rows:
+            if self.last_at is not None and row["recorded_at"] <= self.last_at:
+                continue
+            lat, lng = row["lat_e6"] / 1_000_000, row["lng_e6"] / 1_000_000
+            if self.last_at is None:
+                self.started_at = row["recorded_at"]
+            else:
+                self.traveled_km += _haversine_km(self.last_lat, self.last_lng, lat, lng)
+            if row["speed_kmh"] is not None:
+                self.speeds.append(row["speed_kmh"])
+            self.last_at, self.last_lat, self.last_lng = row["recorded_at"], lat, lng
+
+    def speed_kmh(self) -> Optional[float]:
+        if self.speeds:
+            return sum(self.speeds) / len(self.speeds)
+        if self.last_at is not None and self.last_at > self.started_at:
+            return self.traveled_km / ((self.last_at - self.started_at).total_seconds() / 3600)
+        return None
+
+
+class EtaService:
+    """
+    Arrival estimates for in-progress offers.
+
+    Offers with a mileage are estimated from the distance still to cover, at the
+    driver's recent speed (or the historical pace when stopped); offers without
+    one from the typical created_at→updated_at duration of completed offers.
+    All active ETAs are recomputed together every ETA_REFRESH_SECONDS from one
+    positions query; in between, points uploaded to this process move only the
+    affected offer's ETA. Reads never touch the database outside a refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._tracks: Dict[int, _Track] = {}
+        self._etas: Dict[int, dict] = {}
+        self._pace: Optional[float] = None  # minutes per mile
+        self._typical: Optional[float] = None  # minutes per trip
+        self._history_at = 0.0
+        self._refreshed_at = 0.0
+        self._loaded = False
+
+    # ─── Model ─────────────────────────────────────────────────────────────
+
+    def _load_history(self, db: Session) -> None:
+        since = datetime.utcnow() - timedelta(days=ETA_HISTORY_DAYS)
+
+        def completed(model):
+            return select(model.created_at, model.updated_at, model.total_mileage).where(
+                model.status == OfferStatus.COMPLETED,
+                model.updated_at >= since
+            )
+
+        durations, paces = [], []
+        for created_at, updated_at, mileage in db.execute(union_all(completed(Offer), completed(OfferArchive))):
+            if not (created_at and updated_at) or updated_at <= created_at:
+                continue
+            minutes = (updated_at - created_at).total_seconds() / 60
+            durations.append(minutes)
+            if mileage and mileage > 0:
+                paces.append(minutes / mileage)
+
+        self._typical = statistics.median(durations) if durations else None
+        self._pace = statistics.median(paces) if paces else None
+        self._history_at = time.monotonic()
+
+    def _estimate(self, offer_id: int, track: _Track, now: datetime) -> Optional[dict]:
+        remaining_miles = None
+        if track.mileage:
+            remaining_miles = max(track.mileage - track.traveled_km / KM_PER_MILE, 0.0)
+            speed = track.speed_kmh()
+            if speed and speed >= MIN_MOVING_SPEED_KMH:
+                minutes, basis = remaining_miles / (speed / KM_PER_MILE) * 60, "live_speed"
+            elif self._pace:
+                minutes, basis = remaining_miles * self._pace, "historical_pace"
+            else:
+                return None
+        elif self._typical:
+            elapsed = (now - track.started_at).total_seconds() / 60
+            minutes, basis = self._typical - elapsed, "typical_duration"
+        else:
+            return None
+
+        minutes = max(minutes, MIN_REMAINING_MINUTES)
+        return {
+            "offer_id": offer_id,
+            "eta": now + timedelta(minutes=minutes),
+            "remaining_minutes": round(minutes, 1),
+            "remaining_miles": round(remaining_miles, 2) if remaining_miles is not None else None,
+            "basis": basis,
+            "computed_at": now,
+        }
+
+    # ─── Updates ───────────────────────────────────────────────────────────
+
+    def observe(self, offer_id: Optional[int], rows: List[dict]) -> None:
+        """Telemetry listener: advance one offer's track and re-estimate just that offer."""
+        if offer_id is None:
+            return
+        with self._lock:
+            track = self._tracks.get(offer_id)
+            if track is None:
+                # Just started; its mileage is filled in by the next refresh
+                track = self._tracks[offer_id] = _Track(None, rows[0]["recorded_at"])
+                self._refreshed_at = 0.0
+            track.extend(rows)
+            if self._loaded:
+                self._etas[offer_id] = self._estimate(offer_id, track, datetime.utcnow())
+
+    def refresh_all(self, db: Session) -> None:
+        """Recompute every active ETA in one pass: one offers query, one positions query."""
+        if time.monotonic() - self._history_at >= ETA_HISTORY_REFRESH_SECONDS:
+            self._load_history(db)
+
+        active = db.query(Offer.id, Offer.total_mileage, Offer.updated_at).filter(
+            Offer.status == OfferStatus.IN_PROGRESS
+        ).all()
+
+        with self._lock:
+            tracks = {}
+            for offer_id, mileage, updated_at in active:
+                track = self._tracks.get(offer_id) or _Track(mileage, updated_at or datetime.utcnow())
+                track.mileage = mileage
+                tracks[offer_id] = track
+            unseen = [i for i, t in tracks.items() if t.last_at is None]
+            seen = [i for i, t in tracks.items() if t.last_at is not None]
+            floor = min((tracks[i].last_at for i in seen), default=None)
+
+        # Whole trip for offers without a track yet, only newer points for the rest
+        conditions = []
+        if unseen:
+            conditions.append(DriverPosition.offer_id.in_(unseen))
+        if seen:
+            conditions.append(and_(DriverPosition.offer_id.in_(seen), DriverPosition.recorded_at > floor))
+        rows = []
+        if conditions:
+            rows = db.execute(
+                select(
+                    DriverPosition.offer_id, DriverPosition.recorded_at, DriverPosition.lat_e6,
+                    DriverPosition.lng_e6, DriverPosition.speed_kmh
+                ).where(or_(*conditions)).order_by(DriverPosition.offer_id, DriverPosition.recorded_at)
+            ).mappings().all()
+
+        now = datetime.utcnow()
+        with self._lock:
+            for offer_id, points in groupby(rows, key=lambda r: r["offer_id"]):
+                tracks[offer_id].extend(points)
+            etas = {offer_id: self._estimate(offer_id, track, now) for offer_id, track in tracks.items()}
+            self._tracks, self._etas = tracks, etas
+            self._refreshed_at = time.monotonic()
+            self._loaded = True
+
+    # ─── Reads ─────────────────────────────────────────────────────────────
+
+    def _ensure_fresh(self, db: Session) -> None:
+        if time.monotonic() - self._refreshed_at < ETA_REFRESH_SECONDS:
+            return
+        # One request refreshes; the others keep serving the current ETAs (or wait for the first load)
+        if self._refresh_lock.acquire(blocking=not self._loaded):
+            try:
+                if time.monotonic() - self._refreshed_at >= ETA_REFRESH_SECONDS:
+                    self.refresh_all(db)
+            finally:
+                self._refresh_lock.release()
+
+    def get(self, db: Session, offer) -> Optional[dict]:
+        if offer.status != OfferStatus.IN_PROGRESS:
+            return None
+        self._ensure_fresh(db)
+        return self._etas.get(offer.id)
+
+    def get_all(self, db: Session) -> List[dict]:
+        self._ensure_fresh(db)
+        return [eta for eta in list(self._etas.values()) if eta]
+
+
+eta = EtaService()
+telemetry.on_points(eta.observe)
@@ -0,0 +1,274 @@
+from sqlalchemy import Boolean, Date, DateTime, Enum as SQLEnum, Float, Integer, Table, cast, func, null, select
+from sqlalchemy.engine import Engine
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import csv
+import enum
+import io
+import json
+import os
+
+from models import Offer, OfferArchive, Driver, OfferEvent
+from config import EXPORT_BATCH_ROWS, EXPORT_PARQUET_COMPRESSION
+
+FORMATS = ("parquet", "csv")
+STATE_FILE = "_export_state.json"
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ExportTable:
+    """
+    One exported dataset: its source tables (read in turn, with the same columns) and
+    the timestamp that assigns each row to a day partition. Mutable rows (offers,
+    drivers) land in the day they last changed, so consumers keep the newest row per id.
+    """
+
+    def __init__(self, name: str, sources: Sequence[Table], time_column: str, exclude: Sequence[str] = ()):
+        self.name = name
+        self.sources = sources
+        self.time_column = time_column
+        first = sources[0]
+        self.columns = [col for col in first.columns if col.name not in exclude]
+        for source in sources[1:]:
+            self.columns += [col for col in source.columns if col.name not in first.columns and col.name not in exclude]
+
+    def _select(self, source: Table, start: datetime, end: datetime):
+        time_column = source.c[self.time_column]
+        selected = [source.c[col.name] if col.name in source.c else cast(null(), col.type).label(col.name)
+                    for col in self.columns]
+        return select(*selected).where(time_column >= start, time_column < end).order_by(time_column, source.c.id)
+
+    def batches(self, engine: Engine, start: datetime, end: datetime,
+                batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[List[tuple]]:
+        """Rows changed in [start, end), at most `batch_rows` at a time, from a server-side cursor."""
+        with engine.connect() as conn:
+            for source in self.sources:
+                result = conn.execution_options(stream_results=True, max_row_buffer=batch_rows).execute(
+                    self._select(source, start, end)
+                )
+                for rows in result.partitions(batch_rows):
+                    yield [tuple(value.value if isinstance(value, enum.Enum) else value for value in row)
+                           for row in rows]
+
+
+EXPORTS: Dict[str, ExportTable] = {
+    table.name: table for table in (
+        ExportTable("offers", [Offer.__table__, OfferArchive.__table__], "updated_at"),
+        ExportTable("drivers", [Driver.__table__], "updated_at", exclude=("license_number", "insurance_number")),
+        ExportTable("offer_events", [OfferEvent.__table__], "occurred_at"),
+    )
+}
+
+
+# ─── Writers ───────────────────────────────────────────────────────────────────
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain, for streaming."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def _arrow_type(pa, column):
+    sa_type = column.type
+    if isinstance(sa_type, SQLEnum):
+        return pa.string()
+    if isinstance(sa_type, Integer):
+        return pa.int64()
+    if isinstance(sa_type, Float):
+        return pa.float64()
+    if isinstance(sa_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sa_type, Date):
+        return pa.date32()
+    if isinstance(sa_type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+
+class ParquetWriter:
+    """Each batch becomes an Arrow record batch and one Parquet row group."""
+    media_type = "application/vnd.apache.parquet"
+    suffix = ".parquet"
+
+    def __init__(self, sink, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([pa.field(col.name, _arrow_type(pa, col)) for col in columns])
+        self._writer = pq.ParquetWriter(sink, self.schema, compression=EXPORT_PARQUET_COMPRESSION)
+
+    def write(self, rows: List[tuple]) -> None:
+        pa = self._pa
+        arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), self.schema)]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class CsvWriter:
+    """Plain CSV for environments without pyarrow."""
+    media_type = "text/csv"
+    suffix = ".csv"
+
+    def __init__(self, sink, columns):
+        self._text = io.TextIOWrapper(sink, encoding="utf-8", newline="", write_through=True)
+        self._csv = csv.writer(self._text)
+        self._csv.writerow([col.name for col in columns])
+
+    def write(self, rows: List[tuple]) -> None:
+        self._csv.writerows(rows)
+
+    def close(self) -> None:
+        self._text.flush()
+        self._text.detach()
+
+
+WRITERS: Dict[str, Callable] = {"parquet": ParquetWriter, "csv": CsvWriter}
+
+
+def iter_export(engine: Engine, name: str, start: datetime, end: datetime, fmt: str = "parquet") -> Iterator[bytes]:
+    """
+    The file for one dataset and time range, produced batch by batch.
+    Memory stays around one batch (plus one row group) however many rows match.
+    """
+    table = EXPORTS[name]
+    sink = _ChunkSink()
+    writer = WRITERS[fmt](sink, table.columns)
+    for rows in table.batches(engine, start, end):
+        writer.write(rows)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+# ─── Partitioned export to a directory ─────────────────────────────────────────
+
+def _days(start: date, end: date) -> Iterator[date]:
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def _first_day(engine: Engine, table: ExportTable) -> Optional[date]:
+    with engine.connect() as conn:
+        firsts = [conn.execute(select(func.min(source.c[table.time_column]))).scalar() for source in table.sources]
+    firsts = [value for value in firsts if value is not None]
+    if not firsts:
+        return None
+    first = min(firsts)
+    return (datetime.fromisoformat(first) if isinstance(first, str) else first).date()
+
+
+def write_partition(engine: Engine, out_dir: str, name: str, day: date, fmt: str = "parquet") -> int:
+    """
+    Write <out_dir>/<name>/date=YYYY-MM-DD/part-0.<fmt> for one day and return its row
+    count. Written to a temporary file and renamed, so readers never see a partial
+    file; a day with no rows leaves no file (and removes a stale one).
+    """
+    table = EXPORTS[name]
+    start = datetime.combine(day, datetime.min.time())
+    directory = os.path.join(out_dir, name, f"date={day.isoformat()}")
+    path = os.path.join(directory, "part-0" + WRITERS[fmt].suffix)
+
+    rows_written, writer, handle = 0, None, None
+    try:
+        for rows in table.batches(engine, start, start + timedelta(days=1)):
+            if writer is None:
+                os.makedirs(directory, exist_ok=True)
+                handle = open(path + ".tmp", "wb")
+                writer = WRITERS[fmt](handle, table.columns)
+            writer.write(rows)
+            rows_written += len(rows)
+        if writer is not None:
+            writer.close()
+            handle.close()
+            os.replace(path + ".tmp", path)
+        elif os.path.exists(path):
+            os.remove(path)
+    finally:
+        if handle is not None and not handle.closed:
+            handle.close()
+            os.remove(path + ".tmp")
+    return rows_written
+
+
+def _load_state(out_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(out_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(out_dir: str, state: Dict[str, str]) -> None:
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def export_partitions(
+    engine: Engine,
+    out_dir: str,
+    names: Sequence[str] = tuple(EXPORTS),
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    fmt: str = "parquet",
+    log: Callable[[str], None] = print,
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Incremental daily export. Each dataset resumes the day after the last one recorded
+    in <out_dir>/_export_state.json (or starts at its oldest row) and runs through
+    `until`, by default yesterday (UTC) so only complete days are written. Passing
+    `since` re-exports from that day. Returns {name: (days, rows)}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state = _load_state(out_dir)
+    until = until or datetime.utcnow().date() - timedelta(days=1)
+    totals = {}
+
+    for name in names:
+        start = since
+        if start is None and name in state:
+            start = date.fromisoformat(state[name]) + timedelta(days=1)
+        if start is None:
+            start = _first_day(engine, EXPORTS[name])
+        days = rows = 0
+        if start is not None:
+            for day in _days(start, until):
+                written = write_partition(engine, out_dir, name, day, fmt)
+                if written:
+                    log(f"{name} {day.isoformat()}: {written:,} rows")
+                days, rows = days + 1, rows + written
+                state[name] = day.isoformat()
+                _save_state(out_dir, state)
+        totals[name] = (days, rows)
+    return totals
@@ -0,0 +1,200 @@
+from sqlalchemy import case, event, func, insert, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import List, Optional, Sequence
+
+from models import Offer, OfferEvent, OfferStatus
+
+GROUP_BY = ("none", "client", "driver", "period")
+PERIODS = ("day", "week", "month")
+
+
+# ─── Recording ─────────────────────────────────────────────────────────────────
+
+@event.listens_for(Offer.status, "set", active_history=True)
+def _load_previous_status(target, value, oldvalue, initiator):
+    """active_history loads the old status even when it's overwritten unread, so events know where they came from."""
+
+
+@event.listens_for(Session, "after_flush")
+def _record_offer_events(session, flush_context):
+    """
+    Append an event for every offer created or whose status changed in this flush.
+    Written on the flush's connection, so it commits or rolls back with the change,
+    whichever route (or sweep) made it.
+    """
+    now = datetime.utcnow()
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, Offer):
+            rows.append({
+                "offer_id": obj.id, "client_id": obj.client_id, "driver_id": obj.driver_id,
+                "from_status": None, "to_status": obj.status or OfferStatus.PENDING,
+                "occurred_at": obj.created_at or now,
+            })
+    for obj in session.dirty:
+        if not isinstance(obj, Offer):
+            continue
+        history = inspect(obj).attrs.status.history
+        if history.added and history.deleted and history.added[0] != history.deleted[0]:
+            rows.append({
+                "offer_id": obj.id, "client_id": obj.client_id, "driver_id": obj.driver_id,
+                "from_status": history.deleted[0], "to_status": history.added[0],
+                "occurred_at": now,
+            })
+    if rows:
+        session.connection().execute(insert(OfferEvent), rows)
+
+
+@event.listens_for(Session, "before_flush")
+def _keep_offer_events_append_only(session, flush_context, instances):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, OfferEvent):
+            raise ValueError("offer_events is append-only")
+
+
+# ─── Analytics ─────────────────────────────────────────────────────────────────
+
+def _seconds_between(db: Session, start, end):
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    return func.extract("epoch", end - start)
+
+
+def _period_start(db: Session, column, period: str):
+    """ISO date of the day, week (Monday) or month a timestamp falls in."""
+    if db.get_bind().dialect.name == "sqlite":
+        return {
+            "day": func.strftime("%Y-%m-%d", column),
+            "week": func.date(column, "weekday 0", "-6 days"),
+            "month": func.strftime("%Y-%m-01", column),
+        }[period]
+    return func.to_char(func.date_trunc(period, column), "YYYY-MM-DD")
+
+
+def _group_column(db: Session, group_by: str, period: str, client_id, driver_id, at):
+    return {
+        "none": literal("all"),
+        "client": client_id,
+        "driver": driver_id,
+        "period": _period_start(db, at, period),
+    }[group_by]
+
+
+def _summarize(db: Session, durations, percentiles: Sequence[float]) -> List[dict]:
+    """
+    Count, mean and nearest-rank percentiles of `durations.c.seconds` per (grp, name),
+    ranked with window functions so only the summary rows leave the database.
+    """
+    partition = [durations.c.grp, durations.c.name]
+    ranked = select(
+        durations.c.grp,
+        durations.c.name,
+        durations.c.seconds,
+        func.row_number().over(partition_by=partition, order_by=durations.c.seconds).label("rn"),
+        func.count().over(partition_by=partition).label("n"),
+    ).subquery()
+
+    columns = [ranked.c.grp, ranked.c.name, func.max(ranked.c.n).label("count"), func.avg(ranked.c.seconds).label("mean")]
+    for p in percentiles:
+        # Smallest duration with at least p% of the group at or below it
+        columns.append(func.min(case((ranked.c.rn * 100.0 >= p * ranked.c.n, ranked.c.seconds))))
+    rows = db.execute(select(*columns).group_by(ranked.c.grp, ranked.c.name).order_by(ranked.c.grp, ranked.c.name))
+
+    return [{
+        "group": None if row[0] is None else str(row[0]),
+        "name": row[1].value if isinstance(row[1], OfferStatus) else row[1],
+        "count": row[2],
+        "mean_seconds": round(row[3], 3),
+        "percentiles": {f"p{p:g}": round(value, 3) for p, value in zip(percentiles, row[4:])},
+    } for row in rows]
+
+
+def time_in_status(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    group_by: str = "none",
+    period: str = "week",
+    client_id: Optional[int] = None,
+    driver_id: Optional[int] = None,
+    status: Optional[OfferStatus] = None,
+    percentiles: Sequence[float] = (50, 90, 99),
+) -> List[dict]:
+    """
+    How long offers stayed in each status, for stays that began in [start, end).
+    A stay runs from an event to the offer's next event (LEAD over the offer's
+    events); the current, still-open stay of each offer isn't counted.
+    """
+    events = select(
+        OfferEvent.client_id,
+        OfferEvent.driver_id,
+        OfferEvent.to_status.label("status"),
+        OfferEvent.occurred_at.label("entered_at"),
+        func.lead(OfferEvent.occurred_at).over(
+            partition_by=OfferEvent.offer_id,
+            order_by=(OfferEvent.occurred_at, OfferEvent.id)
+        ).label("left_at"),
+    ).where(OfferEvent.occurred_at >= start)  # a stay that began after `start` also ended after it
+    if client_id is not None:
+        events = events.where(OfferEvent.client_id == client_id)
+    events = events.subquery()
+
+    stays = select(
+        _group_column(db, group_by, period, events.c.client_id, events.c.driver_id, events.c.entered_at).label("grp"),
+        events.c.status.label("name"),
+        _seconds_between(db, events.c.entered_at, events.c.left_at).label("seconds"),
+    ).where(events.c.left_at.isnot(None), events.c.entered_at < end)
+    if driver_id is not None:
+        stays = stays.where(events.c.driver_id == driver_id)
+    if group_by == "driver":
+        stays = stays.where(events.c.driver_id.isnot(None))
+    if status is not None:
+        stays = stays.where(events.c.status == status)
+
+    return _summarize(db, stays.subquery(), percentiles)
+
+
+def lead_times(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    group_by: str = "none",
+    period: str = "week",
+    client_id: Optional[int] = None,
+    driver_id: Optional[int] = None,
+    percentiles: Sequence[float] = (50, 90, 99),
+) -> List[dict]:
+    """
+    time_to_match (creation to first MATCHED) and time_to_complete (creation to
+    COMPLETED) for offers created in [start, end), aggregated per offer in SQL.
+    """
+    per_offer = select(
+        func.max(OfferEvent.client_id).label("client_id"),
+        func.max(case((OfferEvent.to_status == OfferStatus.MATCHED, OfferEvent.driver_id))).label("driver_id"),
+        func.min(case((OfferEvent.from_status.is_(None), OfferEvent.occurred_at))).label("created_at"),
+        func.min(case((OfferEvent.to_status == OfferStatus.MATCHED, OfferEvent.occurred_at))).label("matched_at"),
+        func.min(case((OfferEvent.to_status == OfferStatus.COMPLETED, OfferEvent.occurred_at))).label("completed_at"),
+    ).where(OfferEvent.occurred_at >= start).group_by(OfferEvent.offer_id)
+    if client_id is not None:
+        per_offer = per_offer.where(OfferEvent.client_id == client_id)
+    per_offer = per_offer.subquery()
+
+    def metric(name: str, reached_at):
+        query = select(
+            _group_column(db, group_by, period, per_offer.c.client_id, per_offer.c.driver_id,
+                          per_offer.c.created_at).label("grp"),
+            literal(name).label("name"),
+            _seconds_between(db, per_offer.c.created_at, reached_at).label("seconds"),
+        ).where(per_offer.c.created_at < end, reached_at.isnot(None))
+        if driver_id is not None:
+            query = query.where(per_offer.c.driver_id == driver_id)
+        if group_by == "driver":
+            query = query.where(per_offer.c.driver_id.isnot(None))
+        return query
+
+    durations = union_all(
+        metric("time_to_match", per_offer.c.matched_at),
+        metric("time_to_complete", per_offer.c.completed_at),
+    ).subquery()
+    return _summarize(db, durations, percentiles)
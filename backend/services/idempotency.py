@@ -0,0 +1,248 @@
+from jose import JWTError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import re
+import time
+
+from models import IdempotencyKey
+from auth.jwt_backend import decode_token
+from utils.sweeps import delete_in_chunks
+from config import (
+    IDEMPOTENCY_TTL_HOURS,
+    IDEMPOTENCY_WAIT_SECONDS,
+    IDEMPOTENCY_LOCK_SECONDS,
+)
+
+# Writes that mobile clients retry on timeouts
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/offers$")),
+    ("POST", re.compile(r"^/driver/offers/\d+/accept$")),
+    ("PUT", re.compile(r"^/driver/offers/\d+/status$")),
+    ("POST", re.compile(r"^/admin/batch$")),
+]
+
+MAX_KEY_LENGTH = 255
+# How often a duplicate waiting on another worker re-checks the stored outcome
+POLL_SECONDS = 0.1
+
+Stored = Tuple[int, Optional[str], bytes]  # status, content type, body
+
+
+def _sha256(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _subject(authorization: Optional[str]) -> Optional[str]:
+    """The token's user, so the same key from two users never collides. None if unauthenticated."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return decode_token(authorization[7:]).get("sub")
+    except JWTError:
+        return None
+
+
+def purge_expired_keys(db: Session) -> int:
+    return delete_in_chunks(db, IdempotencyKey, IdempotencyKey.expires_at < datetime.utcnow())
+
+
+def _claim(key: str, fingerprint: str) -> Tuple[str, Optional[Stored]]:
+    """
+    Try to become the request that executes for `key`.
+    Returns ("claimed" | "mismatch" | "in_progress" | "completed", stored response).
+    """
+    from database import SessionLocal
+
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        row = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        abandoned = row is not None and row.status_code is None and \
+            row.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        if row is not None and (row.expires_at < now or abandoned):
+            db.delete(row)
+            db.flush()
+            row = None
+
+        if row is None:
+            db.add(IdempotencyKey(
+                key=key,
+                fingerprint=fingerprint,
+                expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+            ))
+            try:
+                db.commit()
+                return "claimed", None
+            except IntegrityError:
+                # Another worker claimed it first
+                db.rollback()
+                row = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+                if row is None:
+                    return "in_progress", None
+
+        if row.fingerprint != fingerprint:
+            return "mismatch", None
+        if row.status_code is None:
+            return "in_progress", None
+        return "completed", (row.status_code, row.content_type, row.response_body)
+
+
+def _complete(key: str, stored: Optional[Stored]) -> None:
+    """Store the outcome, or drop the claim so a retry executes again."""
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        query = db.query(IdempotencyKey).filter(IdempotencyKey.key == key)
+        if stored is None:
+            query.delete(synchronize_session=False)
+        else:
+            status_code, content_type, body = stored
+            query.update(
+                {"status_code": status_code, "content_type": content_type, "response_body": body},
+                synchronize_session=False
+            )
+        db.commit()
+
+
+def _json(status_code: int, detail: str) -> Stored:
+    return status_code, "application/json", json.dumps({"detail": detail}).encode()
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the stored response when a covered write is retried with the same
+    Idempotency-Key, instead of running the handler again.
+
+    The first request claims the key with a row in idempotency_keys. Duplicates
+    arriving while it runs wait for its outcome: in the same process they await
+    it directly, from other workers they poll the row. Responses below 500 are
+    stored for IDEMPOTENCY_TTL_HOURS; server errors release the key so the
+    client's retry executes. Reusing a key for a different request is a 422.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            scope["method"] == method and pattern.match(scope["path"]) for method, pattern in IDEMPOTENT_ROUTES
+        ):
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        raw_key = headers.get("idempotency-key")
+        subject = _subject(headers.get("authorization"))
+        if not raw_key or subject is None:
+            return await self.app(scope, receive, send)
+        if len(raw_key) > MAX_KEY_LENGTH:
+            return await self._send(send, _json(400, f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"))
+
+        body = await self._read_body(receive)
+        key = _sha256(subject, raw_key)
+        fingerprint = _sha256(scope["method"], scope["path"], scope.get("query_string", b""), body)
+
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            # Coalesce with the copy already running in this process
+            if inflight[0] != fingerprint:
+                return await self._send(send, _json(422, "Idempotency-Key was already used for a different request"))
+            try:
+                stored = await asyncio.wait_for(asyncio.shield(inflight[1]), IDEMPOTENCY_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                return await self._send(send, _json(409, "A request with this Idempotency-Key is still in progress"))
+            if stored is not None:
+                return await self._send(send, stored, replayed=True)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        outcome = None
+        try:
+            outcome, replayed, raw_headers = await self._execute(scope, key, fingerprint, body)
+        finally:
+            self._inflight.pop(key, None)
+            # Waiters replay anything but a server error, which they retry themselves
+            future.set_result(outcome if outcome and outcome[0] < 500 else None)
+        await self._send(send, outcome, replayed=replayed, raw_headers=raw_headers)
+
+    async def _execute(self, scope, key, fingerprint, body) -> Tuple[Stored, bool, Optional[list]]:
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            state, stored = await run_in_threadpool(_claim, key, fingerprint)
+            if state == "claimed":
+                break
+            if state == "mismatch":
+                return _json(422, "Idempotency-Key was already used for a different request"), False, None
+            if state == "completed":
+                return stored, True, None
+            # Running on another worker
+            if time.monotonic() >= deadline:
+                return _json(409, "A request with this Idempotency-Key is still in progress"), False, None
+            await asyncio.sleep(POLL_SECONDS)
+
+        try:
+            response, raw_headers = await self._capture(scope, body)
+        except BaseException:
+            await run_in_threadpool(_complete, key, None)
+            raise
+        await run_in_threadpool(_complete, key, response if response[0] < 500 else None)
+        return response, False, raw_headers
+
+    async def _capture(self, scope, body: bytes) -> Tuple[Stored, list]:
+        """Run the handler with the buffered body; returns the response and its raw headers."""
+        sent = False
+        status_code, content_type, raw_headers, chunks = 500, None, [], []
+
+        async def replay_body():
+            nonlocal sent
+            if sent:
+                return {"type": "http.disconnect"}
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def collect(message):
+            nonlocal status_code, content_type, raw_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                raw_headers = list(message.get("headers", []))
+                content_type = Headers(raw=raw_headers).get("content-type")
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, replay_body, collect)
+        return (status_code, content_type, b"".join(chunks)), raw_headers
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _send(send, stored: Stored, replayed: bool = False, raw_headers: Optional[list] = None) -> None:
+        status_code, content_type, body = stored
+        if raw_headers:
+            headers = raw_headers
+        else:
+            headers = [(b"content-length", str(len(body)).encode())]
+            if content_type:
+                headers.append((b"content-type", content_type.encode()))
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,342 @@
+from sqlalchemy import exists, func, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import json
+import multiprocessing
+import os
+import secrets
+import socket
+
+from models import Invoice, InvoiceRate, InvoiceRun, InvoiceRunStatus, Offer, OfferArchive, OfferEvent, OfferStatus, User
+from utils.invoice_render import render_invoice
+from config import INVOICE_CURRENCY, INVOICE_CHUNK_CLIENTS, INVOICE_RENDER_WORKERS, INVOICE_RUN_LEASE_SECONDS
+
+PER_MILE = "per_mile"
+PER_OFFER = "per_offer"
+RENDER_CHUNK = 200  # invoices rendered and stored per commit
+
+
+class InvoiceRunBusy(Exception):
+    """Another process holds the run for this period (or took it over from us)."""
+
+
+def parse_period(period: str) -> Tuple[date, date]:
+    """First day of a "YYYY-MM" period and first day of the next one."""
+    try:
+        start = datetime.strptime(period, "%Y-%m").date()
+    except (TypeError, ValueError):
+        raise ValueError("Period must be YYYY-MM")
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def previous_period(today: Optional[date] = None) -> str:
+    first = (today or datetime.utcnow().date()).replace(day=1)
+    return (first - timedelta(days=1)).strftime("%Y-%m")
+
+
+def rate_item(name: str) -> str:
+    """Rate table key for an additional service, matching how offers are grouped in SQL."""
+    return name.strip().lower()
+
+
+# ─── Aggregation ───────────────────────────────────────────────────────────────
+
+def _completed_offers(start: datetime, end: datetime):
+    """
+    Offers (live or archived) whose first COMPLETED event falls in [start, end) and
+    that are still completed. An offer completed again after an admin edit belongs
+    to the period of its first completion, so it is never billed twice.
+    """
+    earlier = aliased(OfferEvent)
+    completions = select(OfferEvent.offer_id).where(
+        OfferEvent.to_status == OfferStatus.COMPLETED,
+        OfferEvent.occurred_at >= start,
+        OfferEvent.occurred_at < end,
+        ~exists().where(
+            earlier.offer_id == OfferEvent.offer_id,
+            earlier.to_status == OfferStatus.COMPLETED,
+            earlier.occurred_at < start,
+        ),
+    ).group_by(OfferEvent.offer_id).subquery()
+
+    return union_all(*(
+        select(table.c.client_id, table.c.total_mileage, table.c.additional_service)
+        .join(completions, completions.c.offer_id == table.c.id)
+        .where(table.c.status == OfferStatus.COMPLETED)
+        for table in (Offer.__table__, OfferArchive.__table__)
+    )).subquery()
+
+
+def aggregate_period(db: Session, period: str, after_client_id: int = 0) -> Dict[int, dict]:
+    """
+    {client_id: {"offers": n, "miles": m, "services": {service: n}}} for clients above
+    `after_client_id`, counted and summed in one GROUP BY. Only one row per client and
+    service comes back, so this stays small however many offers there are.
+    """
+    start, end = parse_period(period)
+    offers = _completed_offers(datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time()))
+    service = func.lower(func.trim(offers.c.additional_service))
+    rows = db.execute(
+        select(offers.c.client_id, service, func.count(), func.coalesce(func.sum(offers.c.total_mileage), 0.0))
+        .where(offers.c.client_id > after_client_id)
+        .group_by(offers.c.client_id, service)
+        .order_by(offers.c.client_id)
+    )
+    totals: Dict[int, dict] = {}
+    for client_id, service_name, count, miles in rows:
+        entry = totals.setdefault(client_id, {"offers": 0, "miles": 0.0, "services": {}})
+        entry["offers"] += count
+        entry["miles"] += miles
+        if service_name:
+            entry["services"][service_name] = entry["services"].get(service_name, 0) + count
+    return totals
+
+
+# ─── Rates ─────────────────────────────────────────────────────────────────────
+
+class RateTable:
+    """The rates in force on one date: a client's own rates first, then the defaults."""
+
+    def __init__(self, rows: Iterable[InvoiceRate]):
+        self._rates: Dict[Tuple[Optional[int], str], Tuple[date, int]] = {}
+        for row in rows:
+            key = (row.client_id, row.item)
+            if key not in self._rates or row.effective_from >= self._rates[key][0]:
+                self._rates[key] = (row.effective_from, row.unit_price_cents)
+
+    @classmethod
+    def load(cls, db: Session, on: date) -> "RateTable":
+        return cls(db.query(InvoiceRate).filter(InvoiceRate.effective_from <= on))
+
+    def price(self, client_id: int, item: str) -> Optional[int]:
+        rate = self._rates.get((client_id, item)) or self._rates.get((None, item))
+        return rate[1] if rate else None
+
+    def has_client_rates(self) -> bool:
+        return any(client_id is not None for client_id, _ in self._rates)
+
+
+def _amount(quantity, unit_price_cents: int) -> int:
+    return int((Decimal(str(quantity)) * unit_price_cents).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def invoice_lines(client_id: int, totals: dict, rates: RateTable) -> List[dict]:
+    """Mileage, a per-offer charge when one is set, then one line per additional service."""
+    lines = []
+
+    def add(description: str, qty, price: Optional[int]):
+        lines.append({
+            "description": description if price is not None else f"{description} (no rate set)",
+            "quantity": qty,
+            "unit_price_cents": price or 0,
+            "amount_cents": _amount(qty, price or 0),
+        })
+
+    miles = round(totals["miles"], 1)
+    if miles:
+        add("Mileage", miles, rates.price(client_id, PER_MILE))
+    per_offer = rates.price(client_id, PER_OFFER)
+    if per_offer is not None:
+        add("Completed offers", totals["offers"], per_offer)
+    for service, count in sorted(totals["services"].items()):
+        add(service.capitalize(), count, rates.price(client_id, service))
+    return lines
+
+
+# ─── Run ───────────────────────────────────────────────────────────────────────
+
+def _claim(db: Session, period: str, holder: str) -> Optional[InvoiceRun]:
+    """The period's run, claimed for `holder`; None when it has already completed."""
+    now = datetime.utcnow()
+    run = db.query(InvoiceRun).filter(InvoiceRun.period == period).first()
+    if run is None:
+        try:
+            db.add(InvoiceRun(period=period, holder=holder, started_at=now, updated_at=now))
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # created concurrently; fall through and try to claim it
+        run = db.query(InvoiceRun).filter(InvoiceRun.period == period).first()
+        if run.holder == holder:
+            return run
+    if run.status == InvoiceRunStatus.COMPLETED:
+        return None
+
+    claimed = db.execute(update(InvoiceRun).where(
+        InvoiceRun.id == run.id,
+        or_(InvoiceRun.status != InvoiceRunStatus.RUNNING,
+            InvoiceRun.updated_at < now - timedelta(seconds=INVOICE_RUN_LEASE_SECONDS)),
+    ).values(status=InvoiceRunStatus.RUNNING, holder=holder, updated_at=now, last_error=None)).rowcount
+    db.commit()
+    if not claimed:
+        raise InvoiceRunBusy(f"Invoicing for {period} is already running")
+    db.refresh(run)
+    return run
+
+
+def _checkpoint(db: Session, run: InvoiceRun, holder: str, **values) -> None:
+    """Renew the lease and record progress in the caller's transaction; raises if the run was taken over."""
+    renewed = db.execute(update(InvoiceRun).where(
+        InvoiceRun.id == run.id, InvoiceRun.holder == holder
+    ).values(updated_at=datetime.utcnow(), **values)).rowcount
+    if not renewed:
+        db.rollback()
+        raise InvoiceRunBusy(f"Invoicing for {run.period} was taken over by another process")
+
+
+def create_invoices(db: Session, run: InvoiceRun, holder: str,
+                    chunk_clients: int = INVOICE_CHUNK_CLIENTS, log: Callable[[str], None] = lambda msg: None) -> int:
+    """
+    Insert the period's invoices for clients after run.last_client_id, a chunk of
+    clients per commit. The cursor is saved in the same transaction as the chunk,
+    and (client_id, period) is unique, so a resumed or repeated run never bills twice.
+    """
+    start, end = parse_period(run.period)
+    totals = aggregate_period(db, run.period, run.last_client_id)
+    rates = RateTable.load(db, start)
+    client_ids = list(totals)
+    created = 0
+
+    for i in range(0, len(client_ids), chunk_clients):
+        chunk = client_ids[i:i + chunk_clients]
+        clients = {user.id: user for user in db.query(User).filter(User.id.in_(chunk))}
+        already = {client_id for (client_id,) in db.query(Invoice.client_id).filter(
+            Invoice.period == run.period, Invoice.client_id.in_(chunk)
+        )}
+        rows = []
+        for client_id in chunk:
+            if client_id in already:
+                continue
+            client = clients.get(client_id)
+            lines = invoice_lines(client_id, totals[client_id], rates)
+            rows.append({
+                "number": f"INV-{run.period}-{client_id:06d}",
+                "client_id": client_id,
+                "period": run.period,
+                "period_start": start,
+                "period_end": end - timedelta(days=1),
+                "bill_to": client.company_name if client else None,
+                "bill_to_email": client.email if client else None,
+                "bill_to_address": client.address if client else None,
+                "currency": INVOICE_CURRENCY,
+                "offer_count": totals[client_id]["offers"],
+                "total_miles": round(totals[client_id]["miles"], 1),
+                "total_cents": sum(line["amount_cents"] for line in lines),
+                "lines": json.dumps(lines),
+                "created_at": datetime.utcnow(),
+            })
+        if rows:
+            db.execute(Invoice.__table__.insert(), rows)
+        created += len(rows)
+        _checkpoint(db, run, holder, last_client_id=chunk[-1],
+                    invoices_created=InvoiceRun.invoices_created + len(rows))
+        db.commit()
+        log(f"{run.period}: invoiced clients up to #{chunk[-1]} ({created:,} new invoices)")
+    return created
+
+
+def invoice_document(invoice: Invoice) -> dict:
+    """What the renderer needs, as plain values that pickle cheaply."""
+    return {
+        "number": invoice.number,
+        "issued_on": invoice.created_at.date().isoformat(),
+        "period_start": invoice.period_start.isoformat(),
+        "period_end": invoice.period_end.isoformat(),
+        "bill_to": invoice.bill_to or f"Client #{invoice.client_id}",
+        "bill_to_email": invoice.bill_to_email,
+        "bill_to_address": invoice.bill_to_address,
+        "currency": invoice.currency,
+        "offer_count": invoice.offer_count,
+        "total_miles": invoice.total_miles,
+        "total_cents": invoice.total_cents,
+        "lines": json.loads(invoice.lines),
+    }
+
+
+def render_pending(db: Session, run: InvoiceRun, holder: str, workers: int = INVOICE_RENDER_WORKERS,
+                   log: Callable[[str], None] = lambda msg: None) -> int:
+    """
+    Render the period's invoices that have no documents yet. Rendering is CPU-bound,
+    so it runs in a pool of `workers` processes (0 = one per CPU, 1 = in this process);
+    the next chunk renders while the previous one is written. Workers are started
+    with "spawn", which is safe from the API process's threads.
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = db.query(Invoice.id).filter(Invoice.period == run.period, Invoice.rendered_at.is_(None)).count()
+    # Starting the workers takes a second or two; not worth it for a handful of invoices
+    use_pool = workers > 1 and pending > RENDER_CHUNK
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) if use_pool else None
+
+    def render(documents: List[dict]):
+        if pool is None:
+            return [render_invoice(document) for document in documents]
+        return pool.map(render_invoice, documents, chunksize=max(1, len(documents) // (workers * 4)))
+
+    rendered, last_id, in_flight = 0, 0, None
+    try:
+        while True:
+            invoices = db.query(Invoice).filter(
+                Invoice.period == run.period, Invoice.rendered_at.is_(None), Invoice.id > last_id
+            ).order_by(Invoice.id).limit(RENDER_CHUNK).all()
+            submitted = None
+            if invoices:
+                last_id = invoices[-1].id
+                submitted = ([invoice.id for invoice in invoices],
+                             render([invoice_document(invoice) for invoice in invoices]))
+            if in_flight:
+                ids, results = in_flight
+                now = datetime.utcnow()
+                db.execute(update(Invoice), [
+                    {"id": invoice_id, "html": html, "pdf": pdf, "rendered_at": now}
+                    for invoice_id, (html, pdf) in zip(ids, results)
+                ])
+                rendered += len(ids)
+                _checkpoint(db, run, holder, invoices_rendered=InvoiceRun.invoices_rendered + len(ids))
+                db.commit()
+                log(f"{run.period}: rendered {rendered:,} invoices")
+            if submitted is None:
+                break
+            in_flight = submitted
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+    return rendered
+
+
+def run_invoicing(db: Session, period: str, workers: int = INVOICE_RENDER_WORKERS,
+                  log: Callable[[str], None] = lambda msg: None) -> InvoiceRun:
+    """
+    Invoice every client with completed offers in `period` ("YYYY-MM") and render the
+    documents. Safe to repeat and to resume after a crash: a completed period is left
+    alone, and an interrupted one continues from its last committed chunk. Raises
+    InvoiceRunBusy while another process is running the same period.
+    """
+    parse_period(period)
+    holder = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+    run = _claim(db, period, holder)
+    if run is None:
+        return db.query(InvoiceRun).filter(InvoiceRun.period == period).one()
+
+    try:
+        create_invoices(db, run, holder, log=log)
+        render_pending(db, run, holder, workers, log=log)
+        _checkpoint(db, run, holder, status=InvoiceRunStatus.COMPLETED, finished_at=datetime.utcnow())
+        db.commit()
+    except InvoiceRunBusy:
+        raise
+    except Exception as exc:
+        db.rollback()
+        _checkpoint(db, run, holder, status=InvoiceRunStatus.FAILED, last_error=f"{type(exc).__name__}: {exc}"[:500])
+        db.commit()
+        raise
+    db.refresh(run)
+    return run
+
+
+def run_previous_period(db: Session) -> str:
+    """Scheduled job: invoice last month (a no-op once that run has completed)."""
+    run = run_invoicing(db, previous_period())
+    return f"{run.period} {run.status.value}: {run.invoices_created} invoices"
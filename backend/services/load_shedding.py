@@ -0,0 +1,95 @@
+from collections import deque
+from typing import Deque
+import asyncio
+import json
+import math
+import time
+
+from config import LOAD_SHED_ENABLED, LOAD_SHED_MAX_CONCURRENCY, LOAD_SHED_TARGET_MS, LOAD_SHED_MAX_QUEUE
+
+# Probes must keep answering while the worker is saturated
+EXEMPT_PATHS = ("/healthz",)
+
+
+class LoadSheddingMiddleware:
+    """
+    Admission control for one worker process.
+
+    At most `max_concurrency` requests run at once; the rest wait in a FIFO queue.
+    A request that has waited longer than `target_ms`, or that arrives to a full
+    queue, is answered 503 with Retry-After instead of joining an ever-growing
+    backlog, so the requests that are admitted still finish in reasonable time.
+    """
+
+    def __init__(self, app, enabled: bool = LOAD_SHED_ENABLED, max_concurrency: int = LOAD_SHED_MAX_CONCURRENCY,
+                 target_ms: int = LOAD_SHED_TARGET_MS, max_queue: int = LOAD_SHED_MAX_QUEUE):
+        self.app = app
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.target = target_ms / 1000
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.shed = 0  # requests answered 503 since start
+        self._service_time = self.target  # moving average of admitted requests' duration, for Retry-After
+
+    def _release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # the slot passes straight to the next waiter
+                return
+        self.in_flight -= 1
+
+    async def _admit(self) -> bool:
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.target)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return True  # admitted just as the wait ran out
+            waiter.cancel()
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued; hand on a slot we may have just been given
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+
+    async def _reject(self, send) -> None:
+        self.shed += 1
+        # Roughly how long the current queue needs to drain
+        retry_after = max(1, math.ceil(self._service_time * (len(self._waiters) + 1) / self.max_concurrency))
+        body = json.dumps({"detail": "Server is busy. Please retry shortly."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            return await self.app(scope, receive, send)
+        if not await self._admit():
+            return await self._reject(send)
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - started)
+            self._release()
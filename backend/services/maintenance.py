@@ -0,0 +1,110 @@
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from typing import Optional
+
+from models import Offer, OfferStatus, Driver
+from auth.tokens import purge_expired_tokens
+from auth.sessions import purge_revoked_tokens
+from config import SWEEP_CHUNK_SIZE, SWEEP_MAX_CHUNKS, STALE_OFFER_GRACE_HOURS, INVOICING_SCHEDULED
+from .scheduler import scheduler
+from .board import offer_board
+from .sync import purge_tombstones
+from .archive import archive_offers
+from .idempotency import purge_expired_keys
+from .webhooks import enqueue_offer_event
+from .compliance import check_document_compliance
+from .ratelimit import purge_idle_buckets
+from .invoicing import run_previous_period
+
+ACTIVE_STATUSES = (OfferStatus.MATCHED, OfferStatus.IN_PROGRESS)
+
+
+def _pickup_at(offer: Offer) -> Optional[datetime]:
+    """Pickup as a naive datetime; None when the stored strings aren't ISO formatted."""
+    try:
+        return datetime.fromisoformat(f"{offer.pickup_date}T{offer.pickup_time}")
+    except (TypeError, ValueError):
+        try:
+            # No usable time: treat the whole day as the pickup window
+            return datetime.fromisoformat(offer.pickup_date) + timedelta(days=1)
+        except (TypeError, ValueError):
+            return None
+
+
+def expire_stale_offers(db: Session) -> int:
+    """
+    Cancel PENDING offers whose pickup passed STALE_OFFER_GRACE_HOURS ago without a driver.
+    Candidates come from the (status, pickup_date) index in id-ordered chunks; the exact
+    pickup time is checked per row. Clients with webhooks get an offer.cancelled event.
+    """
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=STALE_OFFER_GRACE_HOURS)
+    expired, last_id = 0, 0
+
+    for _ in range(SWEEP_MAX_CHUNKS):
+        offers = db.query(Offer).filter(
+            Offer.status == OfferStatus.PENDING,
+            Offer.pickup_date <= cutoff.date().isoformat(),
+            Offer.id > last_id
+        ).order_by(Offer.id).limit(SWEEP_CHUNK_SIZE).all()
+        if not offers:
+            break
+        last_id = offers[-1].id
+
+        for offer in offers:
+            pickup_at = _pickup_at(offer)
+            if pickup_at is None or pickup_at > cutoff or offer.driver_id is not None:
+                continue
+            offer.status = OfferStatus.CANCELLED
+            offer.updated_at = now
+            enqueue_offer_event(db, offer)
+            expired += 1
+        db.commit()
+
+    if expired:
+        offer_board.invalidate()
+    return expired
+
+
+def reconcile_busy_drivers(db: Session) -> int:
+    """Set drivers marked busy back to available when none of their offers is matched or in progress."""
+    has_active_offer = exists().where(Offer.driver_id == Driver.id, Offer.status.in_(ACTIVE_STATUSES))
+    freed, last_id = 0, 0
+
+    for _ in range(SWEEP_MAX_CHUNKS):
+        drivers = db.query(Driver).filter(
+            Driver.status == "busy",
+            Driver.id > last_id
+        ).order_by(Driver.id).limit(SWEEP_CHUNK_SIZE).all()
+        if not drivers:
+            break
+        last_id = drivers[-1].id
+
+        idle = {driver_id for (driver_id,) in db.query(Driver.id).filter(
+            Driver.id.in_([d.id for d in drivers]),
+            ~has_active_offer
+        )}
+        now = datetime.utcnow()
+        for driver in drivers:
+            if driver.id in idle:
+                driver.status = "available"
+                driver.updated_at = now
+                freed += 1
+        db.commit()
+
+    return freed
+
+
+scheduler.add_job("expire_stale_offers", "*/5 * * * *", expire_stale_offers)
+scheduler.add_job("reconcile_busy_drivers", "*/10 * * * *", reconcile_busy_drivers)
+scheduler.add_job("purge_auth_tokens", "15 * * * *", purge_expired_tokens)
+scheduler.add_job("purge_revoked_tokens", "20 * * * *", purge_revoked_tokens)
+scheduler.add_job("purge_idempotency_keys", "25 * * * *", purge_expired_keys)
+scheduler.add_job("purge_rate_limit_buckets", "55 * * * *", purge_idle_buckets)
+scheduler.add_job("purge_offer_tombstones", "35 3 * * *", purge_tombstones)
+scheduler.add_job("archive_offers", "45 3 * * *", lambda db: archive_offers(db, max_batches=SWEEP_MAX_CHUNKS))
+scheduler.add_job("check_document_compliance", "0 6 * * *", check_document_compliance)
+if INVOICING_SCHEDULED:
+    # Hourly over the first three days: later attempts resume an interrupted run or return at once
+    scheduler.add_job("monthly_invoicing", "10 * 1-3 * *", run_previous_period)
@@ -0,0 +1,179 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional, Sequence
+import math
+import threading
+import time
+
+from models import Driver, Offer, OfferStatus, AccountStatus, PricingFactor
+from utils.versioning import get_versions
+from config import PRICING_RELOAD_SECONDS, PRICING_DEMAND_REFRESH_SECONDS
+from .invoicing import PER_MILE, PER_OFFER, RateTable, rate_item
+
+try:
+    import numpy as np
+except ImportError:  # in requirements.txt; without it the same arithmetic runs on Python lists
+    np = None
+
+FACTOR_KINDS = ("hour", "demand")
+UNKNOWN_HOUR = 24  # pickup times that don't parse get no time-of-day multiplier
+
+
+@lru_cache(maxsize=4096)
+def _hour(pickup_time: Optional[str]) -> int:
+    try:
+        hour = int((pickup_time or "").strip().split(":", 1)[0])
+    except ValueError:
+        return UNKNOWN_HOUR
+    return hour if 0 <= hour <= 23 else UNKNOWN_HOUR
+
+
+@lru_cache(maxsize=4096)
+def _service(name: Optional[str]) -> Optional[str]:
+    return rate_item(name) if name and name.strip() else None
+
+
+class PriceTables:
+    """
+    Everything a quote needs, precomputed from invoice_rates and pricing_factors:
+    default and per-client prices, a 25-slot time-of-day multiplier table (slot 24
+    for unparseable times) and the demand steps. Immutable; replaced on reload.
+    """
+
+    def __init__(self, rates: RateTable, factors: Sequence[PricingFactor], key: tuple):
+        self.key = key
+        self.rates = rates
+        self.per_mile = rates.price(None, PER_MILE) or 0
+        self.per_offer = rates.price(None, PER_OFFER) or 0
+        self.has_client_rates = rates.has_client_rates()
+
+        hour_steps = sorted((f.threshold, f.multiplier) for f in factors if f.kind == "hour")
+        self.hour_multipliers = [1.0] * (UNKNOWN_HOUR + 1)
+        for hour in range(24):
+            applicable = [multiplier for threshold, multiplier in hour_steps if threshold <= hour]
+            if applicable:
+                self.hour_multipliers[hour] = applicable[-1]
+            elif hour_steps:
+                self.hour_multipliers[hour] = hour_steps[-1][1]  # before the first step: yesterday's last one
+        self.demand_steps = sorted((f.threshold, f.multiplier) for f in factors if f.kind == "demand")
+        if np is not None:
+            self.hour_array = np.array(self.hour_multipliers)
+
+    def demand_multiplier(self, ratio: float) -> float:
+        multiplier = 1.0
+        for threshold, step in self.demand_steps:
+            if ratio < threshold:
+                break
+            multiplier = step
+        return multiplier
+
+    def price(self, client_id: Optional[int], item: str) -> int:
+        if client_id is not None and self.has_client_rates:
+            return self.rates.price(client_id, item) or 0
+        return self.rates.price(None, item) or 0
+
+
+class QuoteEngine:
+    """
+    Prices offers: (per_offer + miles x per_mile + additional service) x time-of-day
+    multiplier x demand multiplier, rounded to the cent.
+
+    The price tables are rebuilt when invoice_rates or pricing_factors change: at once
+    in this process (admin routes call `invalidate()`), and within `reload_seconds`
+    in other workers, which compare the tables' versions. Demand (pending offers per
+    available driver) is recounted at most every `demand_seconds`. Batches are
+    computed with NumPy arrays when it is installed.
+    """
+
+    def __init__(self, reload_seconds: float = PRICING_RELOAD_SECONDS,
+                 demand_seconds: float = PRICING_DEMAND_REFRESH_SECONDS):
+        self.reload_seconds = reload_seconds
+        self.demand_seconds = demand_seconds
+        self._lock = threading.Lock()
+        self._tables: Optional[PriceTables] = None
+        self._checked_at = float("-inf")
+        self._stale = True
+        self._demand_ratio = 0.0
+        self._demand_at = float("-inf")
+
+    def invalidate(self) -> None:
+        """Rebuild the tables on the next quote, whether or not the versions moved."""
+        self._stale = True
+
+    def tables(self, db: Session) -> PriceTables:
+        if self._tables is not None and not self._stale and time.monotonic() - self._checked_at < self.reload_seconds:
+            return self._tables
+        with self._lock:
+            rebuild, self._stale = self._stale, False
+            today = datetime.utcnow().date()
+            versions = get_versions(db, "invoice_rates", "pricing_factors")
+            key = (versions["invoice_rates"], versions["pricing_factors"], today)  # future rates start at midnight
+            if rebuild or self._tables is None or self._tables.key != key:
+                self._tables = PriceTables(RateTable.load(db, today), db.query(PricingFactor).all(), key)
+            self._checked_at = time.monotonic()
+            return self._tables
+
+    def demand_ratio(self, db: Session) -> float:
+        if time.monotonic() - self._demand_at >= self.demand_seconds:
+            pending = db.query(func.count(Offer.id)).filter(
+                Offer.status == OfferStatus.PENDING, Offer.driver_id.is_(None)
+            ).scalar()
+            available = db.query(func.count(Driver.id)).filter(
+                Driver.status == "available", Driver.driver_status == AccountStatus.APPROVED
+            ).scalar()
+            self._demand_ratio = round(pending / max(available, 1), 3)
+            self._demand_at = time.monotonic()
+        return self._demand_ratio
+
+    def quote_many(self, db: Session, candidates: Sequence, client_id: Optional[int] = None) -> dict:
+        """
+        Quotes for objects with total_mileage, pickup_time, additional_service and
+        (unless `client_id` is given for all of them) client_id attributes.
+        """
+        tables = self.tables(db)
+        ratio = self.demand_ratio(db)
+        demand = tables.demand_multiplier(ratio)
+
+        clients = [client_id if client_id is not None else getattr(c, "client_id", None) for c in candidates]
+        miles = [c.total_mileage or 0.0 for c in candidates]
+        hours = [_hour(c.pickup_time) for c in candidates]
+        services = [_service(c.additional_service) for c in candidates]
+        if tables.has_client_rates:
+            per_mile = [tables.price(client, PER_MILE) for client in clients]
+            per_offer = [tables.price(client, PER_OFFER) for client in clients]
+        else:
+            per_mile, per_offer = tables.per_mile, tables.per_offer
+        service_cents = [tables.price(client, service) if service else 0 for client, service in zip(clients, services)]
+
+        if np is not None:
+            base = np.asarray(per_offer, dtype=float) + np.asarray(miles, dtype=float) * np.asarray(per_mile, dtype=float) \
+                + np.asarray(service_cents, dtype=float)
+            time_multiplier = tables.hour_array[np.asarray(hours, dtype=np.intp)]
+            quote = np.floor(base * time_multiplier * demand + 0.5).astype(np.int64).tolist()
+            base_cents = np.floor(base + 0.5).astype(np.int64).tolist()
+            time_multiplier = time_multiplier.tolist()
+        else:
+            if not isinstance(per_mile, list):
+                per_mile, per_offer = [per_mile] * len(candidates), [per_offer] * len(candidates)
+            base = [po + m * pm + s for po, m, pm, s in zip(per_offer, miles, per_mile, service_cents)]
+            time_multiplier = [tables.hour_multipliers[hour] for hour in hours]
+            quote = [math.floor(b * t * demand + 0.5) for b, t in zip(base, time_multiplier)]
+            base_cents = [math.floor(b + 0.5) for b in base]
+
+        return {
+            "demand_ratio": ratio,
+            "demand_multiplier": demand,
+            "quotes": [
+                {"quote_cents": q, "base_cents": b, "time_multiplier": t}
+                for q, b, t in zip(quote, base_cents, time_multiplier)
+            ],
+        }
+
+    def quote(self, db: Session, offer, client_id: int) -> int:
+        """Quote in cents for one offer (an Offer, OfferCreate or OfferUpdate-like object)."""
+        return self.quote_many(db, [offer], client_id=client_id)["quotes"][0]["quote_cents"]
+
+
+quote_engine = QuoteEngine()
@@ -0,0 +1,160 @@
+from fastapi import HTTPException, Request
+from sqlalchemy import case, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Dict, NamedTuple, Optional, Tuple
+import hashlib
+import math
+import threading
+import time
+
+from models import RateLimitBucket
+from utils.sweeps import delete_in_chunks
+from config import (
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_BACKEND,
+    RATE_LIMIT_LOGIN_PER_IP,
+    RATE_LIMIT_LOGIN_PER_ACCOUNT,
+    RATE_LIMIT_SIGNUP_PER_IP,
+    RATE_LIMIT_PASSWORD_RESET_PER_IP,
+    RATE_LIMIT_PASSWORD_RESET_PER_ACCOUNT,
+)
+
+MINUTE, HOUR = 60, 3600
+
+
+class Limit(NamedTuple):
+    """A token bucket: up to `capacity` requests at once, refilled evenly over `period` seconds."""
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+
+class MemoryStore:
+    """Buckets in this process only. Each worker enforces its own share of the limit."""
+
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}  # key -> (tokens, updated_at, full_at)
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        """Take one token. Returns 0 if allowed, else the seconds until one is available."""
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (limit.capacity, now, now))
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate)
+            if tokens < 1:
+                return (1 - tokens) / limit.rate
+            tokens -= 1
+            if key not in self._buckets and len(self._buckets) >= self.MAX_KEYS:
+                self._prune(now)
+            self._buckets[key] = (tokens, now, now + (limit.capacity - tokens) / limit.rate)
+            return 0.0
+
+    def _prune(self, now: float) -> None:
+        """Drop buckets that have refilled completely; they are the same as no bucket."""
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseStore:
+    """
+    Buckets in the `rate_limit_buckets` table, shared by every worker process.
+    A token is taken with one conditional UPDATE, so concurrent requests can't
+    both spend the last one.
+    """
+
+    def take(self, key: str, limit: Limit, now: float) -> float:
+        from database import SessionLocal
+
+        refilled = RateLimitBucket.tokens + (now - RateLimitBucket.updated_at) * limit.rate
+        refilled = case((refilled > limit.capacity, limit.capacity), else_=refilled)
+        with SessionLocal() as db:
+            taken = db.execute(
+                update(RateLimitBucket)
+                .where(RateLimitBucket.key == key, refilled >= 1)
+                .values(tokens=refilled - 1, updated_at=now)
+            ).rowcount
+            if not taken:
+                bucket = db.query(RateLimitBucket).filter(RateLimitBucket.key == key).first()
+                if bucket is not None:
+                    tokens = min(limit.capacity, bucket.tokens + (now - bucket.updated_at) * limit.rate)
+                    return max((1 - tokens) / limit.rate, 0.001)
+                try:
+                    db.execute(insert(RateLimitBucket).values(key=key, tokens=limit.capacity - 1, updated_at=now))
+                except IntegrityError:
+                    # Another worker created it first; retry against its row
+                    db.rollback()
+                    return self.take(key, limit, now)
+            db.commit()
+        return 0.0
+
+    def clear(self) -> None:
+        from database import SessionLocal
+
+        with SessionLocal() as db:
+            db.query(RateLimitBucket).delete()
+            db.commit()
+
+
+STORES = {"memory": MemoryStore, "database": DatabaseStore}
+
+
+def _hashed(value: str) -> str:
+    """Clients are keyed by a hash, so emails and addresses are never stored as-is."""
+    return hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+
+
+class RateLimiter:
+    """
+    Named per-IP and per-account token-bucket limits for expensive endpoints.
+
+    The client address is `request.client.host`, which uvicorn takes from
+    X-Forwarded-For for trusted proxies (FORWARDED_ALLOW_IPS). The store can be
+    swapped for any object with `take(key, limit, now) -> retry_after_seconds`.
+    """
+
+    def __init__(self, store=None, enabled: bool = RATE_LIMIT_ENABLED):
+        self.store = store or STORES[RATE_LIMIT_BACKEND]()
+        self.enabled = enabled
+        self.limits: Dict[str, Dict[str, Limit]] = {}  # name -> {"ip": Limit, "account": Limit}
+
+    def add_limit(self, name: str, per_ip: Optional[Limit] = None, per_account: Optional[Limit] = None) -> None:
+        self.limits[name] = {scope: limit for scope, limit in (("ip", per_ip), ("account", per_account)) if limit}
+
+    def hit(self, request: Request, name: str, account: Optional[str] = None) -> None:
+        """Spend a token from each of `name`'s buckets for this client, or raise 429 with Retry-After."""
+        if not self.enabled:
+            return
+        now = time.time()
+        clients = {"ip": request.client.host if request.client else "unknown", "account": account}
+        for scope, limit in self.limits[name].items():
+            if not clients[scope]:
+                continue
+            retry_after = self.store.take(f"{name}:{scope}:{_hashed(clients[scope])}", limit, now)
+            if retry_after:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests. Please try again later.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+                )
+
+
+def purge_idle_buckets(db: Session) -> int:
+    """Delete database buckets untouched for a day; every limit has refilled by then."""
+    return delete_in_chunks(db, RateLimitBucket, RateLimitBucket.updated_at < time.time() - 24 * HOUR)
+
+
+rate_limiter = RateLimiter()
+rate_limiter.add_limit("login", per_ip=Limit(RATE_LIMIT_LOGIN_PER_IP, MINUTE),
+                       per_account=Limit(RATE_LIMIT_LOGIN_PER_ACCOUNT, MINUTE))
+rate_limiter.add_limit("signup", per_ip=Limit(RATE_LIMIT_SIGNUP_PER_IP, HOUR))
+rate_limiter.add_limit("password_reset", per_ip=Limit(RATE_LIMIT_PASSWORD_RESET_PER_IP, MINUTE),
+                       per_account=Limit(RATE_LIMIT_PASSWORD_RESET_PER_ACCOUNT, HOUR))
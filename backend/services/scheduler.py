@@ -0,0 +1,276 @@
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import asyncio
+import os
+import socket
+import time
+import uuid
+
+from models import SchedulerLease
+from config import SCHEDULER_TICK_SECONDS, SCHEDULER_LEASE_SECONDS
+
+LEADER = "leader"
+
+
+class CronSchedule:
+    """
+    Five-field cron expression (minute hour day-of-month month day-of-week, UTC).
+    Fields take `*`, numbers, ranges `a-b`, steps `*/n`, `a/n` or `a-b/n`, and comma lists.
+    Day-of-week 0 is Sunday. As in cron, a restricted day-of-month and day-of-week
+    match if either does.
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> frozenset:
+        values = set()
+        for part in field.split(","):
+            spec, _, step = part.partition("/")
+            if spec == "*":
+                start, end = low, high
+            elif "-" in spec:
+                start, end = (int(v) for v in spec.split("-", 1))
+            else:
+                start = end = int(spec)
+                if step:
+                    end = high  # "5/15" means 5, 20, 35, 50
+            if not (low <= start <= end <= high):
+                raise ValueError(f"Cron field {field!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _day_matches(self, at: datetime) -> bool:
+        day_ok = at.day in self.days
+        weekday_ok = (at.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """First matching minute strictly after `after`."""
+        at = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = at + timedelta(days=366 * 5)
+        while at < limit:
+            if at.month not in self.months:
+                at = (at.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(at):
+                at = at.replace(hour=0, minute=0) + timedelta(days=1)
+            elif at.hour not in self.hours:
+                at = at.replace(minute=0) + timedelta(hours=1)
+            elif at.minute not in self.minutes:
+                at += timedelta(minutes=1)
+            else:
+                return at
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+class Job:
+    def __init__(self, name: str, schedule: str, fn: Callable[[Session], object]):
+        self.name = name
+        self.cron = CronSchedule(schedule)
+        self.fn = fn
+        self.next_run_at: Optional[datetime] = None
+        self.stats = {
+            "runs": 0, "failures": 0, "last_duration_ms": None, "total_duration_ms": 0.0,
+            "last_result": None, "last_error": None,
+        }
+
+
+class Scheduler:
+    """
+    Runs maintenance jobs on cron schedules from inside the API process.
+
+    Every worker runs the loop, but only the holder of the "leader" lease row in
+    scheduler_leases runs jobs; it renews the lease every SCHEDULER_TICK_SECONDS
+    and another worker takes over once it lapses (SCHEDULER_LEASE_SECONDS).
+    Jobs run one at a time in a worker thread. Each job's last run is stored in
+    its own row, so a new leader neither repeats nor forgets due work; a run
+    missed while nobody led is made up once, not once per missed slot.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._new_holder()
+        if hasattr(os, "register_at_fork"):
+            # Workers forked from a preloaded app must not share the master's holder id
+            os.register_at_fork(after_in_child=self._new_holder)
+
+    def _new_holder(self) -> None:
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def add_job(self, name: str, schedule: str, fn: Callable[[Session], object]) -> None:
+        """Register `fn(db)`; whatever it returns is recorded as the run's result."""
+        self.jobs[name] = Job(name, schedule, fn)
+
+    # ─── Leadership ────────────────────────────────────────────────────────
+
+    def _acquire_lease(self) -> bool:
+        from database import SessionLocal
+
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            won = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == LEADER,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now)
+                )
+                .values(holder=self.holder, expires_at=now + timedelta(seconds=SCHEDULER_LEASE_SECONDS))
+            ).rowcount
+            if not won and db.get(SchedulerLease, LEADER) is None:
+                try:
+                    db.execute(insert(SchedulerLease).values(
+                        name=LEADER,
+                        holder=self.holder,
+                        expires_at=now + timedelta(seconds=SCHEDULER_LEASE_SECONDS)
+                    ))
+                    won = 1
+                except IntegrityError:
+                    db.rollback()
+                    return False
+            db.commit()
+        return bool(won)
+
+    def _release_lease(self) -> None:
+        from database import SessionLocal
+
+        with SessionLocal() as db:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == LEADER, SchedulerLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+            db.commit()
+
+    # ─── Running jobs ──────────────────────────────────────────────────────
+
+    def _load_schedule(self) -> None:
+        """On becoming leader: continue each job's schedule from its stored last run."""
+        from database import SessionLocal
+
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            last_runs = {row.name: row.last_run_at for row in db.query(SchedulerLease).filter(
+                SchedulerLease.name.in_(list(self.jobs))
+            )}
+        for job in self.jobs.values():
+            last_run_at = last_runs.get(job.name)
+            job.next_run_at = job.cron.next_after(last_run_at or now)
+
+    def _run_job(self, job: Job) -> None:
+        from database import SessionLocal
+
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            with SessionLocal() as db:
+                result = job.fn(db)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        job.stats["runs"] += 1
+        job.stats["failures"] += error is not None
+        job.stats["last_duration_ms"] = duration_ms
+        job.stats["total_duration_ms"] += duration_ms
+        job.stats["last_result"] = result
+        job.stats["last_error"] = error
+        job.next_run_at = job.cron.next_after(max(started_at, datetime.utcnow()))
+
+        with SessionLocal() as db:
+            row = db.get(SchedulerLease, job.name) or SchedulerLease(name=job.name)
+            row.last_run_at = started_at
+            row.last_duration_ms = duration_ms
+            row.last_result = (f"error: {error}" if error else str(result))[:255]
+            db.merge(row)
+            db.commit()
+
+    async def tick(self) -> None:
+        was_leader = self.is_leader
+        self.is_leader = await run_in_threadpool(self._acquire_lease)
+        if not self.is_leader:
+            return
+        if not was_leader:
+            await run_in_threadpool(self._load_schedule)
+
+        for job in self.jobs.values():
+            if job.next_run_at <= datetime.utcnow():
+                await run_in_threadpool(self._run_job, job)
+                # Jobs are bounded, but renew between them in case several were due
+                self.is_leader = await run_in_threadpool(self._acquire_lease)
+                if not self.is_leader:
+                    return
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                self.is_leader = False  # database unavailable; try again next tick
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop and hand leadership over right away instead of letting the lease lapse."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if self.is_leader:
+            await run_in_threadpool(self._release_lease)
+            self.is_leader = False
+
+    def status(self) -> dict:
+        from database import SessionLocal
+
+        with SessionLocal() as db:
+            rows = {row.name: row for row in db.query(SchedulerLease)}
+        leader = rows.get(LEADER)
+        jobs: List[dict] = []
+        for job in self.jobs.values():
+            stored = rows.get(job.name)
+            runs = job.stats["runs"]
+            jobs.append({
+                "name": job.name,
+                "schedule": job.cron.expression,
+                "next_run_at": job.next_run_at if self.is_leader else None,
+                "last_run_at": stored.last_run_at if stored else None,
+                "last_duration_ms": stored.last_duration_ms if stored else None,
+                "last_result": stored.last_result if stored else None,
+                # Counters below cover runs made by this process only
+                "runs": runs,
+                "failures": job.stats["failures"],
+                "avg_duration_ms": round(job.stats["total_duration_ms"] / runs, 2) if runs else None,
+            })
+        return {
+            "leader": leader.holder if leader and leader.expires_at and leader.expires_at > datetime.utcnow() else None,
+            "this_process": self.holder,
+            "is_leader": self.is_leader,
+            "jobs": jobs,
+        }
+
+
+scheduler = Scheduler()
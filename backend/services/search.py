@@ -0,0 +1,181 @@
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+import re
+
+from models import Offer, OfferArchive, User
+
+# Offer columns that make up the search document (plus the client's company_name)
+INDEXED_COLUMNS = ("description", "pickup_address", "dropoff_address", "company_representative")
+
+# SQLite: FTS5 virtual table keyed by rowid = offer id.
+# Postgres: side table with a tsvector document and a GIN index.
+_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS offer_search USING fts5("
+        "description, pickup_address, dropoff_address, company_representative, company_name, "
+        "client_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS offer_search ("
+        "offer_id INTEGER PRIMARY KEY, "
+        "client_id INTEGER, document tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_offer_search_document ON offer_search USING GIN (document)",
+        "CREATE INDEX IF NOT EXISTS ix_offer_search_client ON offer_search (client_id)",
+    ],
+}
+
+# Archived offers stay searchable, so a full rebuild reads both tables
+_ALL_OFFERS = (
+    "(SELECT id, client_id, description, pickup_address, dropoff_address, company_representative FROM offers "
+    "UNION ALL "
+    "SELECT id, client_id, description, pickup_address, dropoff_address, company_representative FROM offers_archive)"
+)
+
+_DOCUMENT_SELECT = (
+    "SELECT o.id, o.client_id, o.description, o.pickup_address, o.dropoff_address, "
+    "o.company_representative, u.company_name "
+    "FROM " + _ALL_OFFERS + " o LEFT JOIN users u ON u.id = o.client_id"
+)
+
+
+def _dialect(conn: Connection) -> str:
+    return conn.dialect.name
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """Create the search table if missing and backfill it when it's empty."""
+    with engine.begin() as conn:
+        for statement in _DDL.get(_dialect(conn), []):
+            conn.execute(text(statement))
+        if _dialect(conn) in _DDL and not conn.execute(text("SELECT 1 FROM offer_search LIMIT 1")).first():
+            rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn: Connection) -> None:
+    """Reindex every offer in one set-based statement."""
+    if _dialect(conn) == "sqlite":
+        conn.execute(text("DELETE FROM offer_search"))
+        conn.execute(text(
+            "INSERT INTO offer_search (rowid, description, pickup_address, dropoff_address, "
+            "company_representative, company_name, client_id) "
+            "SELECT o.id, o.description, o.pickup_address, o.dropoff_address, "
+            "o.company_representative, u.company_name, o.client_id "
+            "FROM " + _ALL_OFFERS + " o LEFT JOIN users u ON u.id = o.client_id"
+        ))
+    elif _dialect(conn) == "postgresql":
+        conn.execute(text("TRUNCATE offer_search"))
+        conn.execute(text(
+            "INSERT INTO offer_search (offer_id, client_id, document) "
+            "SELECT o.id, o.client_id, to_tsvector('simple', concat_ws(' ', o.description, "
+            "o.pickup_address, o.dropoff_address, o.company_representative, u.company_name)) "
+            "FROM " + _ALL_OFFERS + " o LEFT JOIN users u ON u.id = o.client_id"
+        ))
+
+
+def _reindex_offers(conn: Connection, where: str, params: dict) -> None:
+    rows = conn.execute(text(f"{_DOCUMENT_SELECT} WHERE {where}"), params).all()
+    for offer_id, client_id, *fields in rows:
+        _write_document(conn, offer_id, client_id, fields)
+
+
+def _write_document(conn: Connection, offer_id: int, client_id: int, fields: list) -> None:
+    if _dialect(conn) == "sqlite":
+        conn.execute(text("DELETE FROM offer_search WHERE rowid = :id"), {"id": offer_id})
+        conn.execute(text(
+            "INSERT INTO offer_search (rowid, description, pickup_address, dropoff_address, "
+            "company_representative, company_name, client_id) "
+            "VALUES (:id, :f0, :f1, :f2, :f3, :f4, :client_id)"
+        ), {"id": offer_id, "client_id": client_id, **{f"f{i}": v for i, v in enumerate(fields)}})
+    elif _dialect(conn) == "postgresql":
+        conn.execute(text(
+            "INSERT INTO offer_search (offer_id, client_id, document) "
+            "VALUES (:id, :client_id, to_tsvector('simple', :doc)) "
+            "ON CONFLICT (offer_id) DO UPDATE SET client_id = EXCLUDED.client_id, document = EXCLUDED.document"
+        ), {"id": offer_id, "client_id": client_id, "doc": " ".join(v for v in fields if v)})
+
+
+def _remove_document(conn: Connection, offer_id: int) -> None:
+    if _dialect(conn) == "sqlite":
+        conn.execute(text("DELETE FROM offer_search WHERE rowid = :id"), {"id": offer_id})
+    elif _dialect(conn) == "postgresql":
+        conn.execute(text("DELETE FROM offer_search WHERE offer_id = :id"), {"id": offer_id})
+
+
+def _changed(obj, columns) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[col].history.has_changes() for col in columns)
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session, flush_context):
+    """Keep offer_search in step with offers inside the same transaction."""
+    offer_ids, client_ids = set(), set()
+    for obj in session.new:
+        if isinstance(obj, Offer):
+            offer_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Offer) and _changed(obj, INDEXED_COLUMNS + ("client_id",)):
+            offer_ids.add(obj.id)
+        elif isinstance(obj, User) and _changed(obj, ("company_name",)):
+            client_ids.add(obj.id)
+    removed = [obj.id for obj in session.deleted if isinstance(obj, Offer)]
+
+    if not (offer_ids or client_ids or removed):
+        return
+
+    conn = session.connection()
+    for offer_id in removed:
+        _remove_document(conn, offer_id)
+    for offer_id in offer_ids:
+        _reindex_offers(conn, "o.id = :id", {"id": offer_id})
+    for client_id in client_ids:
+        _reindex_offers(conn, "o.client_id = :client_id", {"client_id": client_id})
+
+
+def _terms(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())
+
+
+def search_offers(
+    db: Session,
+    q: str,
+    page: int = 1,
+    page_size: int = 20,
+    client_id: Optional[int] = None
+) -> Tuple[int, List[Offer]]:
+    """
+    Ranked full-text search (all terms must match, each as a prefix).
+    Returns (total_matches, offers_on_this_page) with offers in rank order.
+    """
+    terms = _terms(q)
+    if not terms:
+        return 0, []
+
+    conn = db.connection()
+    params = {"limit": page_size, "offset": (page - 1) * page_size, "client_id": client_id}
+    client_filter = " AND client_id = :client_id" if client_id is not None else ""
+
+    if _dialect(conn) == "sqlite":
+        params["match"] = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        where = f"offer_search MATCH :match{client_filter}"
+        total = conn.execute(text(f"SELECT count(*) FROM offer_search WHERE {where}"), params).scalar()
+        ids = [row[0] for row in conn.execute(text(
+            f"SELECT rowid FROM offer_search WHERE {where} "
+            "ORDER BY bm25(offer_search) LIMIT :limit OFFSET :offset"
+        ), params)]
+    else:
+        params["query"] = " & ".join(f"{term}:*" for term in terms)
+        where = f"document @@ to_tsquery('simple', :query){client_filter}"
+        total = conn.execute(text(f"SELECT count(*) FROM offer_search WHERE {where}"), params).scalar()
+        ids = [row[0] for row in conn.execute(text(
+            f"SELECT offer_id FROM offer_search WHERE {where} "
+            "ORDER BY ts_rank(document, to_tsquery('simple', :query)) DESC LIMIT :limit OFFSET :offset"
+        ), params)]
+
+    by_id = {offer.id: offer for offer in db.query(Offer).filter(Offer.id.in_(ids))} if ids else {}
+    missing = [i for i in ids if i not in by_id]
+    if missing:
+        by_id.update({offer.id: offer for offer in db.query(OfferArchive).filter(OfferArchive.id.in_(missing))})
+    return total, [by_id[i] for i in ids if i in by_id]
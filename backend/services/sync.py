@@ -0,0 +1,79 @@
+from fastapi import HTTPException
+from sqlalchemy import and_, event, inspect, not_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+
+from models import Offer, OfferTombstone
+from utils.sweeps import delete_in_chunks
+from config import SYNC_TOMBSTONE_RETENTION_DAYS, SYNC_CURSOR_OVERLAP_SECONDS
+
+
+@event.listens_for(Session, "before_flush")
+def _record_offer_tombstones(session, flush_context, instances):
+    """Leave a tombstone whenever an offer is deleted or taken away from its driver."""
+    for obj in session.dirty:
+        if not isinstance(obj, Offer):
+            continue
+        history = inspect(obj).attrs.driver_id.history
+        for old_driver_id in history.deleted or ():
+            if old_driver_id is not None and old_driver_id not in (history.added or ()):
+                session.add(OfferTombstone(offer_id=obj.id, driver_id=old_driver_id))
+
+    for obj in session.deleted:
+        if isinstance(obj, Offer):
+            session.add(OfferTombstone(offer_id=obj.id, client_id=obj.client_id, driver_id=obj.driver_id))
+
+
+def next_cursor() -> str:
+    """Cursor handed to the client; taken before querying and moved back by the overlap."""
+    return (datetime.utcnow() - timedelta(seconds=SYNC_CURSOR_OVERLAP_SECONDS)).isoformat()
+
+
+def parse_cursor(since: str) -> datetime:
+    """The cursor as naive UTC, like the stored timestamps; an offset is converted."""
+    try:
+        since_at = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+    if since_at.tzinfo is not None:
+        since_at = since_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return since_at
+
+
+def offer_delta(db: Session, since: str, owner_filter, tombstone_filter, *scope) -> dict:
+    """
+    Offers matching `owner_filter` that changed after the cursor.
+
+    `scope` narrows what the list shows (e.g. only finished offers); changed offers
+    that fell out of scope are reported as removed, together with tombstones
+    matching `tombstone_filter`. Both lookups use the (owner, updated_at) indexes.
+    """
+    since_at = parse_cursor(since)
+    cursor = next_cursor()
+
+    if since_at < datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+        # Tombstones this old may have been purged — send the full list instead
+        offers = db.query(Offer).filter(owner_filter, *scope).all()
+        return {"cursor": cursor, "reset": True, "offers": offers, "removed": []}
+
+    changed = db.query(Offer).filter(owner_filter, Offer.updated_at > since_at)
+    offers = changed.filter(*scope).all()
+
+    removed = set()
+    if scope:
+        removed.update(offer_id for (offer_id,) in changed.filter(not_(and_(*scope))).with_entities(Offer.id))
+    removed.update(
+        offer_id for (offer_id,) in db.query(OfferTombstone.offer_id).filter(
+            tombstone_filter,
+            OfferTombstone.removed_at > since_at
+        )
+    )
+    removed -= {offer.id for offer in offers}
+
+    return {"cursor": cursor, "reset": False, "offers": offers, "removed": sorted(removed)}
+
+
+def purge_tombstones(db: Session) -> int:
+    """Drop tombstones older than any cursor that can still get a delta."""
+    cutoff = datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    return delete_in_chunks(db, OfferTombstone, OfferTombstone.removed_at < cutoff)
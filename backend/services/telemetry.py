@@ -0,0 +1,212 @@
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from models import DriverPosition, Offer, OfferStatus
+from config import (
+    TELEMETRY_FLUSH_INTERVAL_SECONDS,
+    TELEMETRY_FLUSH_THRESHOLD,
+    TELEMETRY_RING_SIZE,
+    TELEMETRY_MAX_CLOCK_SKEW_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# How long the "which offer is this driver running" answer is reused between batches
+ACTIVE_OFFER_TTL_SECONDS = 30.0
+
+
+def _naive_utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo is not None else value
+
+
+def clock_skew_error(points) -> Optional[str]:
+    """Why a batch can't be accepted because of the device clock, or None if it can."""
+    limit = datetime.utcnow() + timedelta(seconds=TELEMETRY_MAX_CLOCK_SKEW_SECONDS)
+    if any(_naive_utc(point.recorded_at) > limit for point in points):
+        return "recorded_at is ahead of server time; check the device clock"
+    return None
+
+
+def _to_row(driver_id: int, offer_id: Optional[int], point) -> dict:
+    return {
+        "driver_id": driver_id,
+        "offer_id": offer_id,
+        "recorded_at": _naive_utc(point.recorded_at),
+        "lat_e6": round(point.lat * 1_000_000),
+        "lng_e6": round(point.lng * 1_000_000),
+        "speed_kmh": round(point.speed_kmh) if point.speed_kmh is not None else None,
+        "heading": round(point.heading) % 360 if point.heading is not None else None,
+    }
+
+
+def _to_position(row: dict) -> dict:
+    return {
+        "driver_id": row["driver_id"],
+        "offer_id": row["offer_id"],
+        "lat": row["lat_e6"] / 1_000_000,
+        "lng": row["lng_e6"] / 1_000_000,
+        "recorded_at": row["recorded_at"],
+        "speed_kmh": row["speed_kmh"],
+        "heading": row["heading"],
+    }
+
+
+class TelemetryBuffer:
+    """
+    Buffers driver positions in memory and writes them to driver_positions in bulk.
+
+    Each driver has a bounded ring of unflushed points; a background thread drains
+    all rings every TELEMETRY_FLUSH_INTERVAL_SECONDS (or sooner once
+    TELEMETRY_FLUSH_THRESHOLD points are waiting) with one executemany INSERT.
+    The latest position per driver is kept in memory for instant reads; "latest" is
+    the newest point of the most recently received batch, not the newest timestamp
+    ever seen, so one point stamped by a fast device clock can't pin it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rings: Dict[int, Deque[dict]] = {}
+        self._pending = 0
+        self._latest: Dict[int, Tuple[dict, float]] = {}  # driver id -> (row, received monotonic)
+        self._active_offer: Dict[int, tuple] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Optional[int], List[dict]], None]] = []
+        self.stats = {"accepted": 0, "flushed": 0, "dropped": 0, "flushes": 0, "last_flush_ms": 0.0}
+
+    def active_offer_id(self, db: Session, driver_id: int) -> Optional[int]:
+        """The driver's in-progress offer, cached briefly so every batch doesn't hit the DB."""
+        cached = self._active_offer.get(driver_id)
+        if cached and time.monotonic() - cached[1] < ACTIVE_OFFER_TTL_SECONDS:
+            return cached[0]
+        row = db.query(Offer.id).filter(
+            Offer.driver_id == driver_id,
+            Offer.status == OfferStatus.IN_PROGRESS
+        ).order_by(Offer.updated_at.desc()).first()
+        offer_id = row[0] if row else None
+        self._active_offer[driver_id] = (offer_id, time.monotonic())
+        return offer_id
+
+    def forget_active_offer(self, driver_id: int) -> None:
+        self._active_offer.pop(driver_id, None)
+
+    def on_points(self, listener: Callable[[Optional[int], List[dict]], None]) -> None:
+        """Call `listener(offer_id, rows)` with every accepted batch (rows in time order)."""
+        self._listeners.append(listener)
+
+    def _buffer(self, driver_id: int, rows: List[dict]) -> int:
+        """Append to the driver's ring (lock held). Returns points dropped for overflow."""
+        ring = self._rings.get(driver_id)
+        if ring is None:
+            ring = self._rings[driver_id] = deque(maxlen=TELEMETRY_RING_SIZE)
+        overflow = max(0, len(ring) + len(rows) - TELEMETRY_RING_SIZE)
+        ring.extend(rows)
+        self._pending += len(rows) - overflow
+        self.stats["dropped"] += overflow
+        return overflow
+
+    def add(self, driver_id: int, offer_id: Optional[int], points) -> int:
+        rows = sorted((_to_row(driver_id, offer_id, p) for p in points), key=lambda r: r["recorded_at"])
+        with self._lock:
+            self._buffer(driver_id, rows)
+            self.stats["accepted"] += len(rows)
+
+            self._latest[driver_id] = (rows[-1], time.monotonic())
+            pending = self._pending
+
+        if pending >= TELEMETRY_FLUSH_THRESHOLD:
+            self._wake.set()
+        for listener in self._listeners:
+            listener(offer_id, rows)
+        return len(rows)
+
+    def latest(self, driver_id: int) -> Optional[dict]:
+        entry = self._latest.get(driver_id)
+        return _to_position(entry[0]) if entry else None
+
+    def latest_all(self) -> List[dict]:
+        return [_to_position(row) for row, _ in list(self._latest.values())]
+
+    def latest_or_stored(self, db: Session, driver_id: int) -> Optional[dict]:
+        """
+        In-memory position when it arrived recently; otherwise the newest stored row.
+        With several worker processes a driver's uploads may land on another worker,
+        so an old in-memory entry is checked against the table.
+        """
+        entry = self._latest.get(driver_id)
+        if entry and time.monotonic() - entry[1] < TELEMETRY_FLUSH_INTERVAL_SECONDS * 2:
+            return _to_position(entry[0])
+        row = entry[0] if entry else None
+
+        stored = db.query(DriverPosition).filter(
+            DriverPosition.driver_id == driver_id,
+            # Rows stored before uploads were checked for clock skew may lie in the future
+            DriverPosition.recorded_at <= datetime.utcnow() + timedelta(seconds=TELEMETRY_MAX_CLOCK_SKEW_SECONDS)
+        ).order_by(DriverPosition.recorded_at.desc()).first()
+        if stored and (row is None or stored.recorded_at > row["recorded_at"]):
+            row = {col: getattr(stored, col) for col in (
+                "driver_id", "offer_id", "recorded_at", "lat_e6", "lng_e6", "speed_kmh", "heading"
+            )}
+        return _to_position(row) if row else None
+
+    def flush(self, engine: Engine) -> int:
+        """Drain every ring into one bulk INSERT. Returns the number of rows written."""
+        with self._lock:
+            batch = [row for ring in self._rings.values() for row in ring]
+            for ring in self._rings.values():
+                ring.clear()
+            self._pending = 0
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(DriverPosition), batch)
+        except Exception:
+            # Put the points back so the next flush retries them
+            with self._lock:
+                for row in batch:
+                    self._buffer(row["driver_id"], [row])
+            raise
+        self.stats["flushes"] += 1
+        self.stats["flushed"] += len(batch)
+        self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return len(batch)
+
+    def _run(self, engine: Engine) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(TELEMETRY_FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush(engine)
+            except Exception:
+                # Keep the flusher alive; the next round retries with whatever is buffered
+                logger.exception("Flushing %d buffered positions failed", self._pending)
+                time.sleep(TELEMETRY_FLUSH_INTERVAL_SECONDS)
+
+    def start(self, engine: Engine) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(engine,), name="telemetry-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self, engine: Engine) -> None:
+        """Stop the flusher and write out whatever is still buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+        self.flush(engine)
+
+
+telemetry = TelemetryBuffer()
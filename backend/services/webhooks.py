@@ -0,0 +1,460 @@
+from sqlalchemy import event as orm_event, func
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import time
+import uuid
+
+import httpcore
+import httpx
+
+from models import Offer, OfferStatus, WebhookEndpoint, WebhookDelivery, DeliveryStatus
+from schemas.offer import OfferResponse
+from config import (
+    WEBHOOK_WORKERS,
+    WEBHOOK_ENDPOINT_CONCURRENCY,
+    WEBHOOK_TIMEOUT_SECONDS,
+    WEBHOOK_POLL_SECONDS,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_BACKOFF_BASE_SECONDS,
+    WEBHOOK_BACKOFF_MAX_SECONDS,
+    WEBHOOK_DISABLE_AFTER_FAILURES,
+    WEBHOOK_ALLOW_INSECURE_URLS,
+)
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = (
+    "offer.pending", "offer.matched", "offer.in_progress", "offer.completed", "offer.cancelled",
+    "offer.updated", "ping",
+)
+SIGNATURE_HEADER = "X-FlowRelay-Signature"
+# Receivers should reject signatures older than this (replay protection)
+SIGNATURE_TOLERANCE_SECONDS = 300
+# Endpoints with due deliveries looked at per outbox scan
+SCAN_ENDPOINTS = 200
+
+
+# ─── Signing ───────────────────────────────────────────────────────────────────
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Header value `t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">`."""
+    mac = hmac.new(secret.encode(), str(timestamp).encode() + b"." + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={mac}"
+
+
+def verify_signature(secret: str, header: str, body: bytes, tolerance: int = SIGNATURE_TOLERANCE_SECONDS) -> bool:
+    """What a receiver does with the signature header; used by the local stand-in receiver."""
+    parts = dict(part.split("=", 1) for part in (header or "").split(",") if "=" in part)
+    try:
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    expected = sign(secret, timestamp, body).rsplit("v1=", 1)[1]
+    return hmac.compare_digest(expected, parts.get("v1", ""))
+
+
+def _blocked_address(address: str) -> bool:
+    """True for addresses webhooks must not reach: private, loopback, link-local (cloud metadata), reserved."""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved
+            or ip.is_multicast or ip.is_unspecified)
+
+
+def validate_url(url: str) -> Optional[str]:
+    """
+    Why `url` can't be registered, or None if it can. The host must resolve, and only to
+    public addresses; deliveries check the addresses again when they connect.
+    """
+    parsed = urlsplit(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "Webhook URL must be an absolute http(s) URL"
+    if WEBHOOK_ALLOW_INSECURE_URLS:
+        return None
+    if parsed.scheme != "https":
+        return "Webhook URL must use https"
+
+    host = parsed.hostname
+    if host == "localhost" or host.endswith(".localhost"):
+        return "Webhook URL must not point at a private address"
+    try:
+        infos = socket.getaddrinfo(host, parsed.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError, ValueError):
+        return "Webhook URL host could not be resolved"
+    if any(_blocked_address(info[4][0]) for info in infos):
+        return "Webhook URL must not point at a private address"
+    return None
+
+
+class PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend for deliveries: resolves the host itself, refuses to connect when
+    any of its addresses is private (see `_blocked_address`), and connects to the
+    address it checked. A receiver's DNS can't be switched to an internal address
+    after registration (or between the check and the connect). TLS still verifies
+    the certificate against the URL's host name.
+    """
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError) as exc:
+            raise httpcore.ConnectError(f"could not resolve {host}: {exc}")
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if any(_blocked_address(address) for address in addresses):
+            raise httpcore.ConnectError(f"{host} resolves to a private address")
+
+        for address in addresses[:-1]:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout):
+                continue
+        return await self._backend.connect_tcp(addresses[-1], port, timeout, local_address, socket_options)
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("webhooks are not delivered to unix sockets")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+# httpcore errors raised to the dispatcher as their httpx counterparts
+_HTTPCORE_ERRORS = tuple((getattr(httpcore, name), getattr(httpx, name)) for name in (
+    "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout", "ConnectError", "ReadError",
+    "WriteError", "RemoteProtocolError", "LocalProtocolError", "UnsupportedProtocol",
+))
+
+
+class PublicAddressTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport over an httpcore pool that connects through `PublicAddressBackend`.
+    The pool is built here rather than patched into httpx's own transport, so an
+    httpx upgrade can't quietly drop the address check.
+    """
+
+    def __init__(self):
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=5.0,
+            network_backend=PublicAddressBackend(),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        try:
+            response = await self._pool.handle_async_request(core_request)
+            try:
+                body = await response.aread()  # receivers answer with a short acknowledgement
+            finally:
+                await response.aclose()
+        except Exception as exc:
+            for core_error, httpx_error in _HTTPCORE_ERRORS:
+                if isinstance(exc, core_error):
+                    raise httpx_error(str(exc), request=request) from exc
+            raise
+        return httpx.Response(
+            status_code=response.status, headers=response.headers, content=body, extensions=response.extensions
+        )
+
+    async def aclose(self) -> None:
+        await self._pool.aclose()
+
+
+# ─── Enqueueing (transactional outbox) ─────────────────────────────────────────
+
+def enqueue_event(
+    db: Session,
+    client_id: int,
+    event: str,
+    data: dict,
+    endpoint_id: Optional[int] = None
+) -> List[WebhookDelivery]:
+    """
+    Add one outbox row per enabled endpoint of `client_id` subscribed to `event`
+    (or just for `endpoint_id`, regardless of its subscriptions).
+    The caller commits, so the deliveries exist exactly when the change does.
+    """
+    query = db.query(WebhookEndpoint).filter(
+        WebhookEndpoint.client_id == client_id,
+        WebhookEndpoint.disabled_at.is_(None)
+    )
+    if endpoint_id is not None:
+        endpoints = query.filter(WebhookEndpoint.id == endpoint_id).all()
+    else:
+        endpoints = [e for e in query.all() if not e.events or event in e.events.split(",")]
+    if not endpoints:
+        return []
+
+    event_id = uuid.uuid4().hex
+    payload = json.dumps({
+        "id": event_id,
+        "type": event,
+        "created_at": datetime.utcnow().isoformat(),
+        "data": data,
+    })
+    deliveries = [
+        WebhookDelivery(endpoint_id=endpoint.id, event_id=event_id, event=event, payload=payload)
+        for endpoint in endpoints
+    ]
+    db.add_all(deliveries)
+    db.info["webhooks_enqueued"] = True
+    return deliveries
+
+
+def enqueue_offer_event(db: Session, offer: Offer, event: Optional[str] = None) -> List[WebhookDelivery]:
+    """Lifecycle event for `offer` — `offer.<status>` unless an event type is given."""
+    event = event or f"offer.{OfferStatus(offer.status).value}"
+    data = {"offer": OfferResponse.model_validate(offer).model_dump(mode="json")}
+    return enqueue_event(db, offer.client_id, event, data)
+
+
+# ─── Delivery ──────────────────────────────────────────────────────────────────
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(WEBHOOK_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), WEBHOOK_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _record_outcome(delivery_id: int, status_code: Optional[int], error: Optional[str]) -> str:
+    """Store one attempt's result. Returns "delivered", "retry", "failed" or "gone"."""
+    from database import SessionLocal
+
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        delivery = db.get(WebhookDelivery, delivery_id)
+        if delivery is None:
+            return "gone"  # endpoint deleted meanwhile
+        delivery.attempts += 1
+        delivery.last_status_code = status_code
+        delivery.last_error = error
+        endpoint_query = db.query(WebhookEndpoint).filter(WebhookEndpoint.id == delivery.endpoint_id)
+
+        if error is None:
+            delivery.status = DeliveryStatus.DELIVERED
+            delivery.delivered_at = now
+            endpoint_query.update({"consecutive_failures": 0}, synchronize_session=False)
+            outcome = "delivered"
+        else:
+            if delivery.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                delivery.status = DeliveryStatus.FAILED
+                outcome = "failed"
+            else:
+                delivery.next_attempt_at = now + _backoff(delivery.attempts)
+                outcome = "retry"
+            # Increment in SQL: several workers may be failing against the same endpoint
+            endpoint_query.update(
+                {"consecutive_failures": WebhookEndpoint.consecutive_failures + 1},
+                synchronize_session=False
+            )
+            endpoint_query.filter(
+                WebhookEndpoint.consecutive_failures >= WEBHOOK_DISABLE_AFTER_FAILURES,
+                WebhookEndpoint.disabled_at.is_(None)
+            ).update({
+                "disabled_at": now,
+                "disabled_reason": f"{WEBHOOK_DISABLE_AFTER_FAILURES} consecutive failed deliveries, last: {error}"[:255],
+            }, synchronize_session=False)
+        db.commit()
+        return outcome
+
+
+class WebhookDispatcher:
+    """
+    Delivers the outbox from inside the API process.
+
+    A dispatcher task scans for due deliveries (woken right after a commit that
+    enqueued some, otherwise every WEBHOOK_POLL_SECONDS), claims them by pushing
+    next_attempt_at forward as a lease — so several worker processes can share
+    the outbox — and hands them to WEBHOOK_WORKERS sender tasks. No endpoint gets
+    more than WEBHOOK_ENDPOINT_CONCURRENCY deliveries in flight from a process,
+    so one slow receiver can't hold up everyone else's events. Failed attempts
+    back off exponentially; endpoints failing WEBHOOK_DISABLE_AFTER_FAILURES times
+    in a row are disabled until the client re-enables them.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: Dict[int, int] = defaultdict(int)  # endpoint id -> deliveries being sent
+        self._backlogged: Set[int] = set()  # endpoints with more due deliveries than free slots at the last scan
+        self.stats = {"delivered": 0, "retries": 0, "failed": 0}
+
+    def wake(self) -> None:
+        """Scan the outbox now. Safe to call from any thread."""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake.set)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._queue = asyncio.Queue()
+        # trust_env=False: an environment proxy would connect on our behalf, past the address check
+        transport = httpx.AsyncHTTPTransport() if WEBHOOK_ALLOW_INSECURE_URLS else PublicAddressTransport()
+        self._client = httpx.AsyncClient(
+            timeout=WEBHOOK_TIMEOUT_SECONDS, follow_redirects=False, transport=transport, trust_env=False
+        )
+        self._tasks = [asyncio.create_task(self._dispatch())]
+        self._tasks += [asyncio.create_task(self._work()) for _ in range(WEBHOOK_WORKERS)]
+
+    async def stop(self) -> None:
+        """Cancel the tasks. Deliveries cut off mid-send are retried once their lease runs out."""
+        self._loop = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client:
+            await self._client.aclose()
+
+    # ─── Dispatcher ────────────────────────────────────────────────────────
+
+    def _claim_due(self) -> List[dict]:
+        """Claim due deliveries, at most the free slots of each endpoint (runs in a thread)."""
+        from database import SessionLocal
+
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=WEBHOOK_TIMEOUT_SECONDS * 3)
+        due = (WebhookDelivery.status == DeliveryStatus.PENDING, WebhookDelivery.next_attempt_at <= now)
+        claimed, backlogged = [], set()
+
+        with SessionLocal() as db:
+            endpoints = db.query(WebhookEndpoint).join(WebhookDelivery).filter(
+                WebhookEndpoint.disabled_at.is_(None), *due
+            ).group_by(WebhookEndpoint.id).order_by(func.min(WebhookDelivery.next_attempt_at)).limit(SCAN_ENDPOINTS).all()
+
+            for endpoint in endpoints:
+                free = WEBHOOK_ENDPOINT_CONCURRENCY - self._inflight[endpoint.id]
+                if free <= 0:
+                    backlogged.add(endpoint.id)
+                    continue
+                candidates = db.query(WebhookDelivery).filter(
+                    WebhookDelivery.endpoint_id == endpoint.id, *due
+                ).order_by(WebhookDelivery.next_attempt_at).limit(free + 1).all()
+                if len(candidates) > free:
+                    backlogged.add(endpoint.id)
+                    candidates = candidates[:free]
+                for delivery in candidates:
+                    # Conditional update: another process may have claimed it since we read it
+                    won = db.query(WebhookDelivery).filter(
+                        WebhookDelivery.id == delivery.id,
+                        WebhookDelivery.next_attempt_at == delivery.next_attempt_at
+                    ).update({"next_attempt_at": lease}, synchronize_session=False)
+                    if won:
+                        claimed.append({
+                            "id": delivery.id,
+                            "endpoint_id": endpoint.id,
+                            "url": endpoint.url,
+                            "secret": endpoint.secret,
+                            "event": delivery.event,
+                            "event_id": delivery.event_id,
+                            "payload": delivery.payload,
+                        })
+                db.commit()
+
+        self._backlogged = backlogged
+        return claimed
+
+    async def _dispatch(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await run_in_threadpool(self._claim_due)
+            except Exception:
+                logger.exception("Claiming due webhook deliveries failed")
+                claimed = []  # try again next round
+            for job in claimed:
+                self._inflight[job["endpoint_id"]] += 1
+                self._queue.put_nowait(job)
+            try:
+                await asyncio.wait_for(self._wake.wait(), WEBHOOK_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    # ─── Senders ───────────────────────────────────────────────────────────
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver(job)
+            except Exception:
+                # The lease runs out and the delivery is retried
+                logger.exception("Webhook delivery %s to endpoint %s failed", job["id"], job["endpoint_id"])
+            finally:
+                self._inflight[job["endpoint_id"]] -= 1
+                # A slot opened up for an endpoint that has more waiting
+                if job["endpoint_id"] in self._backlogged:
+                    self._wake.set()
+
+    async def _deliver(self, job: dict) -> None:
+        body = job["payload"].encode()
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "FlowRelay-Webhooks/1.0",
+            "X-FlowRelay-Event": job["event"],
+            "X-FlowRelay-Event-Id": job["event_id"],
+            "X-FlowRelay-Delivery": str(job["id"]),
+            SIGNATURE_HEADER: sign(job["secret"], int(time.time()), body),
+        }
+        status_code, error = None, None
+        try:
+            response = await self._client.post(job["url"], content=body, headers=headers)
+            status_code = response.status_code
+            if not 200 <= status_code < 300:
+                error = f"HTTP {status_code}"
+        except httpx.HTTPError as exc:
+            error = f"{type(exc).__name__}: {exc}"[:500]
+
+        outcome = await run_in_threadpool(_record_outcome, job["id"], status_code, error)
+        if outcome in ("delivered", "failed"):
+            self.stats[outcome] += 1
+        elif outcome == "retry":
+            self.stats["retries"] += 1
+
+
+webhooks = WebhookDispatcher()
+
+
+@orm_event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session):
+    if session.info.pop("webhooks_enqueued", False):
+        webhooks.wake()
+
+
+@orm_event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session):
+    session.info.pop("webhooks_enqueued", None)
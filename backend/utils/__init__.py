@@ -2,4 +2,11 @@ from .email import (
     send_verification_email,
     send_password_reset_email,
     send_password_changed_email,
-)
\ No newline at end of file
+    send_document_expiry_email,
+)
+from .versioning import bump_versions, get_versions
+from .http_cache import check_not_modified, etag_matches
+from .sweeps import delete_in_chunks
+from .dates import parse_loose_date
+from .projection import LIST_FORMATS, ListShape, list_shape, parse_fields, project, render_rows
+from .compression import CompressionMiddleware, Precompressed, cached_response, negotiate
@@ -0,0 +1,251 @@
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+import gzip
+import hashlib
+import threading
+import zlib
+
+from config import (
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, COMPRESSION_ZSTD_LEVEL,
+    COMPRESSION_CACHED_GZIP_LEVEL, COMPRESSION_CACHED_BROTLI_QUALITY, COMPRESSION_CACHED_ZSTD_LEVEL,
+    COMPRESSION_CACHE_MB,
+)
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+# Bodies at least this large are compressed in a worker thread and remembered by content
+CACHE_MIN_SIZE = 64 * 1024
+
+
+class Encoder:
+    def __init__(self, name: str, compress: Callable[[bytes, int], bytes], stream: Callable[[int], object],
+                 level: int, cached_level: int):
+        self.name = name
+        self.compress = compress
+        self.stream = stream  # level -> object with compress(chunk) and flush()
+        self.level = level
+        self.cached_level = cached_level
+
+
+class _BrotliStream:
+    def __init__(self, brotli, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _load_encoders() -> Dict[str, Encoder]:
+    """Server preference order: zstd, br, gzip. The optional codecs are used when installed."""
+    encoders = {}
+    try:
+        import zstandard
+
+        encoders["zstd"] = Encoder(
+            "zstd",
+            lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+            lambda level: zstandard.ZstdCompressor(level=level).compressobj(),
+            COMPRESSION_ZSTD_LEVEL, COMPRESSION_CACHED_ZSTD_LEVEL,
+        )
+    except ImportError:
+        pass
+    try:
+        import brotli
+
+        encoders["br"] = Encoder(
+            "br",
+            lambda data, level: brotli.compress(data, quality=level),
+            lambda level: _BrotliStream(brotli, level),
+            COMPRESSION_BROTLI_QUALITY, COMPRESSION_CACHED_BROTLI_QUALITY,
+        )
+    except ImportError:
+        pass
+    encoders["gzip"] = Encoder(
+        "gzip",
+        lambda data, level: gzip.compress(data, compresslevel=level, mtime=0),
+        lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+        COMPRESSION_GZIP_LEVEL, COMPRESSION_CACHED_GZIP_LEVEL,
+    )
+    return encoders
+
+
+ENCODERS = _load_encoders()
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick an encoding from an Accept-Encoding header: highest q-value, then server preference."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _weak(etag: str) -> str:
+    """A compressed body isn't byte-identical to the original, so a strong ETag becomes weak."""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+class Precompressed:
+    """A cached body plus its compressed forms, each made once on first request at the cached level."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        cached = self._encoded.get(encoding)
+        if cached is None:
+            with self._lock:
+                cached = self._encoded.get(encoding)
+                if cached is None:
+                    encoder = ENCODERS[encoding]
+                    cached = self._encoded[encoding] = encoder.compress(self.body, encoder.cached_level)
+        return cached
+
+
+def cached_response(request: Request, payload: Precompressed, headers: dict,
+                    media_type: str = "application/json") -> Response:
+    """Send a cached payload, compressed when the client accepts it. The middleware leaves it alone."""
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    if encoding is None or len(payload.body) < COMPRESSION_MIN_SIZE:
+        return Response(content=payload.body, media_type=media_type, headers=headers)
+    headers = {**headers, "Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+    if "ETag" in headers:
+        headers["ETag"] = _weak(headers["ETag"])
+    return Response(content=payload.encoded(encoding), media_type=media_type, headers=headers)
+
+
+class _CompressedCache:
+    """LRU of compressed bodies keyed by a digest of the original, bounded by COMPRESSION_CACHE_MB."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key: Tuple[bytes, str]) -> Optional[bytes]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Tuple[bytes, str], value: bytes) -> None:
+        if len(value) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+compressed_cache = _CompressedCache(COMPRESSION_CACHE_MB * 1024 * 1024)
+
+
+async def _compress_body(body: bytes, encoder: Encoder) -> bytes:
+    if len(body) < CACHE_MIN_SIZE:
+        return encoder.compress(body, encoder.level)
+
+    # Large bodies: off the event loop, and only once while the same bytes keep being sent
+    key = None
+    if compressed_cache.max_bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoder.name)
+        cached = compressed_cache.get(key)
+        if cached is not None:
+            return cached
+    compressed = await run_in_threadpool(encoder.compress, body, encoder.level)
+    if key:
+        compressed_cache.put(key, compressed)
+    return compressed
+
+
+class CompressionMiddleware:
+    """
+    Compresses text and JSON responses of at least COMPRESSION_MIN_SIZE bytes with the
+    best encoding the client accepts. Responses that already carry a Content-Encoding
+    (cached payloads from `cached_response`) pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        encoder = ENCODERS[encoding]
+
+        start = None
+        stream = None  # compressor once a multi-part body is being streamed
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, stream, passthrough
+            if passthrough or message["type"] not in ("http.response.start", "http.response.body"):
+                return await send(message)
+            if message["type"] == "http.response.start":
+                start = message  # held until the first body part shows whether to compress
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is not None:
+                chunk = stream.compress(body) + (b"" if more_body else stream.flush())
+                return await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                start["status"] < 200 or start["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < COMPRESSION_MIN_SIZE)
+            ):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = _weak(headers["etag"])
+            if more_body:
+                del headers["content-length"]
+                stream = encoder.stream(encoder.level)
+                await send(start)
+                return await send({"type": "http.response.body", "body": stream.compress(body), "more_body": True})
+
+            compressed = await _compress_body(body, encoder)
+            headers["Content-Length"] = str(len(compressed))
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,57 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+import re
+
+_DAY_FIRST = ("%d.%m.%Y", "%d-%m-%Y")
+_NAMED_MONTH = ("%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%b %d %Y", "%d %B %Y", "%d %b %Y")
+_MONTH_YEAR = re.compile(r"^(\d{1,2})[/-](\d{2}|\d{4})$")
+_SLASHED = re.compile(r"^(\d{1,4})/(\d{1,2})/(\d{2,4})$")
+
+
+def _year(value: str) -> int:
+    return int(value) + 2000 if len(value) == 2 else int(value)
+
+
+def _end_of_month(year: int, month: int) -> date:
+    return (date(year, month, 1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def parse_loose_date(value) -> Optional[date]:
+    """
+    Best-effort parse of a hand-entered date; None when it can't be read.
+    Takes ISO dates and datetimes, MM/DD/YYYY (DD/MM/YYYY when the first part
+    can't be a month), YYYY/MM/DD, DD.MM.YYYY, month names, and card-style
+    MM/YY or MM/YYYY, which means the last day of that month.
+    """
+    if value is None or isinstance(value, date):
+        return value.date() if isinstance(value, datetime) else value
+    text = str(value).strip()
+    if not text:
+        return None
+
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+
+    try:
+        match = _SLASHED.match(text)
+        if match:
+            first, second, third = match.groups()
+            if len(first) == 4:
+                return date(int(first), int(second), int(third))
+            month, day = (int(first), int(second)) if int(first) <= 12 else (int(second), int(first))
+            return date(_year(third), month, day)
+
+        match = _MONTH_YEAR.match(text)
+        if match:
+            return _end_of_month(_year(match.group(2)), int(match.group(1)))
+    except ValueError:
+        return None
+
+    for fmt in _DAY_FIRST + _NAMED_MONTH:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
@@ -1,4 +1,4 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
+from functools import lru_cache
 from config import (
     MAIL_USERNAME,
     MAIL_PASSWORD,
@@ -11,16 +11,34 @@ from config import (
     BASE_URL
 )
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=MAIL_USERNAME,
-    MAIL_PASSWORD=MAIL_PASSWORD,
-    MAIL_FROM=MAIL_FROM,
-    MAIL_SERVER=MAIL_SERVER,
-    MAIL_PORT=MAIL_PORT,
-    MAIL_STARTTLS=MAIL_STARTTLS,
-    MAIL_SSL_TLS=MAIL_SSL_TLS,
-    USE_CREDENTIALS=USE_CREDENTIALS,
-)
+@lru_cache(maxsize=1)
+def get_mailer():
+    """Built on first use rather than at import, so it stays off the startup path."""
+    from fastapi_mail import FastMail, ConnectionConfig
+
+    conf = ConnectionConfig(
+        MAIL_USERNAME=MAIL_USERNAME,
+        MAIL_PASSWORD=MAIL_PASSWORD,
+        MAIL_FROM=MAIL_FROM,
+        MAIL_SERVER=MAIL_SERVER,
+        MAIL_PORT=MAIL_PORT,
+        MAIL_STARTTLS=MAIL_STARTTLS,
+        MAIL_SSL_TLS=MAIL_SSL_TLS,
+        USE_CREDENTIALS=USE_CREDENTIALS,
+    )
+    return FastMail(conf)
+
+
+async def _send_html(email: str, subject: str, html: str):
+    from fastapi_mail import MessageSchema, MessageType
+
+    message = MessageSchema(
+        subject=subject,
+        recipients=[email],
+        body=html,
+        subtype=MessageType.html
+    )
+    await get_mailer().send_message(message)
 
 # ─── Shared layout ─────────────────────────────────────────────────────────────
 
@@ -182,14 +200,11 @@ async def send_verification_email(email: str, token: str):
       </div>
     """
 
-    message = MessageSchema(
+    await _send_html(
+        email,
         subject="Verify your Flow Relay account",
-        recipients=[email],
-        body=_base_template("Verify your email — Flow Relay", body),
-        subtype=MessageType.html
+        html=_base_template("Verify your email — Flow Relay", body)
     )
-    fm = FastMail(conf)
-    await fm.send_message(message)
 
 
 async def send_password_reset_email(email: str, token: str):
@@ -215,14 +230,11 @@ async def send_password_reset_email(email: str, token: str):
       </div>
     """
 
-    message = MessageSchema(
+    await _send_html(
+        email,
         subject="Reset your Flow Relay password",
-        recipients=[email],
-        body=_base_template("Password reset — Flow Relay", body),
-        subtype=MessageType.html
+        html=_base_template("Password reset — Flow Relay", body)
     )
-    fm = FastMail(conf)
-    await fm.send_message(message)
 
 
 async def send_password_changed_email(email: str):
@@ -243,11 +255,33 @@ async def send_password_changed_email(email: str):
       <a href="{BASE_URL}/index.html" class="btn">Go to Login</a>
     """
 
-    message = MessageSchema(
+    await _send_html(
+        email,
         subject="Your Flow Relay password was changed",
-        recipients=[email],
-        body=_base_template("Password changed — Flow Relay", body),
-        subtype=MessageType.html
+        html=_base_template("Password changed — Flow Relay", body)
+    )
+
+async def send_document_expiry_email(email: str, first_name: str, documents: list):
+    """Reminder that a driver's license or insurance expires soon; `documents` is [(name, date)]."""
+    rows = "".join(
+        f"<li><strong>{name.capitalize()}</strong> expires on {expires_on.strftime('%B %d, %Y')}</li>"
+        for name, expires_on in documents
+    )
+
+    body = f"""
+      <h2>Your documents expire soon</h2>
+      <p>Hi {first_name}, the following documents on your Flow Relay driver profile
+         are about to expire:</p>
+      <ul>{rows}</ul>
+      <div class="warning-box">
+        &#9888; Drivers with an expired license or insurance are suspended automatically
+        and can't accept offers until an admin reviews the renewed documents.
+      </div>
+      <a href="{BASE_URL}/driver/profile.html" class="btn">Update your profile</a>
+    """
+
+    await _send_html(
+        email,
+        subject="Your Flow Relay driver documents expire soon",
+        html=_base_template("Documents expiring — Flow Relay", body)
     )
-    fm = FastMail(conf)
-    await fm.send_message(message)
\ No newline at end of file
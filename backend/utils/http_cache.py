@@ -0,0 +1,44 @@
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+from typing import Optional
+import hashlib
+
+from .versioning import get_versions
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag over anything that determines the response body."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    db: Session,
+    tables: tuple,
+    *scope
+) -> Optional[Response]:
+    """
+    Conditional GET for list endpoints.
+    The tag is built from the table versions plus whatever scopes the list
+    (user id, query params), so it costs one small lookup instead of the full query.
+    Returns a 304 response to send back, or None after stamping the ETag on `response`.
+    """
+    versions = get_versions(db, *tables)
+    etag = make_etag(request.url.path, *sorted(versions.items()), *scope)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
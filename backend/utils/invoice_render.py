@@ -0,0 +1,162 @@
+"""
+Invoice documents (HTML and PDF) from a plain dict, with the standard library only.
+services/invoicing.py runs `render_invoice` in worker processes, so nothing here
+touches the database and the input and output are cheap to pickle.
+"""
+from html import escape
+from typing import List, Tuple
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+MARGIN = 56
+ROWS_PER_PAGE = 28  # line items per page; leaves room for the header and the total
+
+# Helvetica advance widths (1/1000 em) for the characters used in amounts
+_NUMERIC_WIDTHS = {**{d: 556 for d in "0123456789"}, ",": 278, ".": 278, " ": 278, "-": 333}
+
+
+def money(cents: int) -> str:
+    sign = "-" if cents < 0 else ""
+    whole, frac = divmod(abs(cents), 100)
+    return f"{sign}{whole:,}.{frac:02d}"
+
+
+def quantity(value) -> str:
+    return f"{value:,}" if isinstance(value, int) else f"{value:,.1f}"
+
+
+# ─── HTML ──────────────────────────────────────────────────────────────────────
+
+def render_html(doc: dict) -> bytes:
+    rows = "".join(
+        f"<tr><td>{escape(line['description'])}</td>"
+        f"<td class=\"num\">{quantity(line['quantity'])}</td>"
+        f"<td class=\"num\">{money(line['unit_price_cents'])}</td>"
+        f"<td class=\"num\">{money(line['amount_cents'])}</td></tr>"
+        for line in doc["lines"]
+    )
+    bill_to = "<br/>".join(escape(part) for part in (doc["bill_to"], doc["bill_to_address"], doc["bill_to_email"]) if part)
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <title>Invoice {escape(doc["number"])}</title>
+  <style>
+    body {{ margin: 40px; font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif; color: #374151; }}
+    h1 {{ margin: 0; color: #1d4ed8; font-size: 24px; }}
+    .meta {{ margin: 24px 0; font-size: 14px; line-height: 1.6; }}
+    table {{ width: 100%; border-collapse: collapse; font-size: 14px; }}
+    th {{ text-align: left; border-bottom: 2px solid #e5e7eb; padding: 8px 4px; color: #111827; }}
+    td {{ border-bottom: 1px solid #e5e7eb; padding: 8px 4px; }}
+    .num {{ text-align: right; }}
+    .total td {{ border-bottom: none; font-weight: 700; color: #111827; }}
+  </style>
+</head>
+<body>
+  <h1>Flow Relay</h1>
+  <div class="meta">
+    <strong>Invoice {escape(doc["number"])}</strong><br/>
+    Issued {escape(doc["issued_on"])}<br/>
+    Service period {escape(doc["period_start"])} to {escape(doc["period_end"])}<br/>
+    {doc["offer_count"]:,} completed offers, {doc["total_miles"]:,.1f} miles
+  </div>
+  <div class="meta"><strong>Bill to</strong><br/>{bill_to}</div>
+  <table>
+    <tr><th>Description</th><th class="num">Quantity</th><th class="num">Unit price</th><th class="num">Amount ({escape(doc["currency"])})</th></tr>
+    {rows}
+    <tr class="total"><td colspan="3">Total due</td><td class="num">{money(doc["total_cents"])} {escape(doc["currency"])}</td></tr>
+  </table>
+</body>
+</html>""".encode()
+
+
+# ─── PDF ───────────────────────────────────────────────────────────────────────
+
+def _pdf_text(text: str) -> str:
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text_width(text: str, size: float) -> float:
+    return sum(_NUMERIC_WIDTHS.get(ch, 556) for ch in text) * size / 1000
+
+
+def _pdf(pages: List[List[Tuple[float, float, float, str, bool]]]) -> bytes:
+    """
+    A PDF 1.4 file of text-only pages. Each page is a list of
+    (x, y, size, text, bold) in points from the bottom left, set in Helvetica.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for page in pages:
+        stream = "".join(
+            f"BT /{'F2' if bold else 'F1'} {size:g} Tf {x:.2f} {y:.2f} Td ({_pdf_text(text)}) Tj ET\n"
+            for x, y, size, text, bold in page
+        ).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_pdf(doc: dict) -> bytes:
+    right = PAGE_WIDTH - MARGIN
+    columns = (MARGIN, right - 210, right - 110, right)  # description, then right-aligned numbers
+
+    def row(y: float, cells, bold: bool = False):
+        ops = [(columns[0], y, 10, cells[0], bold)]
+        for x, text in zip(columns[1:], cells[1:]):
+            if text:
+                ops.append((x - _text_width(text, 10), y, 10, text, bold))
+        return ops
+
+    header = [
+        (MARGIN, 736, 20, "Flow Relay", True),
+        (MARGIN, 706, 12, f"Invoice {doc['number']}", True),
+        (MARGIN, 690, 10, f"Issued {doc['issued_on']}", False),
+        (MARGIN, 676, 10, f"Service period {doc['period_start']} to {doc['period_end']}", False),
+        (MARGIN, 662, 10, f"{doc['offer_count']:,} completed offers, {doc['total_miles']:,.1f} miles", False),
+        (MARGIN, 636, 10, "Bill to", True),
+    ]
+    y = 622
+    for part in (doc["bill_to"], doc["bill_to_address"], doc["bill_to_email"]):
+        if part:
+            header.append((MARGIN, y, 10, part, False))
+            y -= 14
+    table_head = ("Description", "Quantity", "Unit price", f"Amount ({doc['currency']})")
+
+    pages, lines = [], doc["lines"]
+    for start in range(0, max(len(lines), 1), ROWS_PER_PAGE):
+        ops = list(header) if not pages else [(MARGIN, 736, 10, f"Invoice {doc['number']} (continued)", True)]
+        y = (y if not pages else 716) - 16
+        ops += row(y, table_head, bold=True)
+        for line in lines[start:start + ROWS_PER_PAGE]:
+            y -= 16
+            ops += row(y, (line["description"][:60], quantity(line["quantity"]),
+                           money(line["unit_price_cents"]), money(line["amount_cents"])))
+        pages.append(ops)
+    pages[-1] += row(y - 24, ("Total due", "", "", money(doc["total_cents"])), bold=True)
+    return _pdf(pages)
+
+
+def render_invoice(doc: dict) -> Tuple[bytes, bytes]:
+    """(html, pdf) for one invoice document built by services.invoicing.invoice_document."""
+    return render_html(doc), render_pdf(doc)
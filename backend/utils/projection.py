@@ -0,0 +1,76 @@
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+from sqlalchemy.orm import Query as OrmQuery
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+LIST_FORMATS = ("objects", "columns")
+
+
+def parse_fields(model: Type[BaseModel], fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Validate a `?fields=a,b,c` sparse fieldset against a response model.
+    Returns the fields in the model's order, always including `id`, or None for all fields.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {sorted(unknown)}. Must be from: {list(model.model_fields)}"
+        )
+    requested.add("id")
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+def project(query: OrmQuery, entity, columns: Sequence[str]) -> List[tuple]:
+    """Run `query` selecting only `columns` of `entity` instead of loading whole ORM objects."""
+    return [tuple(row) for row in query.with_entities(*(getattr(entity, name) for name in columns))]
+
+
+def render_rows(columns: Sequence[str], rows: List[tuple], list_format: str = "objects") -> bytes:
+    """
+    JSON for projected rows. "objects" is the usual list of objects; "columns" names the
+    columns once and sends each row as a value array: {"columns": [...], "rows": [[...], ...]}.
+    """
+    if list_format == "columns":
+        return to_json({"columns": list(columns), "rows": rows})
+    return to_json([dict(zip(columns, row)) for row in rows])
+
+
+class ListShape(NamedTuple):
+    """What a list endpoint was asked for: a sparse fieldset and/or the columnar format."""
+    fields: Optional[Tuple[str, ...]]  # None: every field
+    columns: Tuple[str, ...]  # the fields to select, in response model order
+    list_format: str
+
+    @property
+    def projected(self) -> bool:
+        """False for the default full list of objects, which routes serve as before."""
+        return self.fields is not None or self.list_format != "objects"
+
+    def respond(self, rows: List[tuple], response: Response) -> Response:
+        """Send rows from `project`, keeping the headers (ETag, sync cursor) already set on `response`."""
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+        return Response(
+            content=render_rows(self.columns, rows, self.list_format),
+            media_type="application/json",
+            headers=headers
+        )
+
+
+def list_shape(model: Type[BaseModel]) -> Callable[..., ListShape]:
+    """Dependency adding `?fields=` and `?format=objects|columns` to a list endpoint of `model`."""
+    all_fields = tuple(model.model_fields)
+
+    def dependency(
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return; id is always included"),
+        list_format: str = Query("objects", alias="format", pattern="^(objects|columns)$",
+                                 description="columns: {columns: [...], rows: [[...], ...]}")
+    ) -> ListShape:
+        selected = parse_fields(model, fields)
+        return ListShape(selected, selected or all_fields, list_format)
+
+    return dependency
@@ -0,0 +1,29 @@
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from config import SWEEP_CHUNK_SIZE, SWEEP_MAX_CHUNKS
+
+
+def delete_in_chunks(
+    db: Session,
+    model,
+    *criteria,
+    chunk_size: int = SWEEP_CHUNK_SIZE,
+    max_chunks: Optional[int] = SWEEP_MAX_CHUNKS
+) -> int:
+    """
+    Delete rows matching `criteria` a chunk at a time, committing after each.
+    `criteria` should hit an index (e.g. expires_at < now) so every chunk is a
+    short range scan and no single transaction holds locks for long.
+    """
+    deleted = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = db.execute(select(model.id).where(*criteria).limit(chunk_size)).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(model).where(model.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+        chunks += 1
+    return deleted
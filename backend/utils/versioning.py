@@ -0,0 +1,71 @@
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+from typing import Dict, List
+
+from models import TableVersion
+
+# Tables whose list endpoints are served with ETags, or that in-memory caches reload on change
+TRACKED_TABLES = ("users", "drivers", "offers", "invoice_rates", "pricing_factors")
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_touched_tables(session, flush_context, instances):
+    """Remember which tracked tables this flush is about to write to."""
+    touched = session.info.setdefault("touched_tables", set())
+    for obj in list(session.new) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_TABLES:
+            touched.add(table)
+    for obj in session.dirty:
+        table = getattr(obj, "__tablename__", None)
+        if table in TRACKED_TABLES and session.is_modified(obj):
+            touched.add(table)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_touched_tables(session, flush_context):
+    """Bump the counters inside the flush's transaction so a rollback undoes them too."""
+    touched = session.info.pop("touched_tables", None)
+    if touched:
+        bump_versions(session, *sorted(touched))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bumped_versions(session):
+    session.info.pop("bumped_versions", None)
+
+
+def bump_versions(db: Session, *tables: str) -> None:
+    """
+    Increment the version of each table. Call directly after bulk (non-ORM) writes.
+
+    The session remembers {table: [version before, version after]} for the bumps of
+    its current transaction; `pop_bumped_versions` hands them over after commit.
+    """
+    conn = db.connection()
+    bumped = db.info.setdefault("bumped_versions", {})
+    for name in tables:
+        result = conn.execute(
+            update(TableVersion)
+            .where(TableVersion.name == name)
+            .values(version=TableVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            conn.execute(insert(TableVersion).values(name=name, version=1))
+        version = conn.execute(select(TableVersion.version).where(TableVersion.name == name)).scalar()
+        bumped.setdefault(name, [version - 1, version])[1] = version
+
+
+def pop_bumped_versions(db: Session) -> Dict[str, List[int]]:
+    """The bumps the just-committed transaction made, as {table: [before, after]}."""
+    return db.info.pop("bumped_versions", None) or {}
+
+
+def get_versions(db: Session, *tables: str) -> Dict[str, int]:
+    """Current version of each table — a single primary-key lookup."""
+    rows = db.execute(
+        select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables))
+    ).all()
+    versions = {name: 0 for name in tables}
+    versions.update({name: version for name, version in rows})
+    return versions
@@ -0,0 +1,34 @@
+from typing import Callable, Dict, List, Tuple
+import threading
+import time
+
+# Optional subsystems warmed in the background after the server starts listening,
+# so the first request (and /healthz) doesn't wait on them.
+_warmers: List[Tuple[str, Callable[[], None]]] = []
+_status: Dict[str, dict] = {}
+
+
+def register_warmup(name: str, fn: Callable[[], None]) -> None:
+    _warmers.append((name, fn))
+    _status[name] = {"state": "pending"}
+
+
+def _run_all() -> None:
+    for name, fn in _warmers:
+        started = time.perf_counter()
+        try:
+            fn()
+            _status[name] = {"state": "ready"}
+        except Exception as e:
+            _status[name] = {"state": "failed", "error": str(e)}
+        _status[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+
+def start_warmup() -> threading.Thread:
+    thread = threading.Thread(target=_run_all, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status() -> Dict[str, dict]:
+    return dict(_status)